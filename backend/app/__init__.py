@@ -1,2 +1,7 @@
 # This file can be empty or include version information
-__version__ = "0.1.0"
\ No newline at end of file
+import time
+
+__version__ = "0.1.0"
+
+# Reference point for startup timing, taken when the app package is first imported
+STARTED_AT = time.perf_counter()
@@ -1,4 +1,5 @@
 import os
+from typing import List
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
@@ -12,23 +13,192 @@ class ServerSettings(BaseModel):
 
 class CameraSettings(BaseModel):
     source: str = os.getenv("CAMERA_SOURCE", "0")
+    camera_id: str = os.getenv("CAMERA_ID", "")  # defaults to a name derived from the source
     width: int = int(os.getenv("CAMERA_WIDTH", "1280"))
     height: int = int(os.getenv("CAMERA_HEIGHT", "720"))
     fps: int = int(os.getenv("CAMERA_FPS", "30"))
 
+class PreprocessSettings(BaseModel):
+    # JSON with camera_matrix, dist_coeffs, image_width and image_height from cv2.calibrateCamera; empty = no undistortion
+    lens_calibration: str = os.getenv("LENS_CALIBRATION", "")
+    undistort_alpha: float = float(os.getenv("UNDISTORT_ALPHA", "0.0"))  # 0 = only valid pixels, 1 = every source pixel
+    clahe: bool = os.getenv("PREPROCESS_CLAHE", "False").lower() == "true"
+    clahe_clip_limit: float = float(os.getenv("PREPROCESS_CLAHE_CLIP_LIMIT", "2.0"))
+    clahe_tile_size: int = int(os.getenv("PREPROCESS_CLAHE_TILE_SIZE", "8"))
+    crop_board: bool = os.getenv("PREPROCESS_CROP_BOARD", "False").lower() == "true"
+    crop_margin: float = float(os.getenv("PREPROCESS_CROP_MARGIN", "1.15"))  # board radii kept around the center
+    buffers: int = int(os.getenv("PREPROCESS_BUFFERS", "3"))  # output frames reused in turn by the capture loop
+
 class ModelSettings(BaseModel):
     model_path: str = os.getenv("MODEL_PATH", "yolov8n.pt")
     confidence_threshold: float = float(os.getenv("CONFIDENCE_THRESHOLD", "0.25"))
+    warmup_iterations: int = int(os.getenv("MODEL_WARMUP_ITERATIONS", "2"))
+
+class CascadeSettings(BaseModel):
+    enabled: bool = os.getenv("DETECTION_CASCADE", "False").lower() == "true"
+    proposal_size: int = int(os.getenv("CASCADE_PROPOSAL_SIZE", "320"))  # model input size of the low-resolution pass
+    proposal_confidence: float = float(os.getenv("CASCADE_PROPOSAL_CONFIDENCE", "0.1"))
+    crop_size: int = int(os.getenv("CASCADE_CROP_SIZE", "256"))  # full-resolution crop around each candidate (pixels)
+    board_margin: float = float(os.getenv("CASCADE_BOARD_MARGIN", "1.2"))  # board radii searched by the low-resolution pass
+    merge_distance: float = float(os.getenv("CASCADE_MERGE_DISTANCE", "10"))  # pixels between duplicates from overlapping crops
+
+class TilingSettings(BaseModel):
+    enabled: bool = os.getenv("DETECTION_TILING", "False").lower() == "true"
+    tile_size: int = int(os.getenv("TILE_SIZE", "640"))  # pixels, also the model input size of every tile
+    overlap: int = int(os.getenv("TILE_OVERLAP", "128"))  # pixels shared by neighbouring tiles, more than a dart is long
+    board_only: bool = os.getenv("TILE_BOARD_ONLY", "True").lower() == "true"  # tile the calibrated board instead of the frame
+    board_margin: float = float(os.getenv("TILE_BOARD_MARGIN", "1.2"))  # board radii tiled around the center
+    nms_threshold: float = float(os.getenv("TILE_NMS_THRESHOLD", "0.5"))  # overlap (of the smaller box) that makes two boxes one dart
+
+class RemoteInferenceSettings(BaseModel):
+    workers: str = os.getenv("REMOTE_WORKERS", "")  # host:port of inference workers, comma separated
+    local_workers: int = int(os.getenv("REMOTE_LOCAL_WORKERS", "0"))  # worker subprocesses started on this host
+    authkey: str = os.getenv("REMOTE_WORKER_AUTHKEY", "dartify")
+    worker_port: int = int(os.getenv("REMOTE_WORKER_PORT", "7100"))  # default port of python -m app.services.inference_worker
+    transport: str = os.getenv("REMOTE_TRANSPORT", "auto")  # auto (shared memory for local workers), shm or jpeg
+    jpeg_quality: int = int(os.getenv("REMOTE_JPEG_QUALITY", "90"))
+    timeout: float = float(os.getenv("REMOTE_TIMEOUT", "5.0"))  # seconds per request and health check
+    health_interval: float = float(os.getenv("REMOTE_HEALTH_INTERVAL", "1.0"))  # seconds between pings
+    max_inflight: int = int(os.getenv("REMOTE_MAX_INFLIGHT", "2"))  # requests per worker at a time
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.workers.strip()) or self.local_workers > 0
 
 class DartboardSettings(BaseModel):
     center_x: int = int(os.getenv("DARTBOARD_CENTER_X", "640"))
     center_y: int = int(os.getenv("DARTBOARD_CENTER_Y", "360"))
     radius: int = int(os.getenv("DARTBOARD_RADIUS", "300"))
 
+class CalibrationSettings(BaseModel):
+    store_dir: str = os.getenv("CALIBRATION_STORE_DIR", "calibrations")
+    keep_versions: int = int(os.getenv("CALIBRATION_KEEP_VERSIONS", "20"))
+    auto_tolerance: int = int(os.getenv("CALIBRATION_AUTO_TOLERANCE", "3"))  # pixels of jitter ignored by auto-calibration
+
+class BrokerSettings(BaseModel):
+    enabled: bool = os.getenv("CAMERA_BROKER", "False").lower() == "true"
+    name: str = os.getenv("CAMERA_BROKER_NAME", "dartify_camera")
+    lock_path: str = os.getenv("CAMERA_BROKER_LOCK", "/tmp/dartify_camera.lock")
+    max_width: int = int(os.getenv("CAMERA_BROKER_MAX_WIDTH", "1920"))
+    max_height: int = int(os.getenv("CAMERA_BROKER_MAX_HEIGHT", "1080"))
+    stale_timeout: float = float(os.getenv("CAMERA_BROKER_STALE_TIMEOUT", "2.0"))
+
+class CodecSettings(BaseModel):
+    backend: str = os.getenv("CODEC_BACKEND", "auto")  # auto, turbojpeg or opencv
+    workers: int = int(os.getenv("CODEC_WORKERS", "0"))  # 0 = up to 4, one per core
+    max_pending: int = int(os.getenv("CODEC_MAX_PENDING", "32"))  # queued jobs before callers wait
+    cache_size: int = int(os.getenv("CODEC_CACHE_SIZE", "16"))  # encoded live frames kept for other clients
+
+class StreamSettings(BaseModel):
+    jpeg_quality: int = int(os.getenv("STREAM_JPEG_QUALITY", "70"))  # annotated live frames (WebSocket and MJPEG)
+    mjpeg_max_fps: float = float(os.getenv("MJPEG_MAX_FPS", "15"))  # per MJPEG connection
+
+class VideoSettings(BaseModel):
+    codec: str = os.getenv("VIDEO_CODEC", "libx264")  # software H.264 encoder used by PyAV
+    bitrate: int = int(os.getenv("VIDEO_BITRATE", "1500000"))  # bits per second, shared by all viewers
+    max_fps: float = float(os.getenv("VIDEO_MAX_FPS", "15"))
+    keyframe_interval: float = float(os.getenv("VIDEO_KEYFRAME_INTERVAL", "2.0"))  # seconds
+    max_width: int = int(os.getenv("VIDEO_MAX_WIDTH", "1280"))  # wider frames are downscaled
+    max_queue: int = int(os.getenv("VIDEO_MAX_QUEUE", "32"))  # messages per viewer before it restarts at a keyframe
+
+class MetricsSettings(BaseModel):
+    enabled: bool = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+    reservoir_size: int = int(os.getenv("METRICS_RESERVOIR_SIZE", "1024"))
+
+class TracingSettings(BaseModel):
+    enabled: bool = os.getenv("TRACING_ENABLED", "True").lower() == "true"
+    capacity: int = int(os.getenv("TRACING_CAPACITY", "512"))
+
+class ProfilingSettings(BaseModel):
+    # Off by default: the profiling endpoints have no authentication
+    enabled: bool = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+    max_duration: float = float(os.getenv("PROFILING_MAX_DURATION", "60"))
+
+class ThrowStoreSettings(BaseModel):
+    enabled: bool = os.getenv("THROW_STORE_ENABLED", "True").lower() == "true"
+    path: str = os.getenv("THROW_STORE_PATH", "throws.db")
+    batch_size: int = int(os.getenv("THROW_STORE_BATCH_SIZE", "256"))
+    flush_interval: float = float(os.getenv("THROW_STORE_FLUSH_INTERVAL", "0.5"))  # seconds
+    queue_size: int = int(os.getenv("THROW_STORE_QUEUE_SIZE", "10000"))
+    removal_frames: int = int(os.getenv("THROW_REMOVAL_FRAMES", "20"))  # frames a dart must be gone before it counts as removed
+
+class HeatmapSettings(BaseModel):
+    bins: int = int(os.getenv("HEATMAP_BINS", "64"))
+    extent: float = float(os.getenv("HEATMAP_EXTENT", "1.2"))  # board radii covered on each side of the center
+    cache_size: int = int(os.getenv("HEATMAP_CACHE_SIZE", "32"))  # rendered PNGs kept
+
+class RecorderSettings(BaseModel):
+    enabled: bool = os.getenv("RECORDER_ENABLED", "True").lower() == "true"
+    clip_dir: str = os.getenv("RECORDER_CLIP_DIR", "recordings")
+    buffer_path: str = os.getenv("RECORDER_BUFFER_PATH", "")  # defaults to preroll.buf in the clip directory
+    fps: float = float(os.getenv("RECORDER_FPS", "15"))
+    pre_roll: float = float(os.getenv("RECORDER_PRE_ROLL", "3.0"))  # seconds before the event
+    post_roll: float = float(os.getenv("RECORDER_POST_ROLL", "2.0"))  # seconds after the event
+    keep_clips: int = int(os.getenv("RECORDER_KEEP_CLIPS", "200"))
+    max_width: int = int(os.getenv("RECORDER_MAX_WIDTH", os.getenv("CAMERA_WIDTH", "1280")))
+    max_height: int = int(os.getenv("RECORDER_MAX_HEIGHT", os.getenv("CAMERA_HEIGHT", "720")))
+
+class GameSettings(BaseModel):
+    directory: str = os.getenv("GAME_DIR", "games")
+    snapshot_interval: int = int(os.getenv("GAME_SNAPSHOT_INTERVAL", "50"))  # events between snapshots
+
+class CheckoutSettings(BaseModel):
+    # Doubles to finish on, most preferred first
+    favourite_doubles: List[int] = [int(n) for n in os.getenv("CHECKOUT_FAVOURITE_DOUBLES", "20,16,8,18,12,10,4").split(",") if n.strip()]
+    avoid_bull: bool = os.getenv("CHECKOUT_AVOID_BULL", "False").lower() == "true"
+
+class GovernorSettings(BaseModel):
+    enabled: bool = os.getenv("GOVERNOR_ENABLED", "True").lower() == "true"
+    latency_budget: float = float(os.getenv("GOVERNOR_LATENCY_BUDGET", "0.1"))  # seconds per live frame
+    cpu_budget: float = float(os.getenv("GOVERNOR_CPU_BUDGET", "0.5"))  # fraction of all cores used by this process
+    max_rate: float = float(os.getenv("GOVERNOR_MAX_RATE", "10"))  # frames per second per client
+    min_rate: float = float(os.getenv("GOVERNOR_MIN_RATE", "2"))  # guaranteed, also while idle
+    # Model input sizes to choose from (multiples of 32)
+    image_sizes: List[int] = [int(n) for n in os.getenv("GOVERNOR_IMAGE_SIZES", "640,512,416,320").split(",") if n.strip()]
+    adjust_interval: float = float(os.getenv("GOVERNOR_ADJUST_INTERVAL", "1.0"))  # seconds
+    idle_after: float = float(os.getenv("GOVERNOR_IDLE_AFTER", "10"))  # seconds without motion
+    motion_threshold: float = float(os.getenv("GOVERNOR_MOTION_THRESHOLD", "3.0"))  # mean grey level change
+
+class MemorySettings(BaseModel):
+    # Budgets of the memory pools in MB (0 = only report); pools over budget are trimmed
+    frame_buffers: float = float(os.getenv("MEMORY_FRAME_BUFFERS_MB", "256"))  # camera frames, preprocessing rings, model results
+    codec_cache: float = float(os.getenv("MEMORY_CODEC_CACHE_MB", "32"))  # encoded live frames
+    heatmap_cache: float = float(os.getenv("MEMORY_HEATMAP_CACHE_MB", "16"))  # rendered heatmap PNGs
+    tracks: float = float(os.getenv("MEMORY_TRACKS_MB", "8"))  # tracker state and position histories
+    sessions: float = float(os.getenv("MEMORY_SESSIONS_MB", "64"))  # segments queued for video viewers
+    recording: float = float(os.getenv("MEMORY_RECORDING_MB", "1024"))  # pre-roll ring of the frame recorder
+    track_history: int = int(os.getenv("MEMORY_TRACK_HISTORY", "30"))  # positions kept per track
+    check_interval: float = float(os.getenv("MEMORY_CHECK_INTERVAL", "5"))  # seconds between budget checks
+    tracemalloc: bool = os.getenv("MEMORY_TRACEMALLOC", "False").lower() == "true"  # trace allocations from startup
+    tracemalloc_frames: int = int(os.getenv("MEMORY_TRACEMALLOC_FRAMES", "8"))  # stack depth kept per allocation
+
+    def budget(self, pool: str) -> int:
+        """Budget of a pool in bytes (0 = unlimited)"""
+        return int(getattr(self, pool) * 1024 * 1024)
+
 class Settings(BaseModel):
     server: ServerSettings = ServerSettings()
     camera: CameraSettings = CameraSettings()
+    preprocess: PreprocessSettings = PreprocessSettings()
     model: ModelSettings = ModelSettings()
+    cascade: CascadeSettings = CascadeSettings()
+    tiling: TilingSettings = TilingSettings()
+    remote: RemoteInferenceSettings = RemoteInferenceSettings()
     dartboard: DartboardSettings = DartboardSettings()
+    calibration: CalibrationSettings = CalibrationSettings()
+    broker: BrokerSettings = BrokerSettings()
+    codec: CodecSettings = CodecSettings()
+    stream: StreamSettings = StreamSettings()
+    video: VideoSettings = VideoSettings()
+    metrics: MetricsSettings = MetricsSettings()
+    tracing: TracingSettings = TracingSettings()
+    profiling: ProfilingSettings = ProfilingSettings()
+    throws: ThrowStoreSettings = ThrowStoreSettings()
+    heatmap: HeatmapSettings = HeatmapSettings()
+    recorder: RecorderSettings = RecorderSettings()
+    game: GameSettings = GameSettings()
+    checkout: CheckoutSettings = CheckoutSettings()
+    governor: GovernorSettings = GovernorSettings()
+    memory: MemorySettings = MemorySettings()
 
 settings = Settings()
\ No newline at end of file
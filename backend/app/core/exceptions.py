@@ -29,6 +29,18 @@ class ScoringError(HTTPException):
         )
 
 class CalibrationError(HTTPException):
+    def __init__(self, detail: str):
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=detail
+        )
+
+class CalibrationNotFoundError(CalibrationError):
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self.status_code = status.HTTP_404_NOT_FOUND
+
+class GameError(HTTPException):
     def __init__(self, detail: str):
         super().__init__(
             status_code=status.HTTP_400_BAD_REQUEST,
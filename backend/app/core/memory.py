@@ -0,0 +1,284 @@
+import asyncio
+import logging
+import os
+import resource
+import sys
+import sysconfig
+import threading
+import time
+import tracemalloc
+import types
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from .config import settings
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STDLIB_DIR = os.path.abspath(sysconfig.get_paths()["stdlib"])
+PACKAGE_DIRS = ("site-packages", "dist-packages")
+
+# Objects visited by approximate_size at most, so accounting stays cheap on the event loop
+MAX_OBJECTS = 100000
+SHARED_TYPES = (type, types.ModuleType, types.FunctionType, types.MethodType, types.BuiltinFunctionType)
+
+
+def approximate_size(root: Any) -> int:
+    """
+    Bytes held by an object and everything it references, each object counted once.
+    numpy arrays count their data buffer; classes, modules and functions are shared and not counted.
+    """
+    seen = set()
+    total = 0
+    stack = [root]
+    while stack and len(seen) < MAX_OBJECTS:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, SHARED_TYPES):
+            continue
+        seen.add(id(obj))
+        # Includes the data of arrays that own it; views lead to the array that does
+        total += sys.getsizeof(obj)
+        if isinstance(obj, np.ndarray):
+            if obj.base is not None:
+                stack.append(obj.base)
+            continue
+        if isinstance(obj, (str, bytes, bytearray, int, float, bool)):
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+            stack.extend(obj)
+        if hasattr(obj, "__dict__"):
+            stack.append(vars(obj))
+        for slot in getattr(type(obj), "__slots__", ()):
+            if hasattr(obj, slot):
+                stack.append(getattr(obj, slot))
+    return total
+
+
+def resident_bytes() -> int:
+    """Resident set size of this process (the peak where /proc is not available)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _location(frame: tracemalloc.Frame) -> str:
+    filename = frame.filename
+    if filename.startswith(APP_DIR + os.sep):
+        filename = os.path.relpath(filename, os.path.dirname(APP_DIR))
+    return f"{filename}:{frame.lineno}"
+
+
+def subsystem(filename: str) -> str:
+    """Subsystem an allocation site belongs to: app module (services.tracking_service), third-party package or stdlib"""
+    path = os.path.abspath(filename)
+    if path.startswith(APP_DIR + os.sep):
+        return os.path.splitext(os.path.relpath(path, APP_DIR))[0].replace(os.sep, ".")
+    parts = path.split(os.sep)
+    for marker in PACKAGE_DIRS:
+        if marker in parts:
+            index = parts.index(marker)
+            if index + 1 < len(parts):
+                return os.path.splitext(parts[index + 1])[0]
+    if path.startswith(STDLIB_DIR + os.sep):
+        return "stdlib"
+    if filename.startswith("<"):
+        return "python"
+    return "other"
+
+
+class MemoryPool:
+    """
+    A group of buffers with a byte budget; shrink(budget) frees memory and returns how many items it evicted.
+    fixed() reports the part of usage that is needed for every frame and that shrink cannot free.
+    """
+
+    def __init__(self, name: str, usage: Callable[[], int], budget: int, shrink: Optional[Callable[[int], int]] = None, fixed: Optional[Callable[[], int]] = None):
+        self.name = name
+        self.usage = usage
+        self.budget = budget
+        self.shrink = shrink
+        self.fixed = fixed
+        self.bytes = 0
+        self.evictions = 0
+        self.warned = False  # the fixed buffers alone were over budget
+
+
+class MemoryAccountant:
+    """
+    Process-wide registry of memory pools. Every pool reports the bytes it holds;
+    enforce() (run periodically on the event loop) publishes them as metrics and trims
+    the pools that are over their MEMORY_* budget. Services that bound their pools
+    inline report those evictions with record_eviction().
+    Also controls tracemalloc for the allocation report of /debug/memory/allocations.
+    """
+
+    def __init__(self):
+        self.config = settings.memory
+        self.pools: Dict[str, MemoryPool] = {}
+        self.lock = threading.Lock()
+        self.tracing_since: Optional[float] = None
+        if self.config.tracemalloc:
+            self.start_tracing()
+
+    def register(self, name: str, usage: Callable[[], int], budget: Optional[int] = None, shrink: Optional[Callable[[int], int]] = None, fixed: Optional[Callable[[], int]] = None):
+        """Add a pool; the budget defaults to its MEMORY_* setting"""
+        if budget is None:
+            budget = self.config.budget(name)
+        with self.lock:
+            self.pools[name] = MemoryPool(name, usage, budget, shrink, fixed)
+        metrics.set_gauge("dartify_memory_budget_bytes", budget, {"pool": name})
+
+    def record_eviction(self, name: str, count: int = 1):
+        pool = self.pools.get(name)
+        if pool is not None:
+            pool.evictions += count
+        metrics.inc_counter("dartify_memory_evictions_total", count, {"pool": name})
+
+    def _measure(self, pool: MemoryPool) -> int:
+        try:
+            pool.bytes = int(pool.usage())
+        except Exception as e:
+            logger.warning(f"Could not measure memory pool {pool.name}: {e}")
+        metrics.set_gauge("dartify_memory_bytes", pool.bytes, {"pool": pool.name})
+        return pool.bytes
+
+    def enforce(self) -> Dict[str, int]:
+        """Measure every pool and trim the ones over budget; returns the bytes held per pool"""
+        with self.lock:
+            pools = list(self.pools.values())
+        for pool in pools:
+            used = self._measure(pool)
+            if pool.budget and used > pool.budget and pool.shrink is not None:
+                if not self._trimmable(pool):
+                    continue
+                evicted = pool.shrink(pool.budget)
+                if evicted:
+                    self.record_eviction(pool.name, evicted)
+                    after = self._measure(pool)
+                    logger.info(f"Memory pool {pool.name} trimmed from {used / 1e6:.1f} to {after / 1e6:.1f} MB ({evicted} evicted)")
+        metrics.set_gauge("dartify_memory_rss_bytes", resident_bytes())
+        return {pool.name: pool.bytes for pool in pools}
+
+    def _trimmable(self, pool: MemoryPool) -> bool:
+        """
+        False if the pool's fixed buffers alone exceed its budget: trimming cannot bring it
+        under budget, and whatever it drops would be rebuilt by the next frame
+        """
+        if pool.fixed is None:
+            return True
+        try:
+            fixed = int(pool.fixed())
+        except Exception as e:
+            logger.warning(f"Could not measure the fixed buffers of memory pool {pool.name}: {e}")
+            return True
+        if fixed < pool.budget:
+            pool.warned = False
+            return True
+        if not pool.warned:
+            pool.warned = True
+            logger.warning(
+                f"Memory pool {pool.name} needs {fixed / 1e6:.1f} MB for every frame, over its budget of "
+                f"{pool.budget / 1e6:.1f} MB; raise its MEMORY_* budget"
+            )
+        return False
+
+    async def run(self, interval: Optional[float] = None):
+        """Enforce the budgets every interval seconds"""
+        interval = interval or self.config.check_interval
+        while True:
+            try:
+                self.enforce()
+            except Exception as e:
+                logger.error(f"Memory accounting failed: {e}")
+            await asyncio.sleep(interval)
+
+    def report(self) -> Dict[str, Any]:
+        """Bytes, budget and evictions of every pool, freshly measured"""
+        with self.lock:
+            pools = list(self.pools.values())
+        rss = resident_bytes()
+        return {
+            "rss_bytes": rss,
+            "accounted_bytes": sum(self._measure(pool) for pool in pools),
+            "pools": {
+                pool.name: {
+                    "bytes": pool.bytes,
+                    "budget_bytes": pool.budget,
+                    "utilization": pool.bytes / pool.budget if pool.budget else None,
+                    "evictions": pool.evictions,
+                }
+                for pool in pools
+            },
+            "tracemalloc": tracemalloc.is_tracing(),
+        }
+
+    # Allocation tracing
+
+    def start_tracing(self) -> bool:
+        """Start tracemalloc; False if it was already running"""
+        if tracemalloc.is_tracing():
+            return False
+        tracemalloc.start(self.config.tracemalloc_frames)
+        self.tracing_since = time.time()
+        logger.info(f"Allocation tracing started with {self.config.tracemalloc_frames} frames per allocation")
+        return True
+
+    def stop_tracing(self):
+        tracemalloc.stop()
+        self.tracing_since = None
+
+    def allocations(self, limit: int = 20, locations: int = 5) -> Dict[str, Any]:
+        """
+        Live traced allocations grouped by subsystem, largest first, with the top allocation sites of each.
+        An allocation belongs to the innermost app module on its stack, so memory allocated by
+        numpy or the model on behalf of a service is charged to that service.
+        """
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        groups: Dict[str, Dict[str, Any]] = {}
+        for stat in snapshot.statistics("traceback"):
+            # Frames are ordered from the oldest to the most recent call
+            frames = list(reversed(stat.traceback))
+            site = next((frame for frame in frames if frame.filename.startswith(APP_DIR + os.sep)), frames[0])
+            group = groups.setdefault(subsystem(site.filename), {"bytes": 0, "count": 0, "sites": {}})
+            group["bytes"] += stat.size
+            group["count"] += stat.count
+            sizes = group["sites"].setdefault(_location(site), [0, 0])
+            sizes[0] += stat.size
+            sizes[1] += stat.count
+
+        current, peak = tracemalloc.get_traced_memory()
+        ranked = sorted(groups.items(), key=lambda item: item[1]["bytes"], reverse=True)[:limit]
+        subsystems: List[Dict[str, Any]] = [
+            {
+                "subsystem": name,
+                "bytes": group["bytes"],
+                "count": group["count"],
+                "top": [
+                    {"location": location, "bytes": size, "count": count}
+                    for location, (size, count) in sorted(group["sites"].items(), key=lambda item: item[1][0], reverse=True)[:locations]
+                ],
+            }
+            for name, group in ranked
+        ]
+        return {
+            "since": self.tracing_since,
+            "frames": tracemalloc.get_traceback_limit(),
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "subsystems": subsystems,
+        }
+
+
+memory = MemoryAccountant()
@@ -0,0 +1,184 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+from .config import settings
+
+# Quantiles reported for every latency summary
+QUANTILES = (0.5, 0.95, 0.99)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key)
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Summary:
+    """
+    Latency summary backed by a bounded reservoir of recent samples.
+    Recording is O(1); quantiles are only computed when metrics are scraped.
+    """
+
+    def __init__(self, reservoir_size: int):
+        self.samples: Deque[float] = deque(maxlen=reservoir_size)
+        self.count = 0
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self.lock:
+            self.samples.append(value)
+            self.count += 1
+            self.total += value
+
+    def snapshot(self) -> Tuple[Dict[float, float], int, float]:
+        """Return (quantiles, count, sum) for the current reservoir"""
+        with self.lock:
+            samples = sorted(self.samples)
+            count = self.count
+            total = self.total
+
+        quantiles = {}
+        if samples:
+            for q in QUANTILES:
+                index = min(len(samples) - 1, int(q * len(samples)))
+                quantiles[q] = samples[index]
+        return quantiles, count, total
+
+
+class MetricsRegistry:
+    """Process-wide registry of latency summaries, gauges and counters"""
+
+    def __init__(self):
+        self.enabled = settings.metrics.enabled
+        self.reservoir_size = settings.metrics.reservoir_size
+        self.summaries: Dict[str, Dict[LabelKey, Summary]] = {}
+        self.gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.help: Dict[str, str] = {}
+        self.lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str):
+        """Attach a HELP line to a metric"""
+        self.help[name] = help_text
+
+    def _summary(self, name: str, labels: Optional[Dict[str, str]]) -> Summary:
+        key = _label_key(labels)
+        series = self.summaries.get(name)
+        if series is None or key not in series:
+            with self.lock:
+                series = self.summaries.setdefault(name, {})
+                if key not in series:
+                    series[key] = Summary(self.reservoir_size)
+        return series[key]
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        """Record one sample for a summary metric"""
+        if not self.enabled:
+            return
+        self._summary(name, labels).observe(value)
+
+    def observe_stage(self, stage: str, seconds: float):
+        """Record the latency of a pipeline stage"""
+        if not self.enabled:
+            return
+        self._summary("dartify_stage_latency_seconds", {"stage": stage}).observe(seconds)
+
+    @contextmanager
+    def time_stage(self, stage: str) -> Iterator[None]:
+        """Context manager that records the wall time of a pipeline stage"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(stage, time.perf_counter() - start)
+
+    def set_gauge(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        """Set a gauge to an absolute value"""
+        if not self.enabled:
+            return
+        self.gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def inc_gauge(self, name: str, amount: float = 1.0, labels: Optional[Dict[str, str]] = None):
+        """Increment (or decrement with a negative amount) a gauge"""
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self.lock:
+            series = self.gauges.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    def inc_counter(self, name: str, amount: float = 1.0, labels: Optional[Dict[str, str]] = None):
+        """Increment a monotonically increasing counter"""
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+
+        for name, series in sorted(self.summaries.items()):
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} summary")
+            for key, summary in sorted(series.items()):
+                quantiles, count, total = summary.snapshot()
+                for q, value in quantiles.items():
+                    lines.append(f"{name}{_format_labels(key, ('quantile', str(q)))} {value:.6f}")
+                lines.append(f"{name}_sum{_format_labels(key)} {total:.6f}")
+                lines.append(f"{name}_count{_format_labels(key)} {count}")
+
+        for kind, families in (("gauge", self.gauges), ("counter", self.counters)):
+            for name, series in sorted(families.items()):
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+metrics.describe("dartify_stage_latency_seconds", "Latency of each frame pipeline stage")
+metrics.describe("dartify_camera_fps", "Frames per second delivered by the camera")
+metrics.describe("dartify_dropped_frames_total", "Captured frames overwritten before any consumer read them")
+metrics.describe("dartify_queue_depth", "Number of items waiting in each internal queue")
+metrics.describe("dartify_websocket_clients", "Number of connected WebSocket clients")
+metrics.describe("dartify_startup_seconds", "Duration of each startup phase (import, model_load, warmup) and time until ready")
+metrics.describe("dartify_calibration_revision", "Revision of the calibration snapshot shared by all services")
+metrics.describe("dartify_throws_total", "Darts that landed on the board")
+metrics.describe("dartify_dropped_throws_total", "Throws not persisted because the throw store queue was full")
+metrics.describe("dartify_governor_rate_hz", "Live inference rate per client chosen by the inference governor")
+metrics.describe("dartify_governor_image_size", "Model input size chosen by the inference governor")
+metrics.describe("dartify_governor_cpu", "CPU used by this process as a fraction of all cores, as seen by the inference governor")
+metrics.describe("dartify_codec_cache_total", "Live frame encodings served from the codec cache (hit, shared) or encoded (miss)")
+metrics.describe("dartify_stream_viewers", "Number of connected MJPEG viewers")
+metrics.describe("dartify_stream_dropped_frames_total", "Annotated frames skipped for MJPEG viewers that were too slow to read them")
+metrics.describe("dartify_remote_workers_healthy", "Remote inference workers that answered their last health check")
+metrics.describe("dartify_remote_requests_total", "Requests sent to each remote inference worker, by result (ok, error, failed)")
+metrics.describe("dartify_video_viewers", "Number of connected H.264 video viewers")
+metrics.describe("dartify_video_bytes_total", "Video segment bytes queued for viewers")
+metrics.describe("dartify_video_resyncs_total", "Video viewers restarted at a keyframe after falling behind")
+metrics.describe("dartify_memory_bytes", "Bytes held by each memory pool")
+metrics.describe("dartify_memory_budget_bytes", "Budget of each memory pool (0 = unlimited)")
+metrics.describe("dartify_memory_evictions_total", "Items evicted or dropped to keep each memory pool within its budget")
+metrics.describe("dartify_memory_rss_bytes", "Resident set size of the process")
@@ -0,0 +1,117 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class ProfileResult:
+    """Aggregated samples of a profiling window"""
+
+    def __init__(self, stacks: Counter, samples: int, duration: float, interval: float, threads: Dict[int, str]):
+        self.stacks = stacks
+        self.samples = samples
+        self.duration = duration
+        self.interval = interval
+        self.threads = threads
+
+    def collapsed(self) -> str:
+        """Stacks in the collapsed format used by flamegraph.pl and speedscope"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def top_functions(self, limit: int = 30) -> List[Dict[str, Any]]:
+        """Hot functions by self samples (leaf of the stack) and total samples (anywhere on it)"""
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            self_counts[frames[-1]] += count
+            for label in set(frames[1:]):
+                total_counts[label] += count
+
+        total = max(self.samples, 1)
+        return [
+            {
+                "function": label,
+                "self_samples": self_counts[label],
+                "total_samples": total_counts[label],
+                "self_percent": 100.0 * self_counts[label] / total,
+                "total_percent": 100.0 * total_counts[label] / total,
+            }
+            for label, _ in sorted(total_counts.items(), key=lambda item: (self_counts[item[0]], item[1]), reverse=True)[:limit]
+        ]
+
+    def to_dict(self, limit: int = 30) -> Dict[str, Any]:
+        return {
+            "samples": self.samples,
+            "duration": self.duration,
+            "interval": self.interval,
+            "threads": {str(ident): name for ident, name in self.threads.items()},
+            "top_functions": self.top_functions(limit),
+        }
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler that periodically snapshots the stacks of selected threads.
+    It only runs for a bounded window on request; when idle there is no sampler thread
+    and no tracing hook installed, so it costs nothing.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self.lock.locked()
+
+    def run(self, duration: float, interval: float, thread_ids: Optional[Iterable[int]] = None) -> Optional[ProfileResult]:
+        """
+        Sample the given threads (all other threads if None) for duration seconds.
+        Returns None if another profiling window is already in progress.
+        """
+        if not self.lock.acquire(blocking=False):
+            return None
+        try:
+            return self._sample(duration, interval, set(thread_ids) if thread_ids is not None else None)
+        finally:
+            self.lock.release()
+
+    def _sample(self, duration: float, interval: float, thread_ids: Optional[Set[int]]) -> ProfileResult:
+        own_id = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks: Counter = Counter()
+        seen: Dict[int, str] = {}
+        samples = 0
+
+        start = time.perf_counter()
+        deadline = start + duration
+        while time.perf_counter() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == own_id or (thread_ids is not None and ident not in thread_ids):
+                    continue
+                thread_name = names.get(ident) or f"thread-{ident}"
+                seen[ident] = thread_name
+                stacks[self._collapse(thread_name, frame)] += 1
+                samples += 1
+            time.sleep(interval)
+
+        return ProfileResult(stacks, samples, time.perf_counter() - start, interval, seen)
+
+    @staticmethod
+    def _collapse(thread_name: str, frame) -> str:
+        labels: List[str] = []
+        while frame is not None:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        labels.append(thread_name)
+        return ";".join(reversed(labels))
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from .config import settings
+from .metrics import metrics
+
+
+class FrameTrace:
+    """Timeline and results of one frame as it moves through the pipeline"""
+
+    __slots__ = (
+        "frame_id", "source", "timestamp", "spans", "detections",
+        "track_ids", "stable_darts", "total_score", "throws",
+    )
+
+    def __init__(self, frame_id: int, source: str, timestamp: float):
+        self.frame_id = frame_id
+        self.source = source
+        self.timestamp = timestamp
+        self.spans: List[Tuple[str, float, float]] = []  # name, perf_counter start, perf_counter end
+        self.detections: Optional[int] = None
+        self.track_ids: List[int] = []
+        self.stable_darts: Optional[int] = None
+        self.total_score: Optional[int] = None
+        self.throws: List[str] = []
+
+    def add_span(self, name: str, start: float, end: float):
+        """Record a stage that ran between two perf_counter() readings"""
+        self.spans.append((name, start, end))
+        metrics.observe_stage(name, end - start)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Context manager that times a stage for this frame (and the latency metrics)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.perf_counter())
+
+    def record_tracking(self, track_ids, stable_darts: int):
+        self.track_ids = [int(track_id) for track_id in track_ids]
+        self.stable_darts = stable_darts
+
+    def record_score(self, score):
+        self.total_score = score.total_score
+        self.throws = [dart_throw.section.label for dart_throw in score.throws]
+
+    def to_dict(self) -> Dict[str, Any]:
+        origin = self.spans[0][1] if self.spans else 0.0
+        return {
+            "frame_id": self.frame_id,
+            "source": self.source,
+            "timestamp": self.timestamp,
+            "stages": [
+                {
+                    "name": name,
+                    "offset_ms": (start - origin) * 1000.0,
+                    "duration_ms": (end - start) * 1000.0,
+                }
+                for name, start, end in self.spans
+            ],
+            "detections": self.detections,
+            "track_ids": self.track_ids,
+            "stable_darts": self.stable_darts,
+            "total_score": self.total_score,
+            "throws": self.throws,
+        }
+
+    def chrome_events(self) -> List[Dict[str, Any]]:
+        """Complete ("X") events in the Chrome trace event format, one thread per source"""
+        events = []
+        for name, start, end in self.spans:
+            events.append({
+                "name": name,
+                "cat": self.source,
+                "ph": "X",
+                "ts": start * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": os.getpid(),
+                "tid": self.source,
+                "args": {"frame_id": self.frame_id},
+            })
+        return events
+
+
+class TraceRing:
+    """
+    Fixed-size ring of the most recent frame traces, keyed by (source, frame_id).
+    The camera thread records capture stages under the "camera" source; every consumer
+    (a WebSocket connection, an upload) records its own pipeline stages under its own source.
+    """
+
+    def __init__(self, capacity: int, enabled: bool = True):
+        self.capacity = capacity
+        self.enabled = enabled
+        self.traces: "OrderedDict[Tuple[str, int], FrameTrace]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.upload_counter = 0
+
+    def begin(self, frame_id: int, source: str = "camera", timestamp: Optional[float] = None) -> Optional[FrameTrace]:
+        """Return the trace for a frame, creating it (and evicting the oldest) if needed"""
+        if not self.enabled:
+            return None
+        key = (source, frame_id)
+        with self.lock:
+            trace = self.traces.get(key)
+            if trace is None:
+                trace = FrameTrace(frame_id, source, timestamp if timestamp is not None else time.time())
+                self.traces[key] = trace
+                if len(self.traces) > self.capacity:
+                    self.traces.popitem(last=False)
+            return trace
+
+    def begin_upload(self) -> Tuple[int, Optional[FrameTrace]]:
+        """Allocate an id and trace for an uploaded image, which has no camera frame_id"""
+        with self.lock:
+            self.upload_counter += 1
+            frame_id = self.upload_counter
+        return frame_id, self.begin(frame_id, "upload")
+
+    def last(self, limit: int) -> List[FrameTrace]:
+        with self.lock:
+            traces = list(self.traces.values())
+        return traces[-limit:] if limit > 0 else []
+
+    def dump(self, limit: int) -> List[Dict[str, Any]]:
+        return [trace.to_dict() for trace in self.last(limit)]
+
+    def chrome_trace(self, limit: int) -> Dict[str, Any]:
+        events = []
+        for trace in self.last(limit):
+            events.extend(trace.chrome_events())
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+@contextmanager
+def time_stage(trace: Optional[FrameTrace], name: str) -> Iterator[None]:
+    """Time a stage on the frame's trace if there is one, otherwise only in the metrics"""
+    if trace is None:
+        with metrics.time_stage(name):
+            yield
+    else:
+        with trace.stage(name):
+            yield
+
+
+tracer = TraceRing(settings.tracing.capacity, settings.tracing.enabled)
@@ -1,11 +1,14 @@
 import logging
 import os
+import time
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import uvicorn
-from .routers import camera
+from . import STARTED_AT
+from .routers import camera, clips, debug, game, throws
 from .core.config import settings
+from .core.metrics import metrics
 
 # Setup logging
 logging.basicConfig(
@@ -32,6 +35,12 @@ app.add_middleware(
 
 # Include routers
 app.include_router(camera.router)
+app.include_router(debug.router)
+app.include_router(throws.router)
+app.include_router(clips.router)
+app.include_router(game.router)
+
+metrics.set_gauge("dartify_startup_seconds", time.perf_counter() - STARTED_AT, {"phase": "import"})
 
 @app.get("/")
 async def root():
@@ -41,20 +50,68 @@ async def root():
         "version": "0.1.0",
         "description": "API for dart detection and scoring system",
         "endpoints": {
+            "health": "/health",
+            "ready": "/ready",
+            "metrics": "/metrics",
             "camera": {
                 "status": "/camera/status",
                 "calibration": "/camera/calibration",
+                "calibration_versions": "/camera/calibration/versions",
                 "auto_calibration": "/camera/auto_calibration",
                 "detect": "/camera/detect",
+                "mjpeg": "/camera/mjpeg",
+                "video": "/camera/video",
+                "governor": "/camera/governor",
+                "inference_workers": "/camera/inference_workers",
                 "websocket": "/camera/ws"
+            },
+            "throws": {
+                "session": "/throws/session",
+                "player": "/throws/player",
+                "stats": "/throws/stats",
+                "recent": "/throws/recent",
+                "heatmap": "/throws/heatmap"
+            },
+            "clips": "/clips",
+            "game": {
+                "game": "/game",
+                "throw": "/game/throw",
+                "next_turn": "/game/next_turn",
+                "undo": "/game/undo"
+            },
+            "debug": {
+                "traces": "/debug/traces",
+                "profile": "/debug/profile",
+                "memory": "/debug/memory",
+                "allocations": "/debug/memory/allocations"
             }
         }
     }
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy"}
+    """Liveness check endpoint; see /ready for whether the service can score darts yet"""
+    return {"status": "healthy", "ready": all(camera.readiness().values())}
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint reporting model, camera and calibration readiness (503 until all are ready)"""
+    components = camera.readiness()
+    ready = all(components.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "components": components,
+            "model_load_error": camera.detection_service.load_error,
+            "uptime": time.perf_counter() - STARTED_AT
+        }
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics endpoint with per-stage latencies, fps and queue depths"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class Calibration(BaseModel):
+    """Model representing one saved version of a camera's dartboard calibration"""
+    camera_id: str
+    version: int
+    center_x: int
+    center_y: int
+    radius: int
+    image_width: int
+    image_height: int
+    source: str = "manual"  # manual, auto or env
+    created_at: float
+    
+    class Config:
+        frozen = True
+        json_schema_extra = {
+            "example": {
+                "camera_id": "0",
+                "version": 3,
+                "center_x": 640,
+                "center_y": 360,
+                "radius": 300,
+                "image_width": 1280,
+                "image_height": 720,
+                "source": "manual",
+                "created_at": 1648282394.567
+            }
+        }
@@ -0,0 +1,43 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+class GameRequest(BaseModel):
+    """Model representing a request to start a game"""
+    game_type: str = "501"  # 501, 301 or Cricket
+    players: List[str]
+    double_out: bool = True
+
+class ManualThrow(BaseModel):
+    """Model representing a dart entered by hand (e.g. one that missed the camera)"""
+    number: int  # 0 for a miss, 25 for the outer bull, 50 for the bull
+    multiplier: int = 1
+
+class TurnDart(BaseModel):
+    """Model representing one dart of the current turn"""
+    throw_id: str
+    label: str
+    points: int
+
+class GamePlayer(BaseModel):
+    """Model representing the state of one player"""
+    name: str
+    remaining: Optional[int] = None  # X01 only
+    points: int
+    darts: int
+    average: float  # three-dart average
+    marks: Optional[Dict[str, int]] = None  # Cricket only
+
+class GameStatus(BaseModel):
+    """Model representing the state of a game"""
+    game_id: str
+    game_type: str
+    double_out: bool
+    players: List[GamePlayer]
+    current_player: int
+    round: int
+    turn: List[TurnDart]
+    last_turn_bust: bool
+    finished: bool
+    winner: Optional[str] = None
+    checkout: Optional[List[str]] = None  # X01: suggested finish with the darts left in the turn
+    sequence: int  # number of events applied
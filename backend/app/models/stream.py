@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from .score import Score
+
+class StreamMessage(BaseModel):
+    """Model representing one WebSocket stream message, without its image"""
+    score: Score
+    frame_id: int
+    timestamp: float
+    heartbeat: int
+    checkout: Optional[List[str]] = None  # suggested finish in a running X01 game
+
+class VideoFrameMetadata(BaseModel):
+    """Score metadata sent ahead of each media segment of the video stream"""
+    type: str = "frame"
+    score: Score
+    frame_id: int
+    timestamp: float
+    checkout: Optional[List[str]] = None
@@ -0,0 +1,63 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class ThrowRecord(BaseModel):
+    """Model representing one dart that landed on the board"""
+    throw_id: str
+    session_id: str
+    board_id: str
+    player: Optional[str] = None
+    frame_id: int
+    timestamp: float
+    number: int
+    multiplier: int
+    label: str
+    points: int
+    x: float
+    y: float
+    board_x: float  # position relative to the board center, in board radii
+    board_y: float
+    confidence: float
+
+    class Config:
+        frozen = True
+        json_schema_extra = {
+            "example": {
+                "throw_id": "3f2a9c1e5b7d4e0f8a6b2c4d1e3f5a7b",
+                "session_id": "9d1c7e3b2a4f4c6e8b0a1d3f5e7c9b2a",
+                "board_id": "0",
+                "player": "Alice",
+                "frame_id": 4211,
+                "timestamp": 1648282394.567,
+                "number": 20,
+                "multiplier": 3,
+                "label": "T20",
+                "points": 60,
+                "x": 640.5,
+                "y": 180.2,
+                "board_x": 0.002,
+                "board_y": -0.601,
+                "confidence": 0.92
+            }
+        }
+
+class SegmentStats(BaseModel):
+    """Model representing how often a player hit one section"""
+    number: int
+    multiplier: int
+    label: str
+    count: int
+    rate: float
+
+class ThrowStats(BaseModel):
+    """Model representing aggregated throw statistics of a player"""
+    player: Optional[str] = None
+    darts: int
+    points: int
+    average: float  # points per dart
+    three_dart_average: float
+    trebles: int
+    doubles: int
+    bulls: int
+    misses: int
+    segments: List[SegmentStats]
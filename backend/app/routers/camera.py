@@ -1,21 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, HTTPException, Query, status, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 import cv2
 import numpy as np
 import base64
 import json
 import logging
 import asyncio
-from typing import Dict, List, Optional
+import time
+from typing import Dict, List, Optional, Tuple
 from pydantic import BaseModel
 from ..services.camera_service import CameraService
+from ..services.camera_broker import CameraBroker
+from ..services.calibration_store import CalibrationArtifacts, CalibrationStore
+from ..services.calibration_state import calibration_state
 from ..services.detection_service import DetectionService
 from ..services.tracking_service import TrackingService
 from ..services.scoring_service import ScoringService
+from ..services.throw_detector import throw_detector
+from ..services.game_engine import game_engine
+from ..services.annotated_stream import annotated_stream
+from ..services.image_codec import EncodedImage, image_codec
+from ..services.inference_governor import inference_governor
+from ..services.video_stream import FRAME, INIT, MEDIA, video_stream
+from ..services.frame_recorder import frame_recorder
 from ..models.dart import DartDetection
 from ..models.score import Score
+from ..models.calibration import Calibration
+from .. import STARTED_AT
+from ..core.config import settings
 from ..core.exceptions import CameraError, DetectionError, TrackingError, ScoringError
-from ..utils.dartboard_segmentation import DartboardSegmentation
+from ..core.memory import memory
+from ..core.metrics import metrics
+from ..core.tracing import FrameTrace, tracer, time_stage
 from ..utils.image_processing import draw_detection
+from ..utils.serialization import stream_message, video_metadata
 
 logger = logging.getLogger(__name__)
 
@@ -29,11 +47,24 @@ router = APIRouter(
 )
 
 # Services
-camera_service = CameraService()
+# With CAMERA_BROKER enabled, one worker owns the camera and the others subscribe to it
+camera_service = CameraBroker() if settings.broker.enabled else CameraService()
 detection_service = DetectionService()
 tracking_service = TrackingService()
 scoring_service = ScoringService()
-dartboard_segmentation = DartboardSegmentation()
+calibration_store = CalibrationStore()
+
+# Memory pools reported by /debug/memory and trimmed to their MEMORY_* budgets
+memory.register(
+    "frame_buffers",
+    lambda: camera_service.memory_usage() + detection_service.memory_usage(),
+    shrink=lambda budget: camera_service.release_buffers() + detection_service.release_results(),
+    fixed=lambda: camera_service.fixed_memory() + detection_service.fixed_memory()
+)
+memory.register("codec_cache", image_codec.cache_bytes, shrink=image_codec.trim_cache)
+memory.register("tracks", tracking_service.memory_usage, shrink=tracking_service.trim_memory)
+memory.register("sessions", video_stream.queued_bytes, shrink=video_stream.trim_queues)
+memory.register("recording", frame_recorder.memory_usage)
 
 # Models for API requests/responses
 class CalibrationData(BaseModel):
@@ -48,19 +79,80 @@ class ScoreResponse(BaseModel):
     score: Score
     image: Optional[str] = None  # Base64 encoded image with visualizations
 
-@router.on_event("startup")
-async def startup_event():
-    """Start the camera service when the API starts"""
+# Background tasks (kept referenced so they are not garbage collected)
+warmup_task: Optional[asyncio.Task] = None
+background_task: Optional[asyncio.Task] = None
+memory_task: Optional[asyncio.Task] = None
+
+# WebSocket connections running their own live loop
+websocket_clients = 0
+
+MJPEG_BOUNDARY = b"frame"
+
+async def apply_calibration(calibration: Calibration, artifacts: CalibrationArtifacts):
+    """
+    Publish a stored calibration version (with its artifacts) to every service
+    Runs in a thread, since a broker subscriber may wait for room in the owner's control ring
+    """
+    await asyncio.to_thread(
+        camera_service.set_dartboard_calibration,
+        calibration.center_x, calibration.center_y, calibration.radius,
+        version=calibration.version, artifacts=artifacts,
+        image_size=(calibration.image_width, calibration.image_height)
+    )
+
+def frame_size() -> Tuple[int, int]:
+    """(width, height) of the live camera frames, falling back to the configured size"""
     try:
-        camera_service.start()
-        await detection_service.initialize()
+        frame, _, _ = camera_service.get_frame()
+        return frame.shape[1], frame.shape[0]
+    except CameraError:
+        return settings.camera.width, settings.camera.height
+
+async def warm_up_services():
+    """Restore calibration, open the camera, then load and warm up the model, without blocking API startup"""
+    try:
+        active = await asyncio.to_thread(calibration_store.load_active)
+        if active:
+            await apply_calibration(*active)
+    except Exception as e:
+        logger.error(f"Failed to load stored calibration: {e}")
+    
+    try:
+        await asyncio.to_thread(camera_service.start)
     except Exception as e:
         logger.error(f"Failed to start camera service: {e}")
+    
+    try:
+        await detection_service.initialize()
+        await detection_service.warmup()
+        metrics.set_gauge("dartify_startup_seconds", time.perf_counter() - STARTED_AT, {"phase": "ready"})
+    except Exception as e:
+        logger.error(f"Failed to initialize detection service: {e}")
+
+def readiness() -> Dict[str, bool]:
+    """Readiness of each component needed for live scoring"""
+    return {
+        "model": detection_service.ready,
+        "camera": camera_service.is_running,
+        "calibration": camera_service.calibrated
+    }
+
+@router.on_event("startup")
+async def startup_event():
+    """Start the camera service and model warm-up in the background when the API starts"""
+    global warmup_task, background_task, memory_task
+    warmup_task = asyncio.create_task(warm_up_services())
+    background_task = asyncio.create_task(background_pipeline())
+    memory_task = asyncio.create_task(memory.run())
 
 @router.on_event("shutdown")
 def shutdown_event():
-    """Stop the camera service when the API shuts down"""
+    """Stop the camera service, codec workers and inference workers when the API shuts down"""
     camera_service.stop()
+    image_codec.shutdown()
+    video_stream.shutdown()
+    detection_service.shutdown()
 
 @router.get("/status")
 async def get_status():
@@ -68,17 +160,20 @@ async def get_status():
     return {
         "is_running": camera_service.is_running,
         "camera_source": camera_service.source,
-        "model_loaded": detection_service.initialized
+        "model_loaded": detection_service.initialized,
+        "model_ready": detection_service.ready
     }
 
 @router.post("/calibration")
 async def set_calibration(data: CalibrationData):
-    """Set dartboard calibration parameters"""
+    """Set dartboard calibration parameters and store them as a new version"""
     try:
-        camera_service.set_dartboard_calibration(data.center_x, data.center_y, data.radius)
-        scoring_service.update_calibration(data.center_x, data.center_y, data.radius)
-        camera_service.enable_auto_calibration(False)
-        return {"status": "Calibration updated successfully"}
+        width, height = frame_size()
+        calibration, artifacts = await asyncio.to_thread(
+            calibration_store.save, data.center_x, data.center_y, data.radius, width, height
+        )
+        await apply_calibration(calibration, artifacts)
+        return {"status": "Calibration updated successfully", "version": calibration.version}
     except Exception as e:
         logger.error(f"Calibration error: {e}")
         raise HTTPException(
@@ -91,11 +186,15 @@ async def get_calibration():
     """Get current dartboard calibration parameters"""
     try:
         center, radius = camera_service.get_dartboard_calibration()
+        active = calibration_store.active
         return {
             "center_x": center[0],
             "center_y": center[1],
             "radius": radius,
-            "auto_calibrate": camera_service.auto_calibrate
+            "auto_calibrate": camera_service.auto_calibrate,
+            "version": active[0].version if active else None,
+            "active": calibration_state.current.to_dict(),
+            "preprocessing": camera_service.preprocessor.describe()
         }
     except Exception as e:
         logger.error(f"Calibration retrieval error: {e}")
@@ -104,11 +203,28 @@ async def get_calibration():
             detail=f"Failed to retrieve calibration: {str(e)}"
         )
 
+@router.get("/calibration/versions")
+async def list_calibration_versions():
+    """List the stored calibration versions for this camera"""
+    active = calibration_store.active
+    return {
+        "camera_id": calibration_store.camera_id,
+        "active_version": active[0].version if active else None,
+        "versions": [c.model_dump() for c in await asyncio.to_thread(calibration_store.versions)]
+    }
+
+@router.post("/calibration/versions/{version}/activate")
+async def activate_calibration_version(version: int):
+    """Hot-swap to a previously stored calibration version"""
+    calibration, artifacts = await asyncio.to_thread(calibration_store.activate, version)
+    await apply_calibration(calibration, artifacts)
+    return {"status": "Calibration activated successfully", "version": calibration.version}
+
 @router.post("/auto_calibration")
 async def set_auto_calibration(enable: bool = True):
     """Enable or disable auto-calibration of dartboard position"""
     try:
-        camera_service.enable_auto_calibration(enable)
+        await asyncio.to_thread(camera_service.enable_auto_calibration, enable)
         return {
             "status": f"Auto-calibration {'enabled' if enable else 'disabled'} successfully"
         }
@@ -126,10 +242,8 @@ async def detect_darts_in_image(request: ScoreRequest):
     Returns the score and a visualization image
     """
     try:
-        # Decode the base64 image
-        image_data = base64.b64decode(request.image)
-        nparr = np.frombuffer(image_data, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        # Decode the base64 image (in a codec worker)
+        frame = await image_codec.decode_base64(request.image)
         
         if frame is None:
             raise HTTPException(
@@ -138,23 +252,32 @@ async def detect_darts_in_image(request: ScoreRequest):
             )
         
         # Detect darts
-        detection_result = await detection_service.detect_darts(frame)
+        frame_id, trace = tracer.begin_upload()
+        detection_result = await detection_service.detect_darts(frame, frame_id, trace)
         
         # Update tracker
-        stable_darts = tracking_service.update(detection_result)
+        with time_stage(trace, "tracking"):
+            stable_darts = tracking_service.update(detection_result)
+        if trace is not None:
+            trace.record_tracking(tracking_service.tracked_darts.keys(), len(stable_darts))
         
         # Calculate score
-        score = scoring_service.calculate_score(
-            stable_darts,
-            frame.shape[1],
-            frame.shape[0]
-        )
+        with time_stage(trace, "scoring"):
+            score = scoring_service.calculate_score(
+                stable_darts,
+                frame.shape[1],
+                frame.shape[0]
+            )
+        if trace is not None:
+            trace.record_score(score)
         
         # Create visualization image
+        render_start = time.perf_counter()
         visualization = frame.copy()
         
         # Draw dartboard segmentation
-        visualization = dartboard_segmentation.draw_dartboard_overlay(visualization)
+        segmentation = calibration_state.current.segmentation_for(frame.shape[1], frame.shape[0])
+        visualization = segmentation.draw_dartboard_overlay(visualization)
         
         # Draw detections
         visualization = detection_service.draw_detections(visualization, detection_result)
@@ -186,10 +309,16 @@ async def detect_darts_in_image(request: ScoreRequest):
             2,
             cv2.LINE_AA
         )
+        if trace is not None:
+            trace.add_span("rendering", render_start, time.perf_counter())
+        else:
+            metrics.observe_stage("rendering", time.perf_counter() - render_start)
         
         # Encode visualization image to base64
-        _, buffer = cv2.imencode('.jpg', visualization)
-        visualization_base64 = base64.b64encode(buffer).decode('utf-8')
+        with time_stage(trace, "jpeg_encode"):
+            buffer = await image_codec.encode(visualization, 95)
+        with time_stage(trace, "base64"):
+            visualization_base64 = base64.b64encode(buffer).decode('utf-8')
         
         return ScoreResponse(
             score=score,
@@ -227,12 +356,211 @@ async def detect_darts_in_image(request: ScoreRequest):
             detail=f"An unexpected error occurred: {str(e)}"
         )
 
+async def run_pipeline(frame: np.ndarray, frame_id: int, timestamp: float, trace: Optional[FrameTrace]) -> Tuple[DartDetection, Score]:
+    """Detect, track and score one live frame, and emit the throw events it causes"""
+    # Detect darts (reusing the broker owner's result for this frame if there is one)
+    detection_result = None
+    if settings.broker.enabled:
+        detection_result = camera_service.get_detection(frame_id)
+    if detection_result is None:
+        if settings.tiling.enabled:
+            detection = detection_service.detect_darts_tiled(frame, frame_id, trace)
+        elif settings.cascade.enabled:
+            detection = detection_service.detect_darts_cascade(frame, frame_id, trace, tracking_service.tracked_positions())
+        else:
+            detection = detection_service.detect_darts(frame, frame_id, trace, inference_governor.image_size)
+        detection_result = await detection_service.in_frame_order(frame_id, detection)
+        detection_result.timestamp = timestamp
+        if settings.broker.enabled:
+            camera_service.publish_detection(detection_result)
+    
+    # Update tracker
+    with time_stage(trace, "tracking"):
+        stable_darts = tracking_service.update(detection_result)
+    if trace is not None:
+        trace.record_tracking(tracking_service.tracked_darts.keys(), len(stable_darts))
+    
+    # Calculate score
+    with time_stage(trace, "scoring"):
+        score = scoring_service.calculate_score(
+            stable_darts,
+            frame.shape[1],
+            frame.shape[0]
+        )
+    if trace is not None:
+        trace.record_score(score)
+    
+    # Emit dart-landed/removed events (once per frame, and only in the worker that owns the camera)
+    if not settings.broker.enabled or camera_service.is_owner:
+        throw_detector.update(score, frame_id, timestamp)
+    
+    return detection_result, score
+
+def render_visualization(frame: np.ndarray, detection_result: DartDetection, score: Score, trace: Optional[FrameTrace]) -> np.ndarray:
+    """Draw the board overlay, detections, tracks and score onto a copy of a live frame"""
+    render_start = time.perf_counter()
+    visualization = frame.copy()
+    
+    # Draw dartboard segmentation
+    segmentation = calibration_state.current.segmentation_for(frame.shape[1], frame.shape[0])
+    visualization = segmentation.draw_dartboard_overlay(visualization)
+    
+    # Draw detections
+    visualization = detection_service.draw_detections(visualization, detection_result)
+    
+    # Draw tracking
+    visualization = tracking_service.draw_tracking(visualization)
+    
+    # Draw score results
+    for dart_throw in score.throws:
+        draw_detection(
+            visualization,
+            dart_throw.x,
+            dart_throw.y,
+            f"{dart_throw.section.label} ({dart_throw.section.number * dart_throw.section.multiplier})"
+        )
+    
+    # Add total score text
+    cv2.putText(
+        visualization,
+        f"Total Score: {score.total_score}",
+        (20, 40),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        1.0,
+        (0, 0, 255),
+        2,
+        cv2.LINE_AA
+    )
+    if trace is not None:
+        trace.add_span("rendering", render_start, time.perf_counter())
+    else:
+        metrics.observe_stage("rendering", time.perf_counter() - render_start)
+    return visualization
+
+async def annotate_frame(frame: np.ndarray, frame_id: int, timestamp: float, detection_result: DartDetection, score: Score, trace: Optional[FrameTrace]) -> EncodedImage:
+    """
+    Render and JPEG-encode a live frame (in a codec worker, once per frame for all clients)
+    and publish it to the MJPEG and video viewers
+    """
+    visualization = render_visualization(frame, detection_result, score, trace)
+    if video_stream.viewer_count:
+        video_stream.publish(frame_id, timestamp, visualization, video_metadata(score, frame_id, timestamp, game_engine.checkout()))
+    with time_stage(trace, "jpeg_encode"):
+        encoded = await image_codec.encode_frame(frame_id, visualization, settings.stream.jpeg_quality)
+    annotated_stream.publish(frame_id, encoded)
+    return encoded
+
+async def background_pipeline():
+    """
+    Run the live pipeline while no WebSocket client does: for MJPEG and video viewers, and
+    otherwise at the governor's minimum rate (or the fixed rate with the governor disabled),
+    so throws are still detected without anybody watching
+    """
+    while True:
+        viewers = annotated_stream.viewers + video_stream.viewer_count
+        skip = websocket_clients > 0 or not camera_service.is_running or not detection_service.ready
+        if not viewers:
+            # Without viewers only the worker that owns the camera keeps detecting throws
+            skip = skip or (settings.broker.enabled and not camera_service.is_owner)
+        if skip:
+            await asyncio.sleep(1.0 / inference_governor.min_rate)
+            continue
+        
+        loop_start = time.perf_counter()
+        try:
+            frame, frame_id, timestamp = camera_service.get_frame()
+            inference_governor.observe_frame(frame)
+            trace = tracer.begin(frame_id, "background", timestamp)
+            detection_result, score = await run_pipeline(frame, frame_id, timestamp, trace)
+            if viewers:
+                await annotate_frame(frame, frame_id, timestamp, detection_result, score, trace)
+        except Exception as e:
+            logger.warning(f"Background pipeline failed: {e}")
+        
+        elapsed = time.perf_counter() - loop_start
+        inference_governor.record_frame(elapsed)
+        await asyncio.sleep(inference_governor.delay(elapsed))
+
+async def mjpeg_parts(max_fps: float):
+    """multipart/x-mixed-replace body: one JPEG part per frame, for as long as the viewer reads"""
+    inference_governor.client_connected()
+    try:
+        async for encoded in annotated_stream.subscribe(max_fps):
+            yield b"--" + MJPEG_BOUNDARY + b"\r\nContent-Type: image/jpeg\r\nContent-Length: " + str(len(encoded.data)).encode() + b"\r\n\r\n"
+            yield encoded.data
+            yield b"\r\n"
+    finally:
+        inference_governor.client_disconnected()
+
+@router.get("/mjpeg")
+async def mjpeg_stream(fps: Optional[float] = Query(None, gt=0)):
+    """
+    Annotated live video as MJPEG (multipart/x-mixed-replace), for displays and OBS
+    Frames come from the shared pipeline; a slow viewer skips frames instead of falling behind
+    """
+    if not camera_service.is_running:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Camera is not running"
+        )
+    max_fps = min(fps or settings.stream.mjpeg_max_fps, settings.stream.mjpeg_max_fps)
+    return StreamingResponse(
+        mjpeg_parts(max_fps),
+        media_type=f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY.decode()}",
+        headers={"Cache-Control": "no-cache, no-store", "Pragma": "no-cache"}
+    )
+
+@router.websocket("/video")
+async def video_websocket(websocket: WebSocket):
+    """
+    Annotated live video as H.264 in fragmented MP4, for MediaSource players.
+    Text messages are JSON: {"type": "init", "mime": ...} before each binary init segment,
+    and {"type": "frame", ...score metadata} before the binary media segment of each frame.
+    """
+    await websocket.accept()
+    if not video_stream.available:
+        await websocket.send_json({"error": "Video streaming needs PyAV (pip install av)"})
+        await websocket.close()
+        return
+    
+    inference_governor.client_connected()
+    try:
+        async for kind, payload in video_stream.subscribe():
+            if kind == INIT and isinstance(payload, str):
+                await websocket.send_text(json.dumps({"type": "init", "mime": payload}))
+            elif kind == FRAME:
+                await websocket.send_text(payload)
+            elif kind in (INIT, MEDIA):
+                await websocket.send_bytes(payload)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.warning(f"Video stream closed: {e}")
+    finally:
+        inference_governor.client_disconnected()
+
+@router.get("/governor")
+async def get_governor():
+    """Current operating point of the inference governor (rate, model input size, load)"""
+    return inference_governor.operating_point()
+
+@router.get("/inference_workers")
+async def get_inference_workers():
+    """Health, load and transport of each remote inference worker"""
+    if detection_service.remote is None:
+        return {"enabled": settings.remote.enabled, "workers": []}
+    return {"enabled": True, **detection_service.remote.status()}
+
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """
     WebSocket endpoint for real-time dart detection and scoring
     """
+    global websocket_clients
     await websocket.accept()
+    metrics.inc_gauge("dartify_websocket_clients", 1)
+    inference_governor.client_connected()
+    websocket_clients += 1
     
     try:
         # Start camera if not already running
@@ -249,79 +577,40 @@ async def websocket_endpoint(websocket: WebSocket):
         # Heartbeat counter
         heartbeat_counter = 0
         
+        # Each connection traces its frames under its own source name
+        trace_source = f"ws-{id(websocket):x}"
+        
         while True:
             # Get the latest frame
             frame, frame_id, timestamp = camera_service.get_frame()
             
-            # Detect darts
-            detection_result = await detection_service.detect_darts(frame)
-            detection_result.frame_id = frame_id
-            detection_result.timestamp = timestamp
-            
-            # Update tracker
-            stable_darts = tracking_service.update(detection_result)
-            
-            # Calculate score
-            score = scoring_service.calculate_score(
-                stable_darts,
-                frame.shape[1],
-                frame.shape[0]
-            )
-            
-            # Create visualization image
-            visualization = frame.copy()
-            
-            # Draw dartboard segmentation
-            visualization = dartboard_segmentation.draw_dartboard_overlay(visualization)
+            loop_start = time.perf_counter()
+            inference_governor.observe_frame(frame)
+            trace = tracer.begin(frame_id, trace_source, timestamp)
+            detection_result, score = await run_pipeline(frame, frame_id, timestamp, trace)
             
-            # Draw detections
-            visualization = detection_service.draw_detections(visualization, detection_result)
-            
-            # Draw tracking
-            visualization = tracking_service.draw_tracking(visualization)
-            
-            # Draw score results
-            for dart_throw in score.throws:
-                draw_detection(
-                    visualization,
-                    dart_throw.x,
-                    dart_throw.y,
-                    f"{dart_throw.section.label} ({dart_throw.section.number * dart_throw.section.multiplier})"
-                )
-            
-            # Add total score text
-            cv2.putText(
-                visualization,
-                f"Total Score: {score.total_score}",
-                (20, 40),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                1.0,
-                (0, 0, 255),
-                2,
-                cv2.LINE_AA
-            )
-            
-            # Compress and encode the image for web transmission (lower quality for websocket)
-            _, buffer = cv2.imencode('.jpg', visualization, [cv2.IMWRITE_JPEG_QUALITY, 70])
-            visualization_base64 = base64.b64encode(buffer).decode('utf-8')
+            # Draw and encode the annotated frame, and share it with the MJPEG viewers
+            encoded = await annotate_frame(frame, frame_id, timestamp, detection_result, score, trace)
+            with time_stage(trace, "base64"):
+                visualization_base64 = await image_codec.base64(encoded)
             
             # Prepare WebSocket message
-            message = {
-                "score": score.dict(),
-                "frame_id": frame_id,
-                "timestamp": timestamp,
-                "image": visualization_base64,
-                "heartbeat": heartbeat_counter
-            }
+            with time_stage(trace, "serialize"):
+                message = stream_message(
+                    score, frame_id, timestamp, heartbeat_counter, visualization_base64, game_engine.checkout()
+                )
             
             # Send the message
-            await websocket.send_text(json.dumps(message))
+            with time_stage(trace, "websocket_send"):
+                await websocket.send_text(message)
             
             # Increment heartbeat counter
             heartbeat_counter += 1
             
-            # Wait a short time to avoid overwhelming the WebSocket
-            await asyncio.sleep(0.1)
+            # Wait until the next frame is due at the governor's current rate
+            elapsed = time.perf_counter() - loop_start
+            inference_governor.record_frame(elapsed)
+            await asyncio.sleep(inference_governor.delay(elapsed))
     
     except WebSocketDisconnect:
         logger.info("WebSocket client disconnected")
@@ -336,4 +625,6 @@ async def websocket_endpoint(websocket: WebSocket):
             pass
     finally:
         # No need to stop the camera service here, as it might be used by other clients
-        pass
\ No newline at end of file
+        metrics.inc_gauge("dartify_websocket_clients", -1)
+        inference_governor.client_disconnected()
+        websocket_clients -= 1
\ No newline at end of file
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import FileResponse, JSONResponse
+import asyncio
+import logging
+from ..services.frame_recorder import frame_recorder
+from ..services.throw_detector import throw_detector
+from .camera import camera_service
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/clips",
+    tags=["clips"],
+    responses={404: {"description": "Not found"}}
+)
+
+throw_detector.on_landed(frame_recorder.on_dart_landed)
+throw_detector.on_removed(frame_recorder.on_dart_removed)
+
+@router.on_event("startup")
+def startup_event():
+    """Record frames from the camera in the process that captures them"""
+    # With the camera broker only the owning worker captures frames (and records throws),
+    # so the pre-roll ring is mapped when capture starts rather than in every worker
+    camera_service.add_start_listener(frame_recorder.start)
+    camera_service.add_frame_listener(frame_recorder.write_frame)
+
+@router.on_event("shutdown")
+def shutdown_event():
+    """Stop the clip writer"""
+    frame_recorder.stop()
+
+@router.get("")
+async def list_clips(limit: int = Query(50, ge=1, le=1000)):
+    """Recorded clips, newest first"""
+    clips = await asyncio.to_thread(frame_recorder.list_clips)
+    return {"enabled": frame_recorder.enabled, "clips": clips[:limit]}
+
+@router.get("/{event_id}")
+async def get_clip(event_id: str):
+    """
+    Video clip around an event (the throw id for landed darts)
+    Returns 202 while the post-roll is still being captured
+    """
+    clip_status, path = frame_recorder.clip_status(event_id)
+    if clip_status == "pending":
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={"status": "Clip is still being recorded", "event_id": event_id}
+        )
+    if clip_status == "missing":
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No clip for event {event_id}"
+        )
+    return FileResponse(path, media_type="video/mp4", filename=f"{event_id}.mp4")
@@ -0,0 +1,120 @@
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+import asyncio
+import logging
+import threading
+from ..core.config import settings
+from ..core.memory import memory
+from ..core.profiling import profiler
+from ..core.tracing import tracer
+from ..services.camera_service import CAPTURE_THREAD_NAME
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/debug",
+    tags=["debug"],
+    responses={404: {"description": "Not found"}}
+)
+
+@router.get("/traces")
+async def get_traces(
+    limit: int = Query(100, ge=1, le=10000),
+    format: str = Query("json", pattern="^(json|chrome)$")
+):
+    """
+    Dump the traces of the last frames (per-stage timings, detections, track IDs and score)
+    Use format=chrome to get Chrome trace JSON for chrome://tracing or Perfetto
+    """
+    if format == "chrome":
+        return JSONResponse(
+            tracer.chrome_trace(limit),
+            headers={"Content-Disposition": "attachment; filename=dartify-trace.json"}
+        )
+    return {
+        "enabled": tracer.enabled,
+        "capacity": tracer.capacity,
+        "traces": tracer.dump(limit)
+    }
+
+@router.post("/profile")
+async def run_profile(
+    duration: float = Query(5.0, gt=0),
+    interval: float = Query(0.005, ge=0.001, le=1.0),
+    threads: str = Query("pipeline", pattern="^(pipeline|all)$"),
+    format: str = Query("json", pattern="^(json|collapsed)$"),
+    limit: int = Query(30, ge=1, le=1000)
+):
+    """
+    Sample the live pipeline for a bounded window and return hot functions
+    threads=pipeline samples the camera capture thread and the event loop; threads=all samples every thread
+    format=collapsed returns stacks ready for flamegraph.pl or speedscope
+    """
+    if not settings.profiling.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Profiling is disabled"
+        )
+    if duration > settings.profiling.max_duration:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Duration must not exceed {settings.profiling.max_duration} seconds"
+        )
+    
+    thread_ids = None
+    if threads == "pipeline":
+        # This handler runs on the event loop thread, which drives every WebSocket pipeline
+        thread_ids = {threading.get_ident()}
+        thread_ids.update(t.ident for t in threading.enumerate() if t.name == CAPTURE_THREAD_NAME)
+    
+    result = await asyncio.to_thread(profiler.run, duration, interval, thread_ids)
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A profiling window is already in progress"
+        )
+    
+    logger.info(f"Profiled {result.samples} samples over {result.duration:.1f}s")
+    if format == "collapsed":
+        return PlainTextResponse(
+            result.collapsed(),
+            headers={"Content-Disposition": "attachment; filename=dartify-profile.collapsed"}
+        )
+    return result.to_dict(limit)
+
+@router.get("/memory")
+async def get_memory():
+    """
+    Bytes held by each memory pool (frame buffers, codec cache, track state, viewer sessions,
+    recording ring) against its MEMORY_* budget, evictions so far and the process RSS
+    """
+    return memory.report()
+
+@router.get("/memory/allocations")
+async def get_allocations(
+    limit: int = Query(20, ge=1, le=200),
+    locations: int = Query(5, ge=1, le=50)
+):
+    """
+    Top live allocations by subsystem (app module or third-party package) from tracemalloc, with the largest allocation sites of each
+    Tracing starts with the first request (or at startup with MEMORY_TRACEMALLOC), so only later allocations are seen
+    """
+    if not settings.profiling.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Profiling is disabled"
+        )
+    started = memory.start_tracing()
+    result = await asyncio.to_thread(memory.allocations, limit, locations)
+    return {"started": started, **result}
+
+@router.delete("/memory/allocations")
+async def stop_allocation_tracing():
+    """Stop tracemalloc, which slows down every allocation while it runs"""
+    if not settings.profiling.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Profiling is disabled"
+        )
+    memory.stop_tracing()
+    return {"tracing": False}
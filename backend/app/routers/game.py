@@ -0,0 +1,88 @@
+from fastapi import APIRouter, HTTPException, Query, status
+import asyncio
+import logging
+from typing import List, Optional
+from ..models.game import GameRequest, GameStatus, ManualThrow
+from ..services.game_engine import game_engine
+from ..services.throw_detector import throw_detector
+from ..utils.checkout import checkout_table_for
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/game",
+    tags=["game"],
+    responses={404: {"description": "Not found"}}
+)
+
+throw_detector.on_landed(game_engine.on_dart_landed)
+throw_detector.on_removed(game_engine.on_dart_removed)
+
+@router.on_event("startup")
+async def startup_event():
+    """Build the checkout table and recover the game that was in progress when the server stopped"""
+    await asyncio.to_thread(checkout_table_for)
+    try:
+        await asyncio.to_thread(game_engine.recover)
+    except Exception as e:
+        logger.error(f"Failed to recover game: {e}")
+
+def current_status() -> GameStatus:
+    game_status = game_engine.status()
+    if game_status is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No game in progress"
+        )
+    return game_status
+
+@router.post("", response_model=GameStatus)
+async def start_game(request: GameRequest):
+    """Start a game (501, 301 or Cricket); darts detected on the board are scored for the current player"""
+    return await asyncio.to_thread(game_engine.start_game, request)
+
+@router.get("", response_model=GameStatus)
+async def get_game():
+    """State of the game in progress"""
+    return current_status()
+
+@router.delete("")
+async def stop_game():
+    """End the game in progress"""
+    game_engine.stop_game()
+    return {"status": "Game ended"}
+
+@router.post("/throw", response_model=GameStatus)
+async def add_throw(throw: ManualThrow):
+    """Enter a dart by hand"""
+    game_engine.add_throw(throw.number, throw.multiplier)
+    return current_status()
+
+@router.post("/next_turn", response_model=GameStatus)
+async def next_turn():
+    """End the current turn (e.g. when darts missed the board)"""
+    game_engine.end_turn()
+    return current_status()
+
+@router.post("/undo", response_model=GameStatus)
+async def undo():
+    """Take back the last dart"""
+    game_engine.undo()
+    return current_status()
+
+@router.get("/checkout")
+async def get_checkout(
+    remaining: int = Query(..., ge=1, le=180),
+    darts: int = Query(3, ge=1, le=3),
+    double_out: bool = True,
+    favourite_doubles: Optional[List[int]] = Query(None),
+    avoid_bull: Optional[bool] = None
+):
+    """Suggested finish for a remaining score; preferences default to the configured ones"""
+    table = await asyncio.to_thread(checkout_table_for, favourite_doubles, avoid_bull)
+    return {
+        "remaining": remaining,
+        "darts": darts,
+        "double_out": double_out,
+        "checkout": table.suggest(remaining, darts, double_out)
+    }
@@ -0,0 +1,112 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import Response
+import asyncio
+import logging
+from typing import List, Optional
+from pydantic import BaseModel
+from ..core.config import settings
+from ..core.memory import memory
+from ..models.throw import ThrowRecord, ThrowStats
+from ..services.heatmap_service import heatmap_service
+from ..services.throw_detector import throw_detector
+from ..services.throw_store import throw_store
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/throws",
+    tags=["throws"],
+    responses={404: {"description": "Not found"}}
+)
+
+if settings.throws.enabled:
+    throw_detector.on_landed(throw_store.record)
+throw_detector.on_landed(heatmap_service.add)
+memory.register("heatmap_cache", heatmap_service.cache_bytes, shrink=heatmap_service.trim_cache)
+
+class SessionRequest(BaseModel):
+    session_id: Optional[str] = None
+    player: Optional[str] = None
+
+@router.on_event("startup")
+async def startup_event():
+    """Open the throw store and build the heatmaps from its history"""
+    if settings.throws.enabled:
+        await asyncio.to_thread(throw_store.start)
+        positions = await asyncio.to_thread(throw_store.positions)
+        await asyncio.to_thread(heatmap_service.load, positions)
+
+@router.on_event("shutdown")
+def shutdown_event():
+    """Write the queued throws and close the throw store"""
+    throw_store.stop()
+
+@router.get("/session")
+async def get_session():
+    """Current session, player and darts on the board"""
+    return {
+        "session_id": throw_detector.session_id,
+        "player": throw_detector.player,
+        "board_id": throw_detector.board_id,
+        "darts_on_board": throw_detector.darts_on_board()
+    }
+
+@router.post("/session")
+async def start_session(data: SessionRequest):
+    """Start a new session, optionally with the first player"""
+    session_id = throw_detector.start_session(data.session_id)
+    throw_detector.set_player(data.player)
+    return {"status": "Session started", "session_id": session_id, "player": data.player}
+
+@router.put("/player")
+async def set_player(player: Optional[str] = None):
+    """Attribute the next throws to a player (none to stop attributing)"""
+    throw_detector.set_player(player)
+    return {"status": "Player updated", "player": player}
+
+@router.get("/players")
+async def list_players():
+    """Players with recorded throws"""
+    return {"players": throw_store.players()}
+
+@router.get("/stats", response_model=ThrowStats)
+async def get_stats(player: Optional[str] = None):
+    """Aggregated statistics of a player, or of all throws without a player given"""
+    return throw_store.stats(player)
+
+@router.get("/recent", response_model=List[ThrowRecord])
+async def get_recent_throws(
+    limit: int = Query(50, ge=1, le=1000),
+    player: Optional[str] = None,
+    session_id: Optional[str] = None
+):
+    """Most recently recorded throws, newest first"""
+    return await asyncio.to_thread(throw_store.recent, limit, player, session_id)
+
+@router.get("/heatmap")
+async def get_heatmap(
+    player: Optional[str] = None,
+    board_id: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|png)$"),
+    size: int = Query(512, ge=64, le=2048),
+    blur: float = Query(1.0, ge=0.0, le=10.0),
+    board: bool = True
+):
+    """
+    Where darts land, as a 2D histogram in board coordinates (board radii from the center)
+    format=png renders it with the board outline; renders are cached until new throws arrive
+    """
+    if format == "png":
+        png = await asyncio.to_thread(heatmap_service.render_png, player, board_id, size, blur, board)
+        return Response(content=png, media_type="image/png")
+    
+    histogram, version = heatmap_service.histogram(player, board_id)
+    return {
+        "player": player,
+        "board_id": board_id,
+        "bins": heatmap_service.bins,
+        "extent": heatmap_service.extent,
+        "version": version,
+        "darts": int(histogram.sum()),
+        "counts": histogram.tolist()
+    }
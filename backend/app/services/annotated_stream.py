@@ -0,0 +1,63 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Optional
+from ..core.metrics import metrics
+from .image_codec import EncodedImage
+
+logger = logging.getLogger(__name__)
+
+
+class AnnotatedStream:
+    """
+    Latest annotated, JPEG-encoded live frame, shared by every passive viewer.
+    The live pipeline publishes each frame once; every subscriber gets the newest frame
+    whenever it is ready for one, so a slow reader skips frames instead of queueing them,
+    and serving a viewer costs only its socket writes.
+    Used from the event loop only.
+    """
+
+    def __init__(self):
+        self.latest: Optional[EncodedImage] = None
+        self.frame_id: Optional[int] = None
+        self.version = 0
+        self.viewers = 0
+        self.changed = asyncio.Event()
+
+    def publish(self, frame_id: int, encoded: EncodedImage):
+        if frame_id == self.frame_id:
+            return
+        self.latest = encoded
+        self.frame_id = frame_id
+        self.version += 1
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self, max_fps: float) -> AsyncIterator[EncodedImage]:
+        """Yield the newest frame, at most max_fps times per second, dropping frames the reader was too slow for"""
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / max_fps
+        # A new viewer gets the current frame right away
+        seen = self.version - 1 if self.latest is not None else self.version
+        sent = False
+        due = loop.time()
+        self.viewers += 1
+        metrics.set_gauge("dartify_stream_viewers", self.viewers)
+        try:
+            while True:
+                if self.version == seen or self.latest is None:
+                    await self.changed.wait()
+                    continue
+                delay = due - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if sent and self.version - seen > 1:
+                    metrics.inc_counter("dartify_stream_dropped_frames_total", self.version - seen - 1)
+                seen = self.version
+                sent = True
+                due = loop.time() + interval
+                yield self.latest
+        finally:
+            self.viewers -= 1
+            metrics.set_gauge("dartify_stream_viewers", self.viewers)
+
+annotated_stream = AnnotatedStream()
@@ -0,0 +1,211 @@
+import logging
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+from ..core.config import settings
+from ..core.metrics import metrics
+from ..utils.dartboard_segmentation import DartboardSegmentation
+from .calibration_store import CalibrationArtifacts
+
+logger = logging.getLogger(__name__)
+
+class ActiveCalibration:
+    """
+    Immutable snapshot of the dartboard calibration.
+    A new snapshot is created for every change, so readers can hold on to one for a
+    whole frame without locking and without seeing a half-updated calibration.
+    """
+
+    __slots__ = (
+        "revision", "center_x", "center_y", "radius", "image_width", "image_height",
+        "source", "version", "artifacts", "created_at", "segmentation", "plain_segmentation",
+    )
+
+    def __init__(
+        self,
+        revision: int,
+        center_x: int,
+        center_y: int,
+        radius: int,
+        image_width: int,
+        image_height: int,
+        source: str,
+        version: Optional[int] = None,
+        artifacts: Optional[CalibrationArtifacts] = None,
+    ):
+        self.revision = revision
+        self.center_x = center_x
+        self.center_y = center_y
+        self.radius = radius
+        self.image_width = image_width
+        self.image_height = image_height
+        self.source = source
+        self.version = version
+        self.artifacts = artifacts
+        self.created_at = time.time()
+
+        # Geometry-only segmentation, used when a frame does not match the artifact size
+        self.plain_segmentation = DartboardSegmentation()
+        self.plain_segmentation.update_calibration(center_x, center_y, radius)
+        if artifacts is None:
+            self.segmentation = self.plain_segmentation
+        else:
+            self.segmentation = DartboardSegmentation()
+            self.segmentation.update_calibration(center_x, center_y, radius)
+            artifacts.apply_to(self.segmentation)
+
+    @property
+    def center(self) -> Tuple[int, int]:
+        return self.center_x, self.center_y
+
+    def segmentation_for(self, image_width: int, image_height: int) -> DartboardSegmentation:
+        """Segmentation to use for a frame of the given size (artifacts only match one size)"""
+        if image_width == self.image_width and image_height == self.image_height:
+            return self.segmentation
+        return self.plain_segmentation
+
+    def matches(self, center_x: int, center_y: int, radius: int, image_width: int, image_height: int, tolerance: int = 0) -> bool:
+        return (
+            abs(center_x - self.center_x) <= tolerance
+            and abs(center_y - self.center_y) <= tolerance
+            and abs(radius - self.radius) <= tolerance
+            and image_width == self.image_width
+            and image_height == self.image_height
+        )
+
+    def with_artifacts(self, artifacts: CalibrationArtifacts) -> "ActiveCalibration":
+        return ActiveCalibration(
+            self.revision, self.center_x, self.center_y, self.radius,
+            self.image_width, self.image_height, self.source, self.version, artifacts
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "revision": self.revision,
+            "center_x": self.center_x,
+            "center_y": self.center_y,
+            "radius": self.radius,
+            "image_width": self.image_width,
+            "image_height": self.image_height,
+            "source": self.source,
+            "version": self.version,
+            "precomputed": self.artifacts is not None,
+        }
+
+class CalibrationState:
+    """
+    Single source of truth for the calibration used by every service.
+    Readers use `current`, a plain attribute that is swapped atomically; only writers
+    take the lock. Artifacts for a new revision are precomputed once, in a background
+    thread, and the snapshot is swapped again when they are ready.
+    """
+
+    def __init__(self):
+        self.current = ActiveCalibration(
+            revision=0,
+            center_x=settings.dartboard.center_x,
+            center_y=settings.dartboard.center_y,
+            radius=settings.dartboard.radius,
+            image_width=settings.camera.width,
+            image_height=settings.camera.height,
+            source="env",
+        )
+        self.lock = threading.Lock()
+        self.pending = threading.Condition(self.lock)
+        self.pending_snapshot: Optional[ActiveCalibration] = None
+        self.worker: Optional[threading.Thread] = None
+        self.listeners: List[Callable[[ActiveCalibration], None]] = []
+
+    def subscribe(self, listener: Callable[[ActiveCalibration], None]):
+        """Register a callback invoked with every new snapshot"""
+        self.listeners.append(listener)
+
+    def publish(
+        self,
+        center_x: int,
+        center_y: int,
+        radius: int,
+        image_width: Optional[int] = None,
+        image_height: Optional[int] = None,
+        source: str = "manual",
+        version: Optional[int] = None,
+        artifacts: Optional[CalibrationArtifacts] = None,
+        wait: bool = False,
+    ) -> ActiveCalibration:
+        """
+        Make a new calibration current.
+        Without artifacts, they are precomputed in the background (or before returning if wait is set).
+        Publishing the current values again is a no-op.
+        """
+        image_width = image_width or self.current.image_width
+        image_height = image_height or self.current.image_height
+
+        with self.lock:
+            current = self.current
+            if artifacts is None and version is None and current.matches(center_x, center_y, radius, image_width, image_height):
+                return current
+
+            if artifacts is None and wait:
+                artifacts = CalibrationArtifacts.compute(center_x, center_y, radius, image_width, image_height)
+
+            snapshot = ActiveCalibration(
+                current.revision + 1, center_x, center_y, radius,
+                image_width, image_height, source, version, artifacts
+            )
+            self.current = snapshot
+
+            if artifacts is None:
+                self._schedule_precompute(snapshot)
+
+        metrics.set_gauge("dartify_calibration_revision", snapshot.revision)
+        logger.info(
+            f"Calibration revision {snapshot.revision} from {source}: "
+            f"center=({center_x}, {center_y}), radius={radius}"
+        )
+        self._notify(snapshot)
+        return snapshot
+
+    def _notify(self, snapshot: ActiveCalibration):
+        for listener in self.listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logger.error(f"Calibration listener error: {e}")
+
+    def _schedule_precompute(self, snapshot: ActiveCalibration):
+        """Hand the snapshot to the precompute thread (called with the lock held)"""
+        self.pending_snapshot = snapshot
+        if self.worker is None or not self.worker.is_alive():
+            self.worker = threading.Thread(target=self._precompute_loop, name="calibration-precompute", daemon=True)
+            self.worker.start()
+        self.pending.notify()
+
+    def _precompute_loop(self):
+        """Compute artifacts for the newest pending revision; older pending revisions are skipped"""
+        while True:
+            with self.lock:
+                while self.pending_snapshot is None:
+                    self.pending.wait()
+                snapshot = self.pending_snapshot
+                self.pending_snapshot = None
+
+            try:
+                start = time.perf_counter()
+                artifacts = CalibrationArtifacts.compute(
+                    snapshot.center_x, snapshot.center_y, snapshot.radius,
+                    snapshot.image_width, snapshot.image_height
+                )
+                metrics.observe_stage("calibration_precompute", time.perf_counter() - start)
+            except Exception as e:
+                logger.error(f"Failed to precompute calibration artifacts: {e}")
+                continue
+
+            with self.lock:
+                # Only install the artifacts if no newer calibration was published meanwhile
+                if self.current.revision != snapshot.revision:
+                    continue
+                completed = snapshot.with_artifacts(artifacts)
+                self.current = completed
+            self._notify(completed)
+
+calibration_state = CalibrationState()
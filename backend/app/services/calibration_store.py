@@ -0,0 +1,201 @@
+import io
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import List, Optional, Tuple
+import numpy as np
+from ..core.config import settings
+from ..core.exceptions import CalibrationError, CalibrationNotFoundError
+from ..models.calibration import Calibration
+from ..utils.dartboard_segmentation import DartboardSegmentation, build_score_raster
+
+logger = logging.getLogger(__name__)
+
+def default_camera_id() -> str:
+    """Camera id from CAMERA_ID, or a file-system safe name derived from the camera source"""
+    camera_id = settings.camera.camera_id or settings.camera.source
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", camera_id).strip("._") or "default"
+
+def atomic_write(path: str, data: bytes):
+    """Write data to path so readers only ever see the old or the complete new file"""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+class CalibrationArtifacts:
+    """Data derived from a calibration, computed once per version and persisted with it"""
+
+    def __init__(self, score_raster: np.ndarray, overlay_layer: np.ndarray, overlay_index: np.ndarray):
+        self.score_raster = score_raster
+        self.overlay_layer = overlay_layer
+        self.overlay_index = overlay_index
+
+        # Artifacts are shared between consumers and must never be modified in place
+        for array in (self.score_raster, self.overlay_layer, self.overlay_index):
+            array.flags.writeable = False
+
+    @classmethod
+    def compute(cls, center_x: int, center_y: int, radius: int, image_width: int, image_height: int) -> "CalibrationArtifacts":
+        """Compute the score raster and the overlay layer for a board position and frame size"""
+        segmentation = DartboardSegmentation()
+        segmentation.update_calibration(center_x, center_y, radius)
+        score_raster = build_score_raster(center_x, center_y, radius, image_width, image_height)
+        overlay_layer, overlay_index = segmentation.render_overlay_layer(image_width, image_height)
+        return cls(score_raster, overlay_layer, overlay_index)
+
+    @classmethod
+    def build(cls, calibration: Calibration) -> "CalibrationArtifacts":
+        """Compute the artifacts for a stored calibration"""
+        return cls.compute(
+            calibration.center_x, calibration.center_y, calibration.radius,
+            calibration.image_width, calibration.image_height
+        )
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            score_raster=self.score_raster,
+            overlay_layer=self.overlay_layer,
+            overlay_index=self.overlay_index
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_file(cls, path: str) -> "CalibrationArtifacts":
+        with np.load(path) as data:
+            return cls(data["score_raster"], data["overlay_layer"], data["overlay_index"])
+
+    def apply_to(self, segmentation: DartboardSegmentation):
+        segmentation.set_artifacts(self.score_raster, self.overlay_layer, self.overlay_index)
+
+class CalibrationStore:
+    """
+    Versioned, per-camera calibration store on the local file system.
+    Layout: <store_dir>/<camera_id>/v000001.json (calibration), v000001.npz (artifacts)
+    and active.json (the active version). Every file is replaced atomically, and the
+    in-memory active version is swapped as a single reference.
+    """
+
+    def __init__(self, root: Optional[str] = None, camera_id: Optional[str] = None):
+        self.root = root or settings.calibration.store_dir
+        self.camera_id = camera_id or default_camera_id()
+        self.directory = os.path.join(self.root, self.camera_id)
+        self.keep_versions = settings.calibration.keep_versions
+        self.lock = threading.Lock()
+        self.active: Optional[Tuple[Calibration, CalibrationArtifacts]] = None
+
+    def _path(self, version: int, extension: str) -> str:
+        return os.path.join(self.directory, f"v{version:06d}.{extension}")
+
+    def _active_path(self) -> str:
+        return os.path.join(self.directory, "active.json")
+
+    def versions(self) -> List[Calibration]:
+        """All stored versions for this camera, oldest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        calibrations = []
+        for name in sorted(os.listdir(self.directory)):
+            if re.fullmatch(r"v\d{6}\.json", name):
+                with open(os.path.join(self.directory, name)) as f:
+                    calibrations.append(Calibration.model_validate_json(f.read()))
+        return calibrations
+
+    def get(self, version: int) -> Calibration:
+        path = self._path(version, "json")
+        if not os.path.exists(path):
+            raise CalibrationNotFoundError(f"Calibration version {version} not found for camera {self.camera_id}")
+        with open(path) as f:
+            return Calibration.model_validate_json(f.read())
+
+    def _load_artifacts(self, calibration: Calibration) -> CalibrationArtifacts:
+        """Load persisted artifacts, rebuilding them if they are missing or unreadable"""
+        path = self._path(calibration.version, "npz")
+        try:
+            return CalibrationArtifacts.from_file(path)
+        except Exception as e:
+            logger.warning(f"Rebuilding calibration artifacts for version {calibration.version}: {e}")
+            artifacts = CalibrationArtifacts.build(calibration)
+            atomic_write(path, artifacts.to_bytes())
+            return artifacts
+
+    def load_active(self) -> Optional[Tuple[Calibration, CalibrationArtifacts]]:
+        """Load the active calibration and its artifacts from disk, if one was saved"""
+        path = self._active_path()
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            version = json.load(f)["version"]
+        calibration = self.get(version)
+        self.active = (calibration, self._load_artifacts(calibration))
+        logger.info(f"Loaded calibration version {version} for camera {self.camera_id}")
+        return self.active
+
+    def save(self, center_x: int, center_y: int, radius: int, image_width: int, image_height: int, source: str = "manual") -> Tuple[Calibration, CalibrationArtifacts]:
+        """Persist a new calibration version with its artifacts and make it the active one"""
+        if radius <= 0:
+            raise CalibrationError("Radius must be positive")
+
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            existing = self.versions()
+            version = existing[-1].version + 1 if existing else 1
+            calibration = Calibration(
+                camera_id=self.camera_id,
+                version=version,
+                center_x=center_x,
+                center_y=center_y,
+                radius=radius,
+                image_width=image_width,
+                image_height=image_height,
+                source=source,
+                created_at=time.time()
+            )
+            artifacts = CalibrationArtifacts.build(calibration)
+
+            # Artifacts first, so a version is never visible without them
+            atomic_write(self._path(version, "npz"), artifacts.to_bytes())
+            atomic_write(self._path(version, "json"), calibration.model_dump_json().encode("utf-8"))
+            self._set_active(calibration, artifacts)
+            self._prune(existing + [calibration])
+
+        logger.info(f"Saved calibration version {version} for camera {self.camera_id}")
+        return calibration, artifacts
+
+    def activate(self, version: int) -> Tuple[Calibration, CalibrationArtifacts]:
+        """Switch to a previously saved version"""
+        with self.lock:
+            calibration = self.get(version)
+            artifacts = self._load_artifacts(calibration)
+            self._set_active(calibration, artifacts)
+        logger.info(f"Activated calibration version {version} for camera {self.camera_id}")
+        return calibration, artifacts
+
+    def _set_active(self, calibration: Calibration, artifacts: CalibrationArtifacts):
+        atomic_write(self._active_path(), json.dumps({"version": calibration.version}).encode("utf-8"))
+        self.active = (calibration, artifacts)
+
+    def _prune(self, calibrations: List[Calibration]):
+        """Delete the oldest versions beyond keep_versions (never the active one)"""
+        active_version = self.active[0].version if self.active else None
+        for calibration in calibrations[:-self.keep_versions] if self.keep_versions > 0 else []:
+            if calibration.version == active_version:
+                continue
+            for extension in ("json", "npz"):
+                path = self._path(calibration.version, extension)
+                if os.path.exists(path):
+                    os.unlink(path)
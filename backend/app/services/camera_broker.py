@@ -0,0 +1,433 @@
+import fcntl
+import logging
+import os
+import struct
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Callable, Optional, Tuple
+import numpy as np
+from ..core.config import settings
+from ..core.exceptions import CameraError
+from ..models.dart import DartDetection
+from ..utils.serialization import detection_json, parse_detection
+from .camera_service import CameraService
+
+logger = logging.getLogger(__name__)
+
+# Shared memory layout (all regions are 64-byte aligned):
+#   [frame header][frame pixels][control ring][detection header][detection payload]
+# Frame and detection regions use a seqlock: the single writer bumps the sequence to an
+# odd value before writing and to the next even value afterwards, so readers can detect
+# and retry torn reads without any cross-process locking.
+# The control ring carries commands from subscribers to the owner: a count of written and of
+# applied commands, then CONTROL_SLOTS command slots. Writers wait while the ring is full, so
+# commands sent between two frames are queued, not overwritten.
+FRAME_HEADER = struct.Struct("<QQdIIIiiiIId")  # seq, frame_id, timestamp, h, w, c, cx, cy, r, auto, calibrated, heartbeat
+CONTROL_COUNTS = struct.Struct("<QQ")         # written, applied
+CONTROL_HEADER = struct.Struct("<QIiiiI")     # seq, command, cx, cy, r, flag
+DETECTION_HEADER = struct.Struct("<QQI")      # seq, frame_id, payload length
+SEQ = struct.Struct("<Q")
+
+REGION_ALIGN = 64
+DETECTION_CAPACITY = 64 * 1024
+CONTROL_SLOTS = 16
+CONTROL_TIMEOUT = 2.0  # seconds a writer waits for room in the control ring
+
+COMMAND_SET_CALIBRATION = 1
+COMMAND_SET_AUTO_CALIBRATION = 2
+
+
+def _align(size: int) -> int:
+    return (size + REGION_ALIGN - 1) // REGION_ALIGN * REGION_ALIGN
+
+
+class CameraBroker:
+    """
+    Shares a single camera between several processes (e.g. uvicorn workers).
+    The first process to take the broker lock becomes the owner: it runs the real
+    CameraService and publishes frames, calibration and detection results to shared
+    memory. All other processes subscribe to that segment and expose the same
+    interface as CameraService, so the routers do not need to know which role they have.
+    """
+
+    def __init__(self, camera_service: Optional[CameraService] = None):
+        self.camera_service = camera_service or CameraService()
+        self.source = self.camera_service.source
+        self.name = settings.broker.name
+        self.lock_path = settings.broker.lock_path
+        self.max_width = settings.broker.max_width
+        self.max_height = settings.broker.max_height
+        self.stale_timeout = settings.broker.stale_timeout
+
+        self.is_owner = False
+        self.subscribed = False  # attached as subscriber, also while re-attaching after a failover
+        self.last_attach = 0.0
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self.lock_fd: Optional[int] = None
+        self.control_lock_fd: Optional[int] = None
+        self.write_lock = threading.Lock()
+
+        # Region offsets
+        self.frame_offset = _align(FRAME_HEADER.size)
+        self.frame_capacity = self.max_width * self.max_height * 3
+        self.control_offset = _align(self.frame_offset + self.frame_capacity)
+        self.control_slots_offset = self.control_offset + CONTROL_COUNTS.size
+        self.detection_offset = _align(self.control_slots_offset + CONTROL_SLOTS * CONTROL_HEADER.size)
+        self.detection_payload_offset = self.detection_offset + _align(DETECTION_HEADER.size)
+        self.size = self.detection_payload_offset + DETECTION_CAPACITY
+
+    @property
+    def is_running(self) -> bool:
+        if self.is_owner:
+            return self.camera_service.is_running
+        return self.subscribed
+
+    @property
+    def auto_calibrate(self) -> bool:
+        if self.is_owner:
+            return self.camera_service.auto_calibrate
+        header = self._read_frame_header()
+        return bool(header[9]) if header else self.camera_service.auto_calibrate
+
+    @property
+    def calibrated(self) -> bool:
+        if self.is_owner:
+            return self.camera_service.calibrated
+        header = self._read_frame_header()
+        return bool(header and header[10])
+
+    @property
+    def preprocessor(self):
+        """Preprocessor of the local capture (configured the same way in every worker)"""
+        return self.camera_service.preprocessor
+
+    def start(self):
+        """Start the broker, either as camera owner or as subscriber"""
+        if self.is_running:
+            return
+
+        if self._try_acquire_ownership():
+            self._start_owner()
+        else:
+            self._attach()
+
+    def stop(self):
+        """Stop the broker and release the camera if this process owns it"""
+        if self.is_owner:
+            self.camera_service.stop()
+            if self.shm is not None:
+                self.shm.close()
+                self.shm.unlink()
+            if self.lock_fd is not None:
+                fcntl.flock(self.lock_fd, fcntl.LOCK_UN)
+                os.close(self.lock_fd)
+                self.lock_fd = None
+            self.is_owner = False
+        elif self.shm is not None:
+            self.shm.close()
+        self.shm = None
+        self.subscribed = False
+        if self.control_lock_fd is not None:
+            os.close(self.control_lock_fd)
+            self.control_lock_fd = None
+        logger.info("Camera broker stopped")
+
+    def memory_usage(self) -> int:
+        """Bytes held by the local camera service plus the mapped shared segment"""
+        shm = self.shm
+        return self.camera_service.memory_usage() + (shm.size if shm is not None else 0)
+
+    def fixed_memory(self) -> int:
+        """Bytes reused for every frame: the local camera service's buffers plus the mapped shared segment"""
+        shm = self.shm
+        return self.camera_service.fixed_memory() + (shm.size if shm is not None else 0)
+
+    def release_buffers(self) -> int:
+        return self.camera_service.release_buffers()
+
+    def add_frame_listener(self, listener: Callable[[np.ndarray, int, float], None]):
+        """
+        Register a callback for every captured frame. Only the owner captures, so it runs
+        in the owning process (and in this one once it takes over the camera).
+        """
+        self.camera_service.add_frame_listener(listener)
+
+    def add_start_listener(self, listener: Callable[[], None]):
+        """Register a callback invoked when this process starts capturing, as owner or after a takeover"""
+        self.camera_service.add_start_listener(listener)
+
+    def _try_acquire_ownership(self) -> bool:
+        """Try to take the exclusive broker lock without blocking"""
+        if self.lock_fd is None:
+            self.lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self.lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _start_owner(self):
+        """Create the shared segment and start publishing frames from the real camera"""
+        try:
+            self.shm = shared_memory.SharedMemory(name=self.name, create=True, size=self.size)
+        except FileExistsError:
+            # A previous owner crashed without unlinking; we hold the lock so it is safe to replace
+            stale = shared_memory.SharedMemory(name=self.name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=self.name, create=True, size=self.size)
+
+        self.shm.buf[:self.detection_payload_offset] = bytes(self.detection_payload_offset)
+        self.is_owner = True
+
+        if self._publish_frame not in self.camera_service.frame_listeners:
+            self.camera_service.add_frame_listener(self._publish_frame)
+        self.camera_service.start()
+        logger.info(f"Camera broker owner started (pid={os.getpid()}, segment={self.name})")
+
+    def _attach(self):
+        """Attach to the segment published by the owning process"""
+        try:
+            shm = shared_memory.SharedMemory(name=self.name)
+        except FileNotFoundError:
+            raise CameraError("Camera broker is not available yet")
+
+        # Attaching processes must not unlink the owner's segment on exit
+        resource_tracker.unregister(shm._name, "shared_memory")
+
+        if shm.size < self.size:
+            shm.close()
+            raise CameraError("Camera broker segment has an unexpected size")
+
+        self.shm = shm
+        self.subscribed = True
+        logger.info(f"Camera broker subscriber attached (pid={os.getpid()}, segment={self.name})")
+
+    def _reattach(self) -> bool:
+        """
+        Replace the mapping of a gone owner with the segment of the new one (which unlinks
+        and recreates it). Attempts are spaced out; False while no usable segment exists yet.
+        """
+        now = time.time()
+        if now - self.last_attach < self.stale_timeout / 4:
+            return self.shm is not None
+        self.last_attach = now
+        if self.shm is not None:
+            self.shm.close()
+            self.shm = None
+        try:
+            self._attach()
+        except CameraError:
+            return False
+        return True
+
+    def _promote_if_stale(self, header) -> bool:
+        """
+        Take over the camera if the owner has stopped publishing; if another process
+        takes it over, follow that process to its new segment instead
+        """
+        heartbeat = header[11] if header else 0.0
+        if time.time() - heartbeat < self.stale_timeout:
+            return False
+        if not self._try_acquire_ownership():
+            self._reattach()
+            return False
+
+        logger.warning("Camera broker owner is gone, taking over the camera")
+        if self.shm is not None:
+            self.shm.close()
+            self.shm = None
+        self.subscribed = False
+        self._start_owner()
+        return True
+
+    # Owner side
+
+    def _publish_frame(self, frame: np.ndarray, frame_id: int, timestamp: float):
+        """Frame listener that copies each captured frame into shared memory"""
+        if self.shm is None:
+            return
+
+        self._apply_control_commands()
+
+        height, width = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+        nbytes = height * width * channels
+        if nbytes > self.frame_capacity:
+            logger.warning(f"Frame {width}x{height} exceeds broker capacity, skipping")
+            return
+
+        center, radius = self.camera_service.get_dartboard_calibration()
+        buf = self.shm.buf
+        seq = SEQ.unpack_from(buf, 0)[0]
+
+        SEQ.pack_into(buf, 0, seq + 1)
+        FRAME_HEADER.pack_into(
+            buf, 0, seq + 1, frame_id, timestamp, height, width, channels,
+            int(center[0]), int(center[1]), int(radius),
+            int(self.camera_service.auto_calibrate), int(self.camera_service.calibrated), time.time()
+        )
+        target = np.ndarray((nbytes,), dtype=np.uint8, buffer=buf, offset=self.frame_offset)
+        target[:] = np.ascontiguousarray(frame).reshape(-1)
+        SEQ.pack_into(buf, 0, seq + 2)
+
+    def _apply_control_commands(self):
+        """Apply the calibration commands written by subscribers since the last frame, in order"""
+        buf = self.shm.buf
+        written, applied = CONTROL_COUNTS.unpack_from(buf, self.control_offset)
+        while applied < written:
+            slot = self.control_slots_offset + applied % CONTROL_SLOTS * CONTROL_HEADER.size
+            seq, command, center_x, center_y, radius, flag = CONTROL_HEADER.unpack_from(buf, slot)
+            applied += 1
+            if seq != applied:
+                logger.warning(f"Skipping inconsistent broker control command {applied}")
+            elif command == COMMAND_SET_CALIBRATION:
+                self.camera_service.set_dartboard_calibration(center_x, center_y, radius)
+            elif command == COMMAND_SET_AUTO_CALIBRATION:
+                self.camera_service.enable_auto_calibration(bool(flag))
+            # Acknowledged one by one, so a waiting writer gets the slot back right away
+            SEQ.pack_into(buf, self.control_offset + SEQ.size, applied)
+            written = SEQ.unpack_from(buf, self.control_offset)[0]
+
+    def publish_detection(self, detection: DartDetection):
+        """Publish a detection result so other workers can reuse it for the same frame"""
+        if not self.is_owner or self.shm is None:
+            return
+
+        payload = detection_json(detection)
+        if len(payload) > DETECTION_CAPACITY:
+            logger.warning("Detection result exceeds broker capacity, skipping")
+            return
+
+        with self.write_lock:
+            buf = self.shm.buf
+            seq = SEQ.unpack_from(buf, self.detection_offset)[0]
+            # Frame id and length are written under the odd sequence too; the even one is published last
+            DETECTION_HEADER.pack_into(buf, self.detection_offset, seq + 1, detection.frame_id, len(payload))
+            buf[self.detection_payload_offset:self.detection_payload_offset + len(payload)] = payload
+            SEQ.pack_into(buf, self.detection_offset, seq + 2)
+
+    # Subscriber side
+
+    def _read_frame_header(self):
+        if self.shm is None:
+            return None
+        return FRAME_HEADER.unpack_from(self.shm.buf, 0)
+
+    def get_frame(self) -> Tuple[Optional[np.ndarray], int, float]:
+        """Get the latest frame, either from the local camera or from shared memory"""
+        if self.is_owner:
+            return self.camera_service.get_frame()
+        if not self.subscribed:
+            raise CameraError("Camera service is not running")
+
+        for _ in range(10):
+            shm = self.shm
+            if shm is None and not self._reattach():
+                raise CameraError("Waiting for a new camera broker owner")
+            shm = self.shm
+            header = FRAME_HEADER.unpack_from(shm.buf, 0)
+            seq, frame_id, timestamp, height, width, channels = header[:6]
+            if seq == 0 or frame_id == 0:
+                if self._promote_if_stale(header):
+                    return self.camera_service.get_frame()
+                raise CameraError("No frame available")
+            if seq % 2:
+                continue
+
+            nbytes = height * width * channels
+            source = np.ndarray((nbytes,), dtype=np.uint8, buffer=shm.buf, offset=self.frame_offset)
+            frame = source.copy()
+            # The mapping can only be closed (on failover) once no view refers to it
+            del source
+
+            if SEQ.unpack_from(shm.buf, 0)[0] != seq:
+                continue
+
+            if self._promote_if_stale(header):
+                return self.camera_service.get_frame()
+            if self.shm is not shm:
+                # Re-attached to a new owner's segment; the frame came from the old one
+                continue
+
+            self._sync_calibration(header)
+            shape = (height, width, channels) if channels > 1 else (height, width)
+            return frame.reshape(shape), frame_id, timestamp
+
+        raise CameraError("Could not read a consistent frame from the camera broker")
+
+    def _sync_calibration(self, header):
+        """Adopt the owner's calibration so scoring and overlays in this worker use the same snapshot"""
+        height, width, _, center_x, center_y, radius = header[3:9]
+        state = self.camera_service.calibration_state
+        if not state.current.matches(center_x, center_y, radius, width, height):
+            state.publish(center_x, center_y, radius, width, height, source="broker")
+
+    def get_detection(self, frame_id: int) -> Optional[DartDetection]:
+        """Return the published detection for frame_id, if the owner has already computed it"""
+        if self.shm is None:
+            return None
+
+        seq, published_id, length = DETECTION_HEADER.unpack_from(self.shm.buf, self.detection_offset)
+        if seq == 0 or seq % 2 or published_id != frame_id:
+            return None
+
+        payload = bytes(self.shm.buf[self.detection_payload_offset:self.detection_payload_offset + length])
+        if SEQ.unpack_from(self.shm.buf, self.detection_offset)[0] != seq:
+            return None
+
+        return parse_detection(payload)
+
+    def _send_control(self, command: int, center_x: int = 0, center_y: int = 0, radius: int = 0, flag: int = 0):
+        """
+        Queue a control command for the owner (serialized between subscribers by a file lock).
+        Raises CameraError if the owner did not make room in the ring within CONTROL_TIMEOUT.
+        Blocks while it waits, so async callers run it in a thread.
+        """
+        if self.control_lock_fd is None:
+            self.control_lock_fd = os.open(f"{self.lock_path}.ctl", os.O_RDWR | os.O_CREAT, 0o644)
+
+        fcntl.flock(self.control_lock_fd, fcntl.LOCK_EX)
+        try:
+            buf = self.shm.buf
+            deadline = time.monotonic() + CONTROL_TIMEOUT
+            while True:
+                written, applied = CONTROL_COUNTS.unpack_from(buf, self.control_offset)
+                if written - applied < CONTROL_SLOTS:
+                    break
+                if time.monotonic() > deadline:
+                    raise CameraError("The camera owner is not applying control commands")
+                time.sleep(0.01)
+            slot = self.control_slots_offset + written % CONTROL_SLOTS * CONTROL_HEADER.size
+            CONTROL_HEADER.pack_into(buf, slot, written + 1, command, center_x, center_y, radius, flag)
+            # Only the written count changes here; the owner only writes the applied count
+            SEQ.pack_into(buf, self.control_offset, written + 1)
+        finally:
+            fcntl.flock(self.control_lock_fd, fcntl.LOCK_UN)
+
+    # Calibration
+
+    def set_dartboard_calibration(self, center_x: int, center_y: int, radius: int, version: Optional[int] = None, artifacts=None, image_size: Optional[Tuple[int, int]] = None):
+        """Set dartboard calibration parameters on the owning process (and in this worker right away)"""
+        if not self.is_owner and self.shm is not None:
+            self._send_control(COMMAND_SET_CALIBRATION, center_x, center_y, radius)
+        self.camera_service.set_dartboard_calibration(
+            center_x, center_y, radius, version=version, artifacts=artifacts, image_size=image_size
+        )
+
+    def get_dartboard_calibration(self) -> Tuple[Tuple[int, int], int]:
+        """Get the calibration currently used by the owning process"""
+        if self.is_owner:
+            return self.camera_service.get_dartboard_calibration()
+        header = self._read_frame_header()
+        if not header or header[0] == 0:
+            return self.camera_service.get_dartboard_calibration()
+        return (header[6], header[7]), header[8]
+
+    def enable_auto_calibration(self, enable: bool = True):
+        """Enable or disable auto-calibration on the owning process"""
+        if self.is_owner or self.shm is None:
+            self.camera_service.enable_auto_calibration(enable)
+        else:
+            self._send_control(COMMAND_SET_AUTO_CALIBRATION, flag=int(enable))
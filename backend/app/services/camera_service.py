@@ -2,18 +2,24 @@ import cv2
 import numpy as np
 import threading
 import time
-from typing import Optional, Tuple, List
+from typing import Callable, Optional, Tuple, List
 import logging
 from ..core.config import settings
 from ..core.exceptions import CameraError
+from ..core.metrics import metrics
+from ..core.tracing import tracer
 from ..utils.image_processing import preprocess_frame, detect_dartboard
+from ..utils.preprocessing import FramePreprocessor
+from .calibration_state import CalibrationState, calibration_state as shared_calibration_state
 
 logger = logging.getLogger(__name__)
 
+CAPTURE_THREAD_NAME = "camera-capture"
+
 class CameraService:
     """Service for handling camera input"""
     
-    def __init__(self):
+    def __init__(self, source: Optional[str] = None, calibration_state: Optional[CalibrationState] = None):
         self.camera = None
         self.is_running = False
         self.frame_buffer = None
@@ -22,22 +28,53 @@ class CameraService:
         self.frame_count = 0
         self.last_frame_time = 0
         self.auto_calibrate = True
+        self.calibrated = False  # True once a board position was detected or set manually
+        self.frame_listeners: List[Callable[[np.ndarray, int, float], None]] = []
+        self.start_listeners: List[Callable[[], None]] = []
+        self.last_read_frame = 0
+        self.measured_fps = 0.0
         
         # Camera settings
-        self.source = settings.camera.source
+        self.source = source if source is not None else settings.camera.source
         self.width = settings.camera.width
         self.height = settings.camera.height
         self.fps = settings.camera.fps
+        # Only used by the capture thread; its output buffers are reused every few frames
+        self.preprocessor = FramePreprocessor.from_settings()
         
-        # Dartboard calibration
-        self.dartboard_center = (settings.dartboard.center_x, settings.dartboard.center_y)
-        self.dartboard_radius = settings.dartboard.radius
+        # Dartboard calibration is shared with the other services through the calibration state
+        self.calibration_state = calibration_state or shared_calibration_state
+        self.auto_calibration_tolerance = settings.calibration.auto_tolerance
+    
+    @property
+    def dartboard_center(self) -> Tuple[int, int]:
+        return self.calibration_state.current.center
+    
+    @property
+    def dartboard_radius(self) -> int:
+        return self.calibration_state.current.radius
     
     def start(self):
         """Start the camera service"""
         if self.is_running:
             return
-            
+        
+        self.open()
+        
+        for listener in self.start_listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.error(f"Start listener error: {e}")
+        
+        self.is_running = True
+        self.thread = threading.Thread(target=self._update, name=CAPTURE_THREAD_NAME, daemon=True)
+        self.thread.start()
+        
+        logger.info(f"Camera service started with source: {self.source}")
+    
+    def open(self):
+        """Open the camera source without starting the capture thread"""
         try:
             # Try to convert source to integer for webcam
             self.camera = cv2.VideoCapture(int(self.source))
@@ -52,12 +89,6 @@ class CameraService:
         self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
         self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
         self.camera.set(cv2.CAP_PROP_FPS, self.fps)
-        
-        self.is_running = True
-        self.thread = threading.Thread(target=self._update, daemon=True)
-        self.thread.start()
-        
-        logger.info(f"Camera service started with source: {self.source}")
     
     def stop(self):
         """Stop the camera service"""
@@ -72,28 +103,104 @@ class CameraService:
     def _update(self):
         """Thread function that continuously reads frames from the camera"""
         while self.is_running:
-            ret, frame = self.camera.read()
-            
-            if not ret:
+            if self.capture_once() is None:
                 logger.warning("Failed to read frame from camera")
                 time.sleep(0.1)
-                continue
-            
-            # Preprocess the frame
-            processed_frame = preprocess_frame(frame)
-            
-            # Auto-calibrate dartboard position if enabled
-            if self.auto_calibrate:
-                center, radius = detect_dartboard(processed_frame)
-                if center and radius:
-                    self.dartboard_center = center
-                    self.dartboard_radius = radius
-            
-            timestamp = time.time()
-            with self.lock:
-                self.frame_buffer = processed_frame
-                self.frame_count += 1
-                self.last_frame_time = timestamp
+    
+    def capture_once(self) -> Optional[Tuple[np.ndarray, int, float]]:
+        """
+        Read, preprocess and publish a single frame from the opened source.
+        Returns (frame, frame_id, timestamp), or None if no frame could be read.
+        Used by the capture thread and, synchronously, to replay video files.
+        """
+        # Stage timings are kept locally until the frame has an id to trace them under
+        spans = []
+        start = time.perf_counter()
+        ret, frame = self.camera.read()
+        spans.append(("capture", start, time.perf_counter()))
+        
+        if not ret:
+            return None
+        
+        # Preprocess the frame
+        start = time.perf_counter()
+        current = self.calibration_state.current
+        processed_frame = preprocess_frame(frame, self.preprocessor, (current.center_x, current.center_y, current.radius))
+        spans.append(("preprocess", start, time.perf_counter()))
+        
+        # Auto-calibrate dartboard position if enabled
+        if self.auto_calibrate:
+            start = time.perf_counter()
+            center, radius = detect_dartboard(processed_frame)
+            spans.append(("auto_calibration", start, time.perf_counter()))
+            if center and radius:
+                # Small jitter of the detected circle must not trigger a new calibration revision
+                height, width = processed_frame.shape[:2]
+                if not self.calibration_state.current.matches(
+                    center[0], center[1], radius, width, height, self.auto_calibration_tolerance
+                ):
+                    self.calibration_state.publish(center[0], center[1], radius, width, height, source="auto")
+                self.calibrated = True
+        
+        timestamp = time.time()
+        with self.lock:
+            # A frame that nobody read before being replaced is dropped
+            if self.frame_buffer is not None and self.last_read_frame < self.frame_count:
+                metrics.inc_counter("dartify_dropped_frames_total")
+            previous_time = self.last_frame_time
+            self.frame_buffer = processed_frame
+            self.frame_count += 1
+            self.last_frame_time = timestamp
+            frame_id = self.frame_count
+            unread = self.frame_count - self.last_read_frame
+        
+        # Exponentially smoothed capture rate
+        if previous_time:
+            interval = timestamp - previous_time
+            if interval > 0:
+                self.measured_fps = 0.9 * self.measured_fps + 0.1 * (1.0 / interval)
+                metrics.set_gauge("dartify_camera_fps", self.measured_fps)
+        metrics.set_gauge("dartify_queue_depth", unread, {"queue": "camera"})
+        
+        trace = tracer.begin(frame_id, "camera", timestamp)
+        for name, span_start, span_end in spans:
+            if trace is not None:
+                trace.add_span(name, span_start, span_end)
+            else:
+                metrics.observe_stage(name, span_end - span_start)
+        
+        # Notify listeners outside the lock so readers are never blocked
+        for listener in self.frame_listeners:
+            try:
+                listener(processed_frame, frame_id, timestamp)
+            except Exception as e:
+                logger.error(f"Frame listener error: {e}")
+        
+        return processed_frame, frame_id, timestamp
+    
+    def memory_usage(self) -> int:
+        """Bytes held by the latest frame and the preprocessing buffers, each buffer counted once"""
+        arrays = [self.frame_buffer] + self.preprocessor.arrays()
+        held = {id(array): array.nbytes for array in arrays if array is not None}
+        return sum(held.values())
+    
+    def fixed_memory(self) -> int:
+        """Bytes of the latest frame and the preprocessing buffers reused for every frame, which release_buffers cannot free"""
+        arrays = [self.frame_buffer] + self.preprocessor.fixed_arrays()
+        held = {id(array): array.nbytes for array in arrays if array is not None}
+        return sum(held.values())
+    
+    def release_buffers(self) -> int:
+        """Free the preprocessing data that can be rebuilt (undistortion maps of other frame sizes)"""
+        return self.preprocessor.release_stale()
+    
+    def add_frame_listener(self, listener: Callable[[np.ndarray, int, float], None]):
+        """Register a callback invoked with (frame, frame_id, timestamp) for every captured frame"""
+        self.frame_listeners.append(listener)
+    
+    def add_start_listener(self, listener: Callable[[], None]):
+        """Register a callback invoked when capture starts, before the first frame"""
+        self.start_listeners.append(listener)
     
     def get_frame(self) -> Tuple[Optional[np.ndarray], int, float]:
         """Get the latest frame from the camera"""
@@ -106,26 +213,34 @@ class CameraService:
             frame = self.frame_buffer.copy()
             frame_count = self.frame_count
             timestamp = self.last_frame_time
+            self.last_read_frame = frame_count
         
         return frame, frame_count, timestamp
     
-    def set_dartboard_calibration(self, center_x: int, center_y: int, radius: int):
-        """Set dartboard calibration parameters"""
+    def set_dartboard_calibration(self, center_x: int, center_y: int, radius: int, version: Optional[int] = None, artifacts=None, image_size: Optional[Tuple[int, int]] = None):
+        """Set dartboard calibration parameters (optionally a stored version with its precomputed artifacts)"""
         with self.lock:
-            self.dartboard_center = (center_x, center_y)
-            self.dartboard_radius = radius
             self.auto_calibrate = False
+            self.calibrated = True
         
+        width, height = image_size or (None, None)
+        self.calibration_state.publish(
+            center_x, center_y, radius, width, height,
+            source="manual" if version is None else "store", version=version, artifacts=artifacts
+        )
         logger.info(f"Dartboard calibration updated: center=({center_x}, {center_y}), radius={radius}")
     
     def get_dartboard_calibration(self) -> Tuple[Tuple[int, int], int]:
         """Get current dartboard calibration parameters"""
-        with self.lock:
-            return self.dartboard_center, self.dartboard_radius
+        current = self.calibration_state.current
+        return current.center, current.radius
     
     def enable_auto_calibration(self, enable: bool = True):
         """Enable or disable auto-calibration of dartboard position"""
         with self.lock:
             self.auto_calibrate = enable
+            if not enable:
+                # The configured or last detected position is used from now on
+                self.calibrated = True
         
         logger.info(f"Auto-calibration {'enabled' if enable else 'disabled'}")
\ No newline at end of file
@@ -2,45 +2,153 @@ import cv2
 import numpy as np
 import os
 import time
-from typing import List, Tuple, Dict, Any
+from typing import Awaitable, List, Tuple, Dict, Any, Optional, Sequence
+import asyncio
 import logging
-from ultralytics import YOLO
 from ..core.config import settings
 from ..core.exceptions import DetectionError
+from ..core.metrics import metrics
+from ..core.tracing import FrameTrace, time_stage
 from ..models.dart import Dart, DartDetection
+from ..utils.nms import non_max_suppression
+from .calibration_state import CalibrationState, calibration_state as shared_calibration_state
+from .remote_inference import FrameSequencer, RemoteInferencePool
 
 logger = logging.getLogger(__name__)
 
 class DetectionService:
     """Service for detecting darts using YOLOv8"""
     
-    def __init__(self):
+    def __init__(self, calibration_state: Optional[CalibrationState] = None):
         self.model = None
         self.model_path = settings.model.model_path
         self.confidence_threshold = settings.model.confidence_threshold
+        self.calibration_state = calibration_state or shared_calibration_state
+        self.cascade = settings.cascade
+        self.tiling = settings.tiling
+        # With remote workers the model runs in other processes; results are released in frame order
+        self.remote: Optional[RemoteInferencePool] = None
+        self.sequencer = FrameSequencer()
         self.initialized = False
+        self.warmed_up = False
+        self.load_error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self.init_lock = asyncio.Lock()
         self.last_detections = []
         self.class_mapping = {
             0: "dart"  # Map class index to class name
         }
     
+    @property
+    def ready(self) -> bool:
+        """True once the model is loaded and has run its warm-up inferences"""
+        return self.initialized and self.warmed_up
+    
     async def initialize(self):
         """Initialize the YOLO model"""
         if self.initialized:
             return
         
-        try:
-            # Load the YOLO model
-            self.model = YOLO(self.model_path)
-            self.initialized = True
-            logger.info(f"YOLO model loaded from {self.model_path}")
-        except Exception as e:
-            logger.error(f"Failed to load YOLO model: {e}")
-            raise DetectionError(f"Failed to load YOLO model: {e}")
+        async with self.init_lock:
+            if self.initialized:
+                return
+            
+            try:
+                # Importing ultralytics pulls in torch, so it is deferred until the model is needed,
+                # and both the import and the load run off the event loop
+                start = time.perf_counter()
+                if settings.remote.enabled:
+                    self.remote = await asyncio.to_thread(RemoteInferencePool.from_settings, self.model_path)
+                else:
+                    self.model = await asyncio.to_thread(self._load_model)
+                self.load_seconds = time.perf_counter() - start
+                self.initialized = True
+                self.load_error = None
+                metrics.set_gauge("dartify_startup_seconds", self.load_seconds, {"phase": "model_load"})
+                if self.remote is not None:
+                    logger.info(f"Remote inference with {len(self.remote.workers)} workers ready in {self.load_seconds:.2f}s")
+                else:
+                    logger.info(f"YOLO model loaded from {self.model_path} in {self.load_seconds:.2f}s")
+            except Exception as e:
+                self.load_error = str(e)
+                logger.error(f"Failed to load YOLO model: {e}")
+                raise DetectionError(f"Failed to load YOLO model: {e}")
+    
+    def _load_model(self):
+        from ultralytics import YOLO
+        return YOLO(self.model_path)
     
-    async def detect_darts(self, frame: np.ndarray) -> DartDetection:
+    async def _infer(self, images, **options):
+        """Run the model on an image or a list of images, locally or on a remote worker"""
+        if self.remote is not None:
+            return await self.remote.infer(images, **options)
+        return self.model(images, **options)
+    
+    async def in_frame_order(self, frame_id: int, detection: Awaitable[DartDetection]) -> DartDetection:
+        """
+        Await a live detection; with remote workers, results of frames that finished early
+        are held until every earlier frame in flight was released, so the tracker sees frames in order
+        """
+        if self.remote is None:
+            return await detection
+        return await self.sequencer.run(frame_id, detection)
+    
+    def _retained_results(self) -> list:
+        """Results of the last call, which the ultralytics predictor keeps (with the input frames) until the next one"""
+        predictor = getattr(self.model, "predictor", None)
+        return getattr(predictor, "results", None) or []
+    
+    def memory_usage(self) -> int:
+        """Bytes of the frames referenced by retained model results, plus the remote transport buffers"""
+        frames = [getattr(result, "orig_img", None) for result in self._retained_results()]
+        held = {id(frame): frame.nbytes for frame in frames if frame is not None}
+        total = sum(held.values())
+        if self.remote is not None:
+            total += self.remote.memory_usage()
+        return total
+    
+    def fixed_memory(self) -> int:
+        """Bytes of the remote transport buffers, which are reused for every request"""
+        return self.remote.memory_usage() if self.remote is not None else 0
+    
+    def release_results(self) -> int:
+        """Drop the model results retained by the predictor; returns how many were released"""
+        results = self._retained_results()
+        if results:
+            self.model.predictor.results = None
+        return len(results)
+    
+    def shutdown(self):
+        if self.remote is not None:
+            self.remote.shutdown()
+    
+    async def warmup(self, iterations: Optional[int] = None):
+        """Run a few inferences on a blank camera-sized frame so the first real frame is not slow"""
+        if self.warmed_up:
+            return
+        if not self.initialized:
+            await self.initialize()
+        if self.remote is not None:
+            # Workers warm up their own model before they accept requests
+            self.warmup_seconds = 0.0
+            self.warmed_up = True
+            return
+        
+        iterations = settings.model.warmup_iterations if iterations is None else iterations
+        frame = np.zeros((settings.camera.height, settings.camera.width, 3), dtype=np.uint8)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await asyncio.to_thread(self.model, frame, conf=self.confidence_threshold, verbose=False)
+        self.warmup_seconds = time.perf_counter() - start
+        self.warmed_up = True
+        metrics.set_gauge("dartify_startup_seconds", self.warmup_seconds, {"phase": "warmup"})
+        logger.info(f"YOLO model warmed up with {iterations} inferences in {self.warmup_seconds:.2f}s")
+    
+    async def detect_darts(self, frame: np.ndarray, frame_id: int = 0, trace: Optional[FrameTrace] = None, image_size: Optional[int] = None) -> DartDetection:
         """
         Detect darts in a frame using YOLOv8
+        image_size overrides the model input size (positions are still in frame pixels)
         Returns a DartDetection object with the positions of detected darts
         """
         if not self.initialized:
@@ -48,37 +156,22 @@ class DetectionService:
         
         try:
             # Run YOLO detection
-            results = self.model(frame, conf=self.confidence_threshold)
+            options = {"imgsz": image_size} if image_size else {}
+            with time_stage(trace, "inference"):
+                results = await self._infer(frame, conf=self.confidence_threshold, **options)
             
             # Extract dart detections
-            darts = []
-            for detection in results[0].boxes.data:
-                if len(detection) >= 6:  # x1, y1, x2, y2, confidence, class
-                    x1, y1, x2, y2, confidence, class_id = detection[:6]
-                    
-                    # Only process if the class is a dart (class_id 0)
-                    if int(class_id) == 0:
-                        # Calculate center point of the bounding box
-                        x_center = (x1 + x2) / 2
-                        y_center = (y1 + y2) / 2
-                        
-                        darts.append(Dart(
-                            x=float(x_center),
-                            y=float(y_center),
-                            confidence=float(confidence)
-                        ))
-            
-            # Create a DartDetection object
-            detection_result = DartDetection(
-                darts=darts,
-                frame_id=0,  # This will be filled by the caller
-                timestamp=time.time(),
-                image_width=frame.shape[1],
-                image_height=frame.shape[0]
-            )
+            postprocess_start = time.perf_counter()
+            detection_result = self._to_detection(results[0], frame_id, time.time(), frame.shape[1], frame.shape[0])
+            darts = detection_result.darts
             
             # Store the last detections for tracking
             self.last_detections = darts
+            if trace is not None:
+                trace.add_span("postprocess", postprocess_start, time.perf_counter())
+                trace.detections = len(darts)
+            else:
+                metrics.observe_stage("postprocess", time.perf_counter() - postprocess_start)
             
             return detection_result
         
@@ -86,6 +179,212 @@ class DetectionService:
             logger.error(f"Detection error: {e}")
             raise DetectionError(f"Detection error: {e}")
     
+    async def detect_darts_cascade(self, frame: np.ndarray, frame_id: int = 0, trace: Optional[FrameTrace] = None, hints: Sequence[Tuple[float, float]] = ()) -> DartDetection:
+        """
+        Two-stage detection: a low-resolution pass over the board proposes candidates, then
+        full-resolution crops around the candidates and the hints (e.g. tracked darts) go
+        through the model in one batch, so thin shafts keep their detail.
+        Returns a DartDetection in frame pixels, like detect_darts.
+        """
+        if not self.initialized:
+            await self.initialize()
+        
+        try:
+            height, width = frame.shape[:2]
+            x1, y1, x2, y2 = self._board_region(width, height)
+            
+            with time_stage(trace, "inference_proposal"):
+                results = await self._infer(
+                    frame[y1:y2, x1:x2], conf=self.cascade.proposal_confidence, imgsz=self.cascade.proposal_size, verbose=False
+                )
+            proposals = self._to_detection(results[0], frame_id, time.time(), x2 - x1, y2 - y1)
+            candidates = [(dart.x + x1, dart.y + y1) for dart in proposals.darts] + list(hints)
+            
+            darts = []
+            regions = self._crop_regions(candidates, width, height)
+            if regions:
+                crops = [frame[top:bottom, left:right] for left, top, right, bottom in regions]
+                with time_stage(trace, "inference_crops"):
+                    results = await self._infer(crops, conf=self.confidence_threshold, imgsz=self.cascade.crop_size, verbose=False)
+                for result, (left, top, right, bottom) in zip(results, regions):
+                    for dart in self._to_detection(result, frame_id, 0.0, right - left, bottom - top).darts:
+                        darts.append(Dart(x=dart.x + left, y=dart.y + top, confidence=dart.confidence))
+            
+            darts = self._merge_duplicates(darts)
+            self.last_detections = darts
+            if trace is not None:
+                trace.detections = len(darts)
+            return DartDetection(darts=darts, frame_id=frame_id, timestamp=time.time(), image_width=width, image_height=height)
+        
+        except Exception as e:
+            logger.error(f"Cascade detection error: {e}")
+            raise DetectionError(f"Cascade detection error: {e}")
+    
+    async def detect_darts_tiled(self, frame: np.ndarray, frame_id: int = 0, trace: Optional[FrameTrace] = None) -> DartDetection:
+        """
+        Tiled detection for high-resolution frames: the (board-cropped) frame is split into
+        overlapping tiles that go through the model at full resolution in one batch, and
+        boxes found twice along the seams are merged with NMS.
+        Returns a DartDetection in frame pixels, like detect_darts.
+        """
+        if not self.initialized:
+            await self.initialize()
+        
+        try:
+            height, width = frame.shape[:2]
+            tiles = self.tile_regions(width, height)
+            
+            crops = [frame[top:bottom, left:right] for left, top, right, bottom in tiles]
+            with time_stage(trace, "inference_tiles"):
+                results = await self._infer(crops, conf=self.confidence_threshold, imgsz=self.tiling.tile_size, verbose=False)
+            
+            postprocess_start = time.perf_counter()
+            darts = self._merge_tiles(results, tiles)
+            self.last_detections = darts
+            if trace is not None:
+                trace.add_span("postprocess", postprocess_start, time.perf_counter())
+                trace.detections = len(darts)
+            else:
+                metrics.observe_stage("postprocess", time.perf_counter() - postprocess_start)
+            return DartDetection(darts=darts, frame_id=frame_id, timestamp=time.time(), image_width=width, image_height=height)
+        
+        except Exception as e:
+            logger.error(f"Tiled detection error: {e}")
+            raise DetectionError(f"Tiled detection error: {e}")
+    
+    def tile_regions(self, width: int, height: int) -> List[Tuple[int, int, int, int]]:
+        """
+        Overlapping tile_size windows covering the board (or the whole frame), as
+        (left, top, right, bottom); the last row and column end at the edge of the region.
+        """
+        if self.tiling.board_only:
+            x1, y1, x2, y2 = self._board_region(width, height, self.tiling.board_margin)
+        else:
+            x1, y1, x2, y2 = 0, 0, width, height
+        size = self.tiling.tile_size
+        stride = max(1, size - self.tiling.overlap)
+        
+        def starts(low: int, high: int) -> List[int]:
+            if high - low <= size:
+                return [low]
+            positions = list(range(low, high - size, stride))
+            return positions + [high - size]
+        
+        return [
+            (left, top, min(left + size, x2), min(top + size, y2))
+            for top in starts(y1, y2)
+            for left in starts(x1, x2)
+        ]
+    
+    def _merge_tiles(self, results, tiles: List[Tuple[int, int, int, int]]) -> List[Dart]:
+        """Dart boxes of all tiles in frame pixels, with duplicates across seams suppressed"""
+        boxes = []
+        for result, (left, top, _, _) in zip(results, tiles):
+            data = result.boxes.data
+            data = data.cpu().numpy() if hasattr(data, "cpu") else np.asarray(data)
+            if len(data) == 0:
+                continue
+            data = data[data[:, 5].astype(int) == 0, :5].astype(np.float64)
+            data[:, [0, 2]] += left
+            data[:, [1, 3]] += top
+            boxes.append(data)
+        if not boxes:
+            return []
+        
+        boxes = np.concatenate(boxes)
+        keep = non_max_suppression(boxes[:, :4], boxes[:, 4], self.tiling.nms_threshold, metric="iom")
+        kept = boxes[keep]
+        centers_x = (kept[:, 0] + kept[:, 2]) / 2
+        centers_y = (kept[:, 1] + kept[:, 3]) / 2
+        return [
+            Dart(x=float(x), y=float(y), confidence=float(confidence))
+            for x, y, confidence in zip(centers_x, centers_y, kept[:, 4])
+        ]
+    
+    def _board_region(self, width: int, height: int, margin: Optional[float] = None) -> Tuple[int, int, int, int]:
+        """(x1, y1, x2, y2) of the calibrated board plus margin (board radii), clipped to the frame"""
+        current = self.calibration_state.current
+        reach = int(current.radius * (self.cascade.board_margin if margin is None else margin))
+        x1 = min(max(0, current.center_x - reach), width - 1)
+        y1 = min(max(0, current.center_y - reach), height - 1)
+        x2 = max(min(width, current.center_x + reach), x1 + 1)
+        y2 = max(min(height, current.center_y + reach), y1 + 1)
+        return x1, y1, x2, y2
+    
+    def _crop_regions(self, candidates: Sequence[Tuple[float, float]], width: int, height: int) -> List[Tuple[int, int, int, int]]:
+        """Crop windows centred on the candidates; a candidate well inside an existing window shares it"""
+        crop_width = min(self.cascade.crop_size, width)
+        crop_height = min(self.cascade.crop_size, height)
+        inset = self.cascade.crop_size // 4
+        regions = []
+        for x, y in candidates:
+            if any(left + inset <= x < right - inset and top + inset <= y < bottom - inset for left, top, right, bottom in regions):
+                continue
+            left = min(max(0, int(x) - crop_width // 2), width - crop_width)
+            top = min(max(0, int(y) - crop_height // 2), height - crop_height)
+            regions.append((left, top, left + crop_width, top + crop_height))
+        return regions
+    
+    def _merge_duplicates(self, darts: List[Dart]) -> List[Dart]:
+        """Keep the most confident of the detections closer than merge_distance (overlapping crops)"""
+        kept: List[Dart] = []
+        limit = self.cascade.merge_distance ** 2
+        for dart in sorted(darts, key=lambda d: -d.confidence):
+            if all((dart.x - other.x) ** 2 + (dart.y - other.y) ** 2 > limit for other in kept):
+                kept.append(dart)
+        return kept
+    
+    def _to_detection(self, result, frame_id: int, timestamp: float, image_width: int, image_height: int) -> DartDetection:
+        """Convert one YOLO result into a DartDetection"""
+        darts = []
+        for detection in result.boxes.data:
+            if len(detection) >= 6:  # x1, y1, x2, y2, confidence, class
+                x1, y1, x2, y2, confidence, class_id = detection[:6]
+                
+                # Only process if the class is a dart (class_id 0)
+                if int(class_id) == 0:
+                    # Calculate center point of the bounding box
+                    x_center = (x1 + x2) / 2
+                    y_center = (y1 + y2) / 2
+                    
+                    darts.append(Dart(
+                        x=float(x_center),
+                        y=float(y_center),
+                        confidence=float(confidence)
+                    ))
+        
+        return DartDetection(
+            darts=darts,
+            frame_id=frame_id,
+            timestamp=timestamp,
+            image_width=image_width,
+            image_height=image_height
+        )
+    
+    async def detect_darts_batch(self, frames: List[np.ndarray], frame_ids: List[int], timestamps: List[float]) -> List[DartDetection]:
+        """
+        Detect darts in several frames with a single batched model call
+        Used for offline scoring, where frames do not have to be processed one at a time
+        """
+        if not self.initialized:
+            await self.initialize()
+        if not frames:
+            return []
+        
+        try:
+            with metrics.time_stage("inference_batch"):
+                results = await self._infer(frames, conf=self.confidence_threshold, verbose=False)
+            
+            with metrics.time_stage("postprocess"):
+                return [
+                    self._to_detection(result, frame_id, timestamp, frame.shape[1], frame.shape[0])
+                    for result, frame, frame_id, timestamp in zip(results, frames, frame_ids, timestamps)
+                ]
+        
+        except Exception as e:
+            logger.error(f"Batch detection error: {e}")
+            raise DetectionError(f"Batch detection error: {e}")
+    
     def draw_detections(self, frame: np.ndarray, detections: DartDetection) -> np.ndarray:
         """Draw bounding boxes and labels for detected darts"""
         result_frame = frame.copy()
@@ -0,0 +1,375 @@
+import glob
+import heapq
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+from ..core.config import settings
+from ..core.metrics import metrics
+from ..models.throw import ThrowRecord
+
+logger = logging.getLogger(__name__)
+
+# Slot layout: header (frame_id, timestamp, height, width, channels) padded to SLOT_DATA_OFFSET, then pixels.
+# frame_id is zeroed before the pixels are written and set afterwards, so readers detect slots
+# that are being overwritten while they copy them.
+SLOT_HEADER = struct.Struct("<QdIII")
+SLOT_DATA_OFFSET = 64
+PAGE_SIZE = mmap.PAGESIZE
+# Share of the free space in the buffer directory the pre-roll ring may take, so clips still fit
+FREE_SPACE_SHARE = 0.5
+
+EVENT_DART_LANDED = "dart_landed"
+EVENT_SCORE_CHANGED = "score_changed"
+
+
+def _default_buffer_path() -> str:
+    """
+    Keep the pre-roll file next to the clips. /dev/shm would avoid disk writes but is often
+    small (64 MB in Docker), and a mapping that outgrows its filesystem is killed with SIGBUS.
+    """
+    return os.path.join(settings.recorder.clip_dir, "preroll.buf")
+
+
+def _process_buffer_path(path: str, pid: int) -> str:
+    """Pre-roll file of one process (every worker of a multi-worker server has its own)"""
+    base, extension = os.path.splitext(path)
+    return f"{base}.{pid}{extension}"
+
+
+def _remove_stale_buffers(path: str):
+    """Delete the pre-roll files left behind by processes that no longer exist"""
+    base, extension = os.path.splitext(path)
+    for candidate in glob.glob(f"{glob.escape(base)}.*{extension}"):
+        pid = candidate[len(base) + 1:len(candidate) - len(extension)]
+        if not pid.isdigit() or int(pid) == os.getpid():
+            continue
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            try:
+                os.remove(candidate)
+            except OSError:
+                pass
+        except PermissionError:
+            pass  # the process exists under another user
+
+
+class FrameRing:
+    """Circular buffer of fixed-size frame slots in a memory-mapped file"""
+
+    def __init__(self, path: str, slots: int, max_width: int, max_height: int, channels: int = 3):
+        self.path = path
+        self.slots = slots
+        self.capacity = max_width * max_height * channels
+        self.slot_size = self.slot_bytes(max_width, max_height, channels)
+        self.next_slot = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            if hasattr(os, "posix_fallocate"):
+                # Reserve the blocks now, so a full filesystem fails here instead of with SIGBUS on a later write
+                os.posix_fallocate(self.fd, 0, self.nbytes)
+            else:
+                os.ftruncate(self.fd, self.nbytes)
+            self.buffer = mmap.mmap(self.fd, self.nbytes)
+        except OSError:
+            os.close(self.fd)
+            os.remove(path)
+            raise
+
+        # Views into the mapping are created once, so writing a frame never allocates
+        self.views = [
+            np.ndarray((self.capacity,), dtype=np.uint8, buffer=self.buffer, offset=slot * self.slot_size + SLOT_DATA_OFFSET)
+            for slot in range(self.slots)
+        ]
+        for slot in range(self.slots):
+            SLOT_HEADER.pack_into(self.buffer, slot * self.slot_size, 0, 0.0, 0, 0, 0)
+
+    @staticmethod
+    def slot_bytes(max_width: int, max_height: int, channels: int = 3) -> int:
+        """Size of one slot: header and pixels, rounded up to whole pages"""
+        return (SLOT_DATA_OFFSET + max_width * max_height * channels + PAGE_SIZE - 1) // PAGE_SIZE * PAGE_SIZE
+
+    @property
+    def nbytes(self) -> int:
+        return self.slots * self.slot_size
+
+    def write(self, frame: np.ndarray, frame_id: int, timestamp: float) -> bool:
+        """Copy a frame into the next slot (called from the capture thread only)"""
+        size = frame.size
+        if size > self.capacity:
+            return False
+        height, width = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+
+        slot = self.next_slot
+        self.next_slot = (slot + 1) % self.slots
+        offset = slot * self.slot_size
+        SLOT_HEADER.pack_into(self.buffer, offset, 0, timestamp, height, width, channels)
+        np.copyto(self.views[slot][:size].reshape(frame.shape), frame)
+        SLOT_HEADER.pack_into(self.buffer, offset, frame_id, timestamp, height, width, channels)
+        return True
+
+    def read_window(self, start: float, end: float) -> List[Tuple[int, float, np.ndarray]]:
+        """Copies of the frames with start <= timestamp <= end, in frame order"""
+        frames = []
+        for slot in range(self.slots):
+            offset = slot * self.slot_size
+            frame_id, timestamp, height, width, channels = SLOT_HEADER.unpack_from(self.buffer, offset)
+            if frame_id == 0 or not start <= timestamp <= end:
+                continue
+            size = height * width * channels
+            frame = self.views[slot][:size].copy()
+            if SLOT_HEADER.unpack_from(self.buffer, offset)[0] != frame_id:
+                continue  # overwritten while copying
+            shape = (height, width, channels) if channels > 1 else (height, width)
+            frames.append((frame_id, timestamp, frame.reshape(shape)))
+        frames.sort(key=lambda item: item[0])
+        return frames
+
+    def close(self, unlink: bool = False):
+        self.views = []
+        self.buffer.close()
+        os.close(self.fd)
+        if unlink:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+class FrameRecorder:
+    """
+    Keeps the last seconds of camera frames in a FrameRing and writes a clip around every
+    dart-landed or score-changed event. The capture thread only copies the frame into its
+    slot; clips are cut and encoded by a background thread once the post-roll has been
+    captured, so capture throughput does not depend on clip writing.
+    """
+
+    def __init__(self):
+        config = settings.recorder
+        self.enabled = config.enabled
+        self.clip_dir = config.clip_dir
+        self.buffer_path = config.buffer_path or _default_buffer_path()
+        self.fps = config.fps
+        self.pre_roll = config.pre_roll
+        self.post_roll = config.post_roll
+        self.keep_clips = config.keep_clips
+        self.max_width = config.max_width
+        self.max_height = config.max_height
+        self.ring: Optional[FrameRing] = None
+        self.last_recorded = 0.0
+        self.last_event: Dict[str, float] = {}
+        self.tasks: List[Tuple[float, str, str, float, Dict[str, Any]]] = []  # heap of (due, event_id, type, timestamp, details)
+        self.pending: Dict[str, float] = {}
+        self.condition = threading.Condition()
+        self.worker: Optional[threading.Thread] = None
+        self.running = False
+
+    def start(self):
+        """
+        Map the pre-roll file and start the clip writer. Registered as a start listener of the
+        camera, so only the process that captures frames holds a ring.
+        The ring is shrunk to fit its budget and the free space; if not even two slots fit,
+        or the file cannot be allocated, recording stays off.
+        """
+        if self.running or not self.enabled:
+            return
+        # One second of margin, so frames are still in the ring when the writer cuts the clip
+        slots = math.ceil((self.pre_roll + self.post_roll + 1.0) * self.fps)
+        budget = settings.memory.budget("recording")
+        slot_size = FrameRing.slot_bytes(self.max_width, self.max_height)
+        if budget and slots * slot_size > budget:
+            affordable = max(2, budget // slot_size)
+            logger.warning(
+                f"Pre-roll ring limited to {affordable} of {slots} slots by MEMORY_RECORDING_MB, "
+                f"clips cover {affordable / self.fps:.1f}s instead of {slots / self.fps:.1f}s"
+            )
+            slots = affordable
+
+        directory = os.path.dirname(os.path.abspath(self.buffer_path))
+        os.makedirs(directory, exist_ok=True)
+        _remove_stale_buffers(self.buffer_path)
+        stats = os.statvfs(directory)
+        space = int(stats.f_bavail * stats.f_frsize * FREE_SPACE_SHARE)
+        if slots * slot_size > space:
+            affordable = space // slot_size
+            if affordable < 2:
+                logger.error(
+                    f"Frame recorder disabled: {stats.f_bavail * stats.f_frsize / 1e6:.0f} MB free in {directory}, "
+                    f"a pre-roll slot takes {slot_size / 1e6:.1f} MB"
+                )
+                return
+            logger.warning(
+                f"Pre-roll ring limited to {affordable} of {slots} slots by the free space in {directory}, "
+                f"clips cover {affordable / self.fps:.1f}s instead of {slots / self.fps:.1f}s"
+            )
+            slots = affordable
+        try:
+            self.ring = FrameRing(_process_buffer_path(self.buffer_path, os.getpid()), slots, self.max_width, self.max_height)
+        except OSError as e:
+            logger.error(f"Frame recorder disabled: could not allocate the pre-roll ring in {directory}: {e}")
+            return
+        os.makedirs(self.clip_dir, exist_ok=True)
+        self.running = True
+        self.worker = threading.Thread(target=self._write_loop, name="clip-writer", daemon=True)
+        self.worker.start()
+        logger.info(
+            f"Frame recorder started: {slots} slots of {self.ring.slot_size / 1e6:.1f} MB in {self.ring.path}"
+        )
+
+    def memory_usage(self) -> int:
+        """Bytes mapped for the pre-roll ring"""
+        ring = self.ring
+        return ring.nbytes if ring is not None else 0
+
+    def stop(self):
+        if not self.running:
+            return
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.worker.join()
+        self.ring.close(unlink=True)
+        self.ring = None
+
+    def write_frame(self, frame: np.ndarray, frame_id: int, timestamp: float):
+        """Frame listener: keep the frame if it is due at the recording frame rate"""
+        ring = self.ring
+        if ring is None or timestamp - self.last_recorded < 0.9 / self.fps:
+            return
+        if ring.write(frame, frame_id, timestamp):
+            self.last_recorded = timestamp
+
+    def trigger(self, event_type: str, event_id: Optional[str] = None, timestamp: Optional[float] = None, details: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Schedule a clip around an event; it is written once the post-roll has been captured"""
+        if not self.running:
+            return None
+        event_id = event_id or uuid.uuid4().hex
+        timestamp = timestamp or time.time()
+        with self.condition:
+            heapq.heappush(self.tasks, (timestamp + self.post_roll + 0.2, event_id, event_type, timestamp, details or {}))
+            self.pending[event_id] = timestamp
+            self.condition.notify()
+        metrics.set_gauge("dartify_queue_depth", len(self.tasks), {"queue": "clip_writer"})
+        return event_id
+
+    def on_dart_landed(self, record: ThrowRecord):
+        """Throw listener: a clip per landed dart, named after its throw id"""
+        self.trigger(EVENT_DART_LANDED, record.throw_id, record.timestamp, record.model_dump())
+
+    def on_dart_removed(self, record: ThrowRecord):
+        """Throw listener: one clip when darts are pulled, however many are removed at once"""
+        now = time.time()
+        if now - self.last_event.get(EVENT_SCORE_CHANGED, 0.0) < self.post_roll:
+            return
+        self.last_event[EVENT_SCORE_CHANGED] = now
+        self.trigger(EVENT_SCORE_CHANGED, timestamp=now, details={"removed_throw_id": record.throw_id})
+
+    def _write_loop(self):
+        while True:
+            with self.condition:
+                while self.running and (not self.tasks or self.tasks[0][0] > time.time()):
+                    timeout = self.tasks[0][0] - time.time() if self.tasks else None
+                    self.condition.wait(timeout)
+                if not self.running:
+                    return
+                _, event_id, event_type, timestamp, details = heapq.heappop(self.tasks)
+
+            start = time.perf_counter()
+            try:
+                self._write_clip(event_id, event_type, timestamp, details)
+            except Exception as e:
+                logger.error(f"Failed to write clip {event_id}: {e}")
+            finally:
+                with self.condition:
+                    self.pending.pop(event_id, None)
+            metrics.observe_stage("clip_write", time.perf_counter() - start)
+            self._prune()
+
+    def _clip_path(self, event_id: str, extension: str) -> str:
+        return os.path.join(self.clip_dir, f"{event_id}.{extension}")
+
+    def _write_clip(self, event_id: str, event_type: str, timestamp: float, details: Dict[str, Any]):
+        frames = self.ring.read_window(timestamp - self.pre_roll, timestamp + self.post_roll)
+        if not frames:
+            logger.warning(f"No frames buffered for clip {event_id}")
+            return
+
+        height, width = frames[0][2].shape[:2]
+        tmp_path = self._clip_path(event_id, "tmp.mp4")
+        writer = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*"mp4v"), self.fps, (width, height))
+        try:
+            for _, _, frame in frames:
+                if frame.shape[:2] == (height, width):
+                    writer.write(frame)
+        finally:
+            writer.release()
+        os.replace(tmp_path, self._clip_path(event_id, "mp4"))
+
+        metadata = {
+            "event_id": event_id,
+            "event_type": event_type,
+            "timestamp": timestamp,
+            "frames": len(frames),
+            "first_frame_id": frames[0][0],
+            "last_frame_id": frames[-1][0],
+            "start": frames[0][1],
+            "end": frames[-1][1],
+            "details": details,
+        }
+        with open(self._clip_path(event_id, "json"), "w") as f:
+            json.dump(metadata, f)
+        logger.info(f"Wrote clip {event_id} ({event_type}, {len(frames)} frames)")
+
+    def _prune(self):
+        """Delete the oldest clips beyond keep_clips"""
+        clips = self.list_clips()
+        for clip in clips[self.keep_clips:]:
+            for extension in ("mp4", "json"):
+                path = self._clip_path(clip["event_id"], extension)
+                if os.path.exists(path):
+                    os.unlink(path)
+
+    def list_clips(self) -> List[Dict[str, Any]]:
+        """Metadata of the written clips, newest first"""
+        if not os.path.isdir(self.clip_dir):
+            return []
+        clips = []
+        for name in os.listdir(self.clip_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.clip_dir, name)) as f:
+                    clips.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        clips.sort(key=lambda clip: clip["timestamp"], reverse=True)
+        return clips
+
+    def clip_status(self, event_id: str) -> Tuple[str, Optional[str]]:
+        """("ready", path), ("pending", None) or ("missing", None) for an event id"""
+        if not re.fullmatch(r"[0-9a-f]{32}", event_id):
+            return "missing", None
+        path = self._clip_path(event_id, "mp4")
+        if os.path.exists(path):
+            return "ready", path
+        with self.condition:
+            if event_id in self.pending:
+                return "pending", None
+        return "missing", None
+
+frame_recorder = FrameRecorder()
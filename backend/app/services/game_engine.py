@@ -0,0 +1,474 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from ..core.config import settings
+from ..core.exceptions import GameError
+from ..models.game import GamePlayer, GameRequest, GameStatus, TurnDart
+from ..models.throw import ThrowRecord
+from ..utils.checkout import checkout_table_for
+from .calibration_store import atomic_write
+from .throw_detector import ThrowDetector, throw_detector as shared_throw_detector
+
+logger = logging.getLogger(__name__)
+
+X01_START_SCORES = {"501": 501, "301": 301}
+CRICKET = "Cricket"
+CRICKET_NUMBERS = (20, 19, 18, 17, 16, 15, 25)
+DARTS_PER_TURN = 3
+
+
+def section_label(number: int, multiplier: int) -> str:
+    """Label of a section, as used by DartboardSegmentation"""
+    if multiplier == 0 or number == 0:
+        return "Miss"
+    if number == 50:
+        return "Bull"
+    if number == 25:
+        return "25"
+    return {1: f"{number}", 2: f"D{number}", 3: f"T{number}"}[multiplier]
+
+
+class PlayerState:
+    """Compact per-player state, updated in O(1) per dart"""
+
+    __slots__ = ("name", "remaining", "points", "darts", "marks")
+
+    def __init__(self, name: str, remaining: Optional[int] = None, points: int = 0, darts: int = 0, marks: Optional[List[int]] = None):
+        self.name = name
+        self.remaining = remaining
+        self.points = points  # points scored (X01) or cricket points
+        self.darts = darts
+        self.marks = marks if marks is not None else [0] * len(CRICKET_NUMBERS)
+
+    def copy(self) -> "PlayerState":
+        return PlayerState(self.name, self.remaining, self.points, self.darts, list(self.marks))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PlayerState":
+        return cls(**data)
+
+
+class Game:
+    """
+    State of one X01 or cricket game. Every change goes through apply(), both live and
+    when the event log is replayed, so a recovered game is identical to the lost one.
+    The state at the start of the current and the previous turn is kept for busts and undo;
+    replaying a turn touches at most three darts.
+    """
+
+    def __init__(self, game_id: str, game_type: str, players: List[str], double_out: bool = True):
+        if game_type not in X01_START_SCORES and game_type != CRICKET:
+            raise GameError(f"Unknown game type {game_type}")
+        if not players:
+            raise GameError("A game needs at least one player")
+
+        self.game_id = game_id
+        self.game_type = game_type
+        self.double_out = double_out
+        start = X01_START_SCORES.get(game_type)
+        self.players = [PlayerState(name, start) for name in players]
+        self.current = 0
+        self.round = 1
+        self.turn: List[Dict[str, Any]] = []
+        self.last_turn_bust = False
+        self.finished = False
+        self.winner: Optional[str] = None
+        self.sequence = 0
+        self.turn_start = self._capture()
+        self.previous_turn: Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]] = None
+
+    @property
+    def is_x01(self) -> bool:
+        return self.game_type in X01_START_SCORES
+
+    @property
+    def current_player(self) -> PlayerState:
+        return self.players[self.current]
+
+    def turn_throw_ids(self) -> List[str]:
+        return [dart["throw_id"] for dart in self.turn]
+
+    def checkout(self) -> Optional[List[str]]:
+        """Suggested finish for the current player with the darts left in the turn (X01 only)"""
+        if not self.is_x01 or self.finished:
+            return None
+        return checkout_table_for().suggest(self.current_player.remaining, DARTS_PER_TURN - len(self.turn), self.double_out)
+
+    # Events
+
+    def apply(self, event: Dict[str, Any]):
+        """Apply one event from the log"""
+        self.sequence = event["seq"]
+        kind = event["type"]
+        if kind == "dart":
+            self._dart(event)
+        elif kind == "end_turn":
+            if not self.finished:
+                # Darts that missed the board are never seen, but were thrown
+                self.current_player.darts += DARTS_PER_TURN - len(self.turn)
+                self._end_turn()
+        elif kind == "undo":
+            self._undo()
+
+    def _dart(self, dart: Dict[str, Any]):
+        if self.finished or len(self.turn) >= DARTS_PER_TURN:
+            return
+
+        player = self.current_player
+        self.turn.append(dart)
+        player.darts += 1
+        if self.is_x01:
+            self._x01_dart(player, dart)
+        else:
+            self._cricket_dart(player, dart)
+
+        if not self.finished and len(self.turn) >= DARTS_PER_TURN:
+            self._end_turn()
+
+    def _x01_dart(self, player: PlayerState, dart: Dict[str, Any]):
+        remaining = player.remaining - dart["points"]
+        is_double = dart["multiplier"] == 2 or dart["number"] == 50
+        bust = remaining < 0 or (self.double_out and (remaining == 1 or (remaining == 0 and not is_double)))
+
+        if bust:
+            # The whole turn is void, but its darts still count as thrown
+            start = self.turn_start["players"][self.current]
+            player.remaining = start.remaining
+            player.points = start.points
+            self._end_turn(bust=True)
+            return
+
+        player.remaining = remaining
+        player.points += dart["points"]
+        if remaining == 0:
+            self.finished = True
+            self.winner = player.name
+
+    def _cricket_dart(self, player: PlayerState, dart: Dict[str, Any]):
+        number = dart["number"]
+        if number in (25, 50):
+            target, marks = 25, 2 if number == 50 else 1
+        elif 15 <= number <= 20:
+            target, marks = number, dart["multiplier"]
+        else:
+            return
+
+        index = CRICKET_NUMBERS.index(target)
+        have = player.marks[index]
+        extra = max(0, have + marks - max(have, 3))
+        player.marks[index] = min(3, have + marks)
+
+        # Marks beyond three score while any opponent has not closed the number
+        if extra and any(other.marks[index] < 3 for other in self.players if other is not player):
+            player.points += extra * target
+
+        if all(m >= 3 for m in player.marks) and all(player.points >= other.points for other in self.players):
+            self.finished = True
+            self.winner = player.name
+
+    def _end_turn(self, bust: bool = False):
+        self.previous_turn = (self.turn_start, self.turn)
+        self.turn = []
+        self.last_turn_bust = bust
+        self.current = (self.current + 1) % len(self.players)
+        if self.current == 0:
+            self.round += 1
+        self.turn_start = self._capture()
+
+    def _undo(self):
+        """Take back the last dart, replaying the rest of its turn from the turn's start state"""
+        if self.turn:
+            darts = self.turn[:-1]
+            self._restore(self.turn_start)
+        elif self.previous_turn is not None:
+            start, darts = self.previous_turn
+            darts = darts[:-1]
+            self.previous_turn = None
+            self._restore(start)
+        else:
+            return
+        for dart in darts:
+            self._dart(dart)
+
+    def _capture(self) -> Dict[str, Any]:
+        return {
+            "players": [player.copy() for player in self.players],
+            "current": self.current,
+            "round": self.round,
+            "last_turn_bust": self.last_turn_bust,
+        }
+
+    def _restore(self, state: Dict[str, Any]):
+        self.players = [player.copy() for player in state["players"]]
+        self.current = state["current"]
+        self.round = state["round"]
+        self.last_turn_bust = state["last_turn_bust"]
+        self.turn = []
+        self.finished = False
+        self.winner = None
+        self.turn_start = state
+
+    # Snapshots
+
+    def to_dict(self) -> Dict[str, Any]:
+        def state_dict(state):
+            return {**state, "players": [player.to_dict() for player in state["players"]]}
+
+        return {
+            "game_id": self.game_id,
+            "game_type": self.game_type,
+            "double_out": self.double_out,
+            "players": [player.to_dict() for player in self.players],
+            "current": self.current,
+            "round": self.round,
+            "turn": self.turn,
+            "last_turn_bust": self.last_turn_bust,
+            "finished": self.finished,
+            "winner": self.winner,
+            "sequence": self.sequence,
+            "turn_start": state_dict(self.turn_start),
+            "previous_turn": [state_dict(self.previous_turn[0]), self.previous_turn[1]] if self.previous_turn else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Game":
+        def load_state(state):
+            return {**state, "players": [PlayerState.from_dict(player) for player in state["players"]]}
+
+        game = cls(data["game_id"], data["game_type"], [p["name"] for p in data["players"]], data["double_out"])
+        game.players = [PlayerState.from_dict(player) for player in data["players"]]
+        game.current = data["current"]
+        game.round = data["round"]
+        game.turn = data["turn"]
+        game.last_turn_bust = data["last_turn_bust"]
+        game.finished = data["finished"]
+        game.winner = data["winner"]
+        game.sequence = data["sequence"]
+        game.turn_start = load_state(data["turn_start"])
+        previous = data["previous_turn"]
+        game.previous_turn = (load_state(previous[0]), previous[1]) if previous else None
+        return game
+
+    def status(self) -> GameStatus:
+        players = []
+        for player in self.players:
+            players.append(GamePlayer(
+                name=player.name,
+                remaining=player.remaining,
+                points=player.points,
+                darts=player.darts,
+                average=3 * player.points / player.darts if player.darts else 0.0,
+                marks=None if self.is_x01 else {
+                    ("Bull" if number == 25 else str(number)): marks
+                    for number, marks in zip(CRICKET_NUMBERS, player.marks)
+                }
+            ))
+        return GameStatus(
+            game_id=self.game_id,
+            game_type=self.game_type,
+            double_out=self.double_out,
+            players=players,
+            current_player=self.current,
+            round=self.round,
+            turn=[TurnDart(throw_id=d["throw_id"], label=d["label"], points=d["points"]) for d in self.turn],
+            last_turn_bust=self.last_turn_bust,
+            finished=self.finished,
+            winner=self.winner,
+            checkout=self.checkout(),
+            sequence=self.sequence
+        )
+
+
+class GameEngine:
+    """
+    Runs the active game from dart-landed and dart-removed events.
+    Every event is appended to <game_dir>/<game_id>.log before it is applied, and a
+    snapshot of the state is written every snapshot_interval events, so recovering
+    after a crash replays at most snapshot_interval events.
+    A turn ends after three darts, a bust or a win, or when the player starts pulling
+    darts of an unfinished turn (darts that missed the board are never seen).
+    """
+
+    def __init__(self, directory: Optional[str] = None, snapshot_interval: Optional[int] = None, throw_detector: Optional[ThrowDetector] = None):
+        self.directory = directory or settings.game.directory
+        self.snapshot_interval = snapshot_interval or settings.game.snapshot_interval
+        self.throw_detector = throw_detector or shared_throw_detector
+        self.game: Optional[Game] = None
+        self.log_file = None
+        self.lock = threading.RLock()
+
+    def _path(self, game_id: str, extension: str) -> str:
+        return os.path.join(self.directory, f"{game_id}.{extension}")
+
+    def _active_path(self) -> str:
+        return os.path.join(self.directory, "active.json")
+
+    def start_game(self, request: GameRequest) -> GameStatus:
+        game_id = uuid.uuid4().hex
+        game = Game(game_id, request.game_type, request.players, request.double_out)
+
+        with self.lock:
+            self._close_log()
+            os.makedirs(self.directory, exist_ok=True)
+            self.game = game
+            self.log_file = open(self._path(game_id, "log"), "a")
+            self._append({"type": "start", "game_type": request.game_type, "players": request.players, "double_out": request.double_out})
+            self._snapshot()
+            atomic_write(self._active_path(), json.dumps({"game_id": game_id}).encode("utf-8"))
+
+        self.throw_detector.start_session(game_id)
+        self._sync_player()
+        logger.info(f"Started {request.game_type} game {game_id} with {', '.join(request.players)}")
+        return game.status()
+
+    def stop_game(self):
+        """End the active game; its log and snapshot are kept"""
+        with self.lock:
+            self._close_log()
+            self.game = None
+            if os.path.exists(self._active_path()):
+                os.unlink(self._active_path())
+        self.throw_detector.set_player(None)
+
+    def status(self) -> Optional[GameStatus]:
+        with self.lock:
+            return self.game.status() if self.game else None
+
+    def checkout(self) -> Optional[List[str]]:
+        """Suggested finish for the player whose turn it is"""
+        game = self.game
+        return game.checkout() if game else None
+
+    # Events
+
+    def _append(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Write an event to the log (called with the lock held)"""
+        event["seq"] = self.game.sequence + 1 if event["type"] != "start" else 0
+        event["time"] = time.time()
+        self.log_file.write(json.dumps(event) + "\n")
+        self.log_file.flush()
+        return event
+
+    def _emit(self, event: Dict[str, Any]):
+        with self.lock:
+            if self.game is None:
+                return
+            event = self._append(event)
+            self.game.apply(event)
+            if event["seq"] % self.snapshot_interval == 0:
+                self._snapshot()
+        self._sync_player()
+
+    def _snapshot(self):
+        atomic_write(self._path(self.game.game_id, "snapshot.json"), json.dumps(self.game.to_dict()).encode("utf-8"))
+
+    def _sync_player(self):
+        """Attribute the next throws in the throw history to the player whose turn it is"""
+        with self.lock:
+            player = None if self.game is None or self.game.finished else self.game.current_player.name
+        self.throw_detector.set_player(player)
+
+    def on_dart_landed(self, record: ThrowRecord):
+        """Throw listener"""
+        if self.game is None or self.game.finished:
+            return
+        self._emit({
+            "type": "dart",
+            "throw_id": record.throw_id,
+            "number": record.number,
+            "multiplier": record.multiplier,
+            "label": record.label,
+            "points": record.points,
+        })
+
+    def on_dart_removed(self, record: ThrowRecord):
+        """Throw listener: pulling a dart of an unfinished turn ends the turn"""
+        game = self.game
+        if game is None or game.finished or record.throw_id not in game.turn_throw_ids():
+            return
+        self._emit({"type": "end_turn", "reason": "darts_removed"})
+
+    def add_throw(self, number: int, multiplier: int = 1):
+        """Enter a dart by hand"""
+        if number not in (0, 25, 50) and not 1 <= number <= 20:
+            raise GameError(f"Invalid number {number}")
+        if multiplier not in (0, 1, 2, 3) or (number in (25, 50) and multiplier != 1):
+            raise GameError(f"Invalid multiplier {multiplier} for {number}")
+        if self.game is None:
+            raise GameError("No game in progress")
+        self._emit({
+            "type": "dart",
+            "throw_id": f"manual-{uuid.uuid4().hex}",
+            "number": number,
+            "multiplier": multiplier,
+            "label": section_label(number, multiplier),
+            "points": number * multiplier,
+        })
+
+    def end_turn(self):
+        if self.game is None:
+            raise GameError("No game in progress")
+        self._emit({"type": "end_turn", "reason": "manual"})
+
+    def undo(self):
+        if self.game is None:
+            raise GameError("No game in progress")
+        self._emit({"type": "undo"})
+
+    # Recovery
+
+    def recover(self) -> Optional[GameStatus]:
+        """Restore the active game from its latest snapshot and the events logged after it"""
+        active_path = self._active_path()
+        if not os.path.exists(active_path):
+            return None
+        with open(active_path) as f:
+            game_id = json.load(f)["game_id"]
+
+        start = time.perf_counter()
+        with open(self._path(game_id, "snapshot.json")) as f:
+            game = Game.from_dict(json.load(f))
+
+        replayed = 0
+        log_path = self._path(game_id, "log")
+        valid_length = 0
+        with open(log_path, "rb") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    break  # a write torn by the crash; everything after it is dropped
+                valid_length += len(line)
+                if event["type"] != "start" and event["seq"] > game.sequence:
+                    game.apply(event)
+                    replayed += 1
+
+        with self.lock:
+            self._close_log()
+            # Cut a torn last line so new events start on a line of their own
+            with open(log_path, "r+b") as f:
+                f.truncate(valid_length)
+            self.game = game
+            self.log_file = open(log_path, "a")
+
+        self.throw_detector.start_session(game_id)
+        self._sync_player()
+        logger.info(
+            f"Recovered game {game_id} at event {game.sequence} "
+            f"({replayed} events replayed in {time.perf_counter() - start:.3f}s)"
+        )
+        return game.status()
+
+    def _close_log(self):
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+game_engine = GameEngine()
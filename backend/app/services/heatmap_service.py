@@ -0,0 +1,156 @@
+import logging
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+import cv2
+import numpy as np
+from ..core.config import settings
+from ..models.throw import ThrowRecord
+from ..utils.dartboard_segmentation import DartboardSegmentation
+from .throw_store import ALL_PLAYERS, UNKNOWN_PLAYER
+
+logger = logging.getLogger(__name__)
+
+# Key of the histograms over all boards
+ALL_BOARDS = "*"
+
+HeatmapKey = Tuple[str, str]  # (player, board_id)
+
+class HeatmapService:
+    """
+    Per-player and per-board 2D histograms of where darts land, in board coordinates
+    (relative to the calibrated center, in board radii), so heatmaps of different
+    cameras and calibrations line up. Each landed dart increments four bins (player/board,
+    player/all boards, all players/board, all players/all boards). Rendered PNGs are cached
+    per histogram and rendering options, and only re-rendered after the histogram changed;
+    the cache keeps the cache_size most recently used renders.
+    """
+
+    def __init__(self, bins: Optional[int] = None, extent: Optional[float] = None, cache_size: Optional[int] = None):
+        self.bins = bins or settings.heatmap.bins
+        self.extent = extent or settings.heatmap.extent  # histogram covers [-extent, extent] board radii
+        self.histograms: Dict[HeatmapKey, np.ndarray] = {}
+        self.versions: Dict[HeatmapKey, int] = {}
+        self.cache_size = cache_size or settings.heatmap.cache_size
+        self.render_cache: "OrderedDict[Tuple[HeatmapKey, int, float, bool], Tuple[int, bytes]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _bin(self, board_x: float, board_y: float) -> Optional[Tuple[int, int]]:
+        scale = self.bins / (2 * self.extent)
+        # floor, not int(): points just left of or above the histogram must not land in bin 0
+        column = math.floor((board_x + self.extent) * scale)
+        row = math.floor((board_y + self.extent) * scale)
+        if 0 <= column < self.bins and 0 <= row < self.bins:
+            return row, column
+        return None
+
+    def _keys(self, player: Optional[str], board_id: str) -> Tuple[HeatmapKey, ...]:
+        player = player or UNKNOWN_PLAYER
+        return ((player, board_id), (player, ALL_BOARDS), (ALL_PLAYERS, board_id), (ALL_PLAYERS, ALL_BOARDS))
+
+    def add(self, record: ThrowRecord):
+        """Add one landed dart to its histograms"""
+        cell = self._bin(record.board_x, record.board_y)
+        if cell is None:
+            return
+        with self.lock:
+            for key in self._keys(record.player, record.board_id):
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = np.zeros((self.bins, self.bins), dtype=np.int32)
+                histogram[cell] += 1
+                self.versions[key] = self.versions.get(key, 0) + 1
+
+    def load(self, positions: Iterable[Tuple[str, str, float, float]]):
+        """Build the histograms from stored throws (board_id, player, board_x, board_y), once on startup"""
+        groups: Dict[HeatmapKey, list] = {}
+        for board_id, player, board_x, board_y in positions:
+            for key in self._keys(player, board_id):
+                groups.setdefault(key, []).append((board_x, board_y))
+
+        histograms = {}
+        for key, points in groups.items():
+            coordinates = np.asarray(points, dtype=np.float64)
+            histogram, _, _ = np.histogram2d(
+                coordinates[:, 1], coordinates[:, 0],
+                bins=self.bins, range=[[-self.extent, self.extent], [-self.extent, self.extent]]
+            )
+            histograms[key] = histogram.astype(np.int32)
+
+        with self.lock:
+            for key, histogram in histograms.items():
+                current = self.histograms.get(key)
+                self.histograms[key] = histogram if current is None else current + histogram
+                self.versions[key] = self.versions.get(key, 0) + 1
+        logger.info(f"Loaded {len(histograms)} heatmaps from the throw history")
+
+    def histogram(self, player: Optional[str] = None, board_id: Optional[str] = None) -> Tuple[np.ndarray, int]:
+        """Copy of a histogram (all players/boards where None) and its version"""
+        key = (ALL_PLAYERS if player is None else player, ALL_BOARDS if board_id is None else board_id)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            version = self.versions.get(key, 0)
+            if histogram is None:
+                return np.zeros((self.bins, self.bins), dtype=np.int32), version
+            return histogram.copy(), version
+
+    def render_png(self, player: Optional[str] = None, board_id: Optional[str] = None, size: int = 512, blur: float = 1.0, board: bool = True) -> bytes:
+        """Heatmap as a PNG, re-rendered only if throws arrived since the cached render"""
+        key = (ALL_PLAYERS if player is None else player, ALL_BOARDS if board_id is None else board_id)
+        cache_key = (key, size, blur, board)
+        with self.lock:
+            version = self.versions.get(key, 0)
+            cached = self.render_cache.get(cache_key)
+            if cached is not None:
+                self.render_cache.move_to_end(cache_key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        histogram, version = self.histogram(*key)
+        png = self._render(histogram, size, blur, board)
+        with self.lock:
+            self.render_cache[cache_key] = (version, png)
+            self.render_cache.move_to_end(cache_key)
+            while len(self.render_cache) > self.cache_size:
+                self.render_cache.popitem(last=False)
+        return png
+
+    def cache_bytes(self) -> int:
+        """Bytes of the cached PNG renders"""
+        with self.lock:
+            return sum(len(png) for _, png in self.render_cache.values())
+
+    def trim_cache(self, budget: int) -> int:
+        """Evict the least recently used renders until the cache fits budget bytes; returns how many were evicted"""
+        evicted = 0
+        with self.lock:
+            held = sum(len(png) for _, png in self.render_cache.values())
+            while held > budget and self.render_cache:
+                _, (_, png) = self.render_cache.popitem(last=False)
+                held -= len(png)
+                evicted += 1
+        return evicted
+
+    def _render(self, histogram: np.ndarray, size: int, blur: float, board: bool) -> bytes:
+        heat = histogram.astype(np.float32)
+        if blur > 0:
+            heat = cv2.GaussianBlur(heat, (0, 0), blur)
+        peak = float(heat.max())
+        if peak > 0:
+            heat *= 255.0 / peak
+        heat = cv2.resize(heat.astype(np.uint8), (size, size), interpolation=cv2.INTER_LINEAR)
+        image = cv2.applyColorMap(heat, cv2.COLORMAP_JET)
+        image[heat == 0] = 0
+
+        if board:
+            segmentation = DartboardSegmentation()
+            segmentation.update_calibration(size // 2, size // 2, int(size / (2 * self.extent)))
+            image = segmentation.draw_dartboard_overlay(image)
+
+        ok, buffer = cv2.imencode(".png", image)
+        if not ok:
+            raise ValueError("Failed to encode heatmap")
+        return buffer.tobytes()
+
+heatmap_service = HeatmapService()
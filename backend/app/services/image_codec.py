@@ -0,0 +1,212 @@
+import asyncio
+import base64
+import binascii
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Hashable, Optional, Tuple
+import cv2
+import numpy as np
+from ..core.config import settings
+from ..core.memory import memory
+from ..core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# (frame_id, quality, size) of a cached encoding
+EncodeKey = Tuple[Hashable, int, Optional[Tuple[int, int]]]
+
+
+class EncodeAbandoned(Exception):
+    """The caller that started a shared encoding was cancelled before it finished"""
+
+
+class JpegCodec:
+    """JPEG encoder/decoder used by the codec workers"""
+
+    name = "none"
+
+    def encode(self, image: np.ndarray, quality: int) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> Optional[np.ndarray]:
+        """BGR image, or None if data is not a valid image"""
+        raise NotImplementedError
+
+
+class OpenCVCodec(JpegCodec):
+    name = "opencv"
+
+    def encode(self, image: np.ndarray, quality: int) -> bytes:
+        ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise ValueError("JPEG encoding failed")
+        return buffer.tobytes()
+
+    def decode(self, data: bytes) -> Optional[np.ndarray]:
+        return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+class TurboJpegCodec(JpegCodec):
+    """libjpeg-turbo through PyTurboJPEG (pip install PyTurboJPEG)"""
+
+    name = "turbojpeg"
+
+    def __init__(self):
+        from turbojpeg import TurboJPEG
+        self.turbo = TurboJPEG()
+        # Decodes of other image formats (PNG uploads) still go through OpenCV
+        self.fallback = OpenCVCodec()
+
+    def encode(self, image: np.ndarray, quality: int) -> bytes:
+        return self.turbo.encode(image, quality=quality)
+
+    def decode(self, data: bytes) -> Optional[np.ndarray]:
+        if not data.startswith(b"\xff\xd8"):
+            return self.fallback.decode(data)
+        try:
+            return self.turbo.decode(data)
+        except (OSError, ValueError):
+            return None
+
+
+def load_codec(backend: str = "auto") -> JpegCodec:
+    """The requested codec; with "auto", libjpeg-turbo if it can be loaded, else OpenCV"""
+    if backend in ("auto", "turbojpeg"):
+        try:
+            return TurboJpegCodec()
+        except Exception as e:
+            if backend == "turbojpeg":
+                logger.warning(f"libjpeg-turbo is not available ({e}), falling back to OpenCV")
+    return OpenCVCodec()
+
+
+class EncodedImage:
+    """A JPEG encoding, with its base64 text once somebody asked for it"""
+
+    __slots__ = ("data", "text")
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.text: Optional[str] = None
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data) + (len(self.text) if self.text is not None else 0)
+
+
+class ImageCodecService:
+    """
+    Runs JPEG encoding and decoding in a bounded pool of worker threads, so large frames
+    never block the event loop. At most max_pending jobs are queued; further callers wait.
+    Encodings of live frames are shared: concurrent and repeated requests for the same
+    (frame_id, quality, size) encode once and get the same EncodedImage. The cache keeps
+    at most cache_size encodings and, within that, at most MEMORY_CODEC_CACHE_MB.
+    """
+
+    def __init__(self, backend: Optional[str] = None, workers: Optional[int] = None):
+        config = settings.codec
+        self.codec = load_codec(backend or config.backend)
+        self.workers = workers or config.workers or min(4, os.cpu_count() or 1)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="codec")
+        self.slots = asyncio.Semaphore(config.max_pending)
+        self.cache_size = config.cache_size
+        self.cache_budget = settings.memory.budget("codec_cache")
+        self.cache: "OrderedDict[EncodeKey, EncodedImage]" = OrderedDict()
+        self.inflight: Dict[EncodeKey, asyncio.Future] = {}
+        logger.info(f"Image codec: {self.codec.name} with {self.workers} workers")
+
+    async def _run(self, function, *args):
+        async with self.slots:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    def _encode(self, image: np.ndarray, quality: int, size: Optional[Tuple[int, int]]) -> bytes:
+        if size is not None and (image.shape[1], image.shape[0]) != size:
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        return self.codec.encode(image, quality)
+
+    async def encode(self, image: np.ndarray, quality: int = 90, size: Optional[Tuple[int, int]] = None) -> bytes:
+        """JPEG bytes of an image, optionally resized to size (width, height)"""
+        return await self._run(self._encode, image, quality, size)
+
+    async def encode_frame(self, frame_id: Hashable, image: np.ndarray, quality: int, size: Optional[Tuple[int, int]] = None) -> EncodedImage:
+        """Encoding of a live frame, shared by every caller asking for the same frame_id, quality and size"""
+        key = (frame_id, quality, size)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.cache.move_to_end(key)
+            metrics.inc_counter("dartify_codec_cache_total", labels={"result": "hit"})
+            return cached
+
+        pending = self.inflight.get(key)
+        if pending is not None:
+            metrics.inc_counter("dartify_codec_cache_total", labels={"result": "shared"})
+            try:
+                return await asyncio.shield(pending)
+            except EncodeAbandoned:
+                # Nobody is encoding this frame any more: encode it ourselves
+                return await self.encode_frame(frame_id, image, quality, size)
+
+        metrics.inc_counter("dartify_codec_cache_total", labels={"result": "miss"})
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            encoded = EncodedImage(await self._run(self._encode, image, quality, size))
+        except BaseException as e:
+            # Also on cancellation, so callers sharing this encoding never wait forever
+            future.set_exception(e if isinstance(e, Exception) else EncodeAbandoned())
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            del self.inflight[key]
+
+        future.set_result(encoded)
+        self.cache[key] = encoded
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        if self.cache_budget:
+            evicted = self.trim_cache(self.cache_budget)
+            if evicted:
+                memory.record_eviction("codec_cache", evicted)
+        return encoded
+
+    def cache_bytes(self) -> int:
+        """Bytes held by the cached encodings (JPEG data and base64 text)"""
+        return sum(encoded.nbytes for encoded in self.cache.values())
+
+    def trim_cache(self, budget: int) -> int:
+        """Evict the least recently used encodings (always keeping the newest) until the cache fits budget bytes"""
+        evicted = 0
+        held = self.cache_bytes()
+        while held > budget and len(self.cache) > 1:
+            _, encoded = self.cache.popitem(last=False)
+            held -= encoded.nbytes
+            evicted += 1
+        return evicted
+
+    async def base64(self, encoded: EncodedImage) -> str:
+        """Base64 text of an encoding, computed once"""
+        if encoded.text is None:
+            encoded.text = await self._run(lambda data: base64.b64encode(data).decode('utf-8'), encoded.data)
+        return encoded.text
+
+    async def decode(self, data: bytes) -> Optional[np.ndarray]:
+        """BGR image from encoded bytes, or None if they are not a valid image"""
+        return await self._run(self.codec.decode, data)
+
+    def _decode_base64(self, text: str) -> Optional[np.ndarray]:
+        try:
+            data = base64.b64decode(text)
+        except (binascii.Error, ValueError):
+            return None
+        return self.codec.decode(data)
+
+    async def decode_base64(self, text: str) -> Optional[np.ndarray]:
+        """BGR image from base64 text, or None if it is not a valid image"""
+        return await self._run(self._decode_base64, text)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+image_codec = ImageCodecService()
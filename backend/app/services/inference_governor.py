@@ -0,0 +1,157 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+import cv2
+import numpy as np
+from ..core.config import settings
+from ..core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest frame in the smoothed frame latency
+LATENCY_SMOOTHING = 0.2
+# Budget fraction below which the governor raises the rate or the input size again
+HEADROOM = 0.6
+# Rate decrease on overload, and rate increase (fraction of max_rate) per interval with headroom
+RATE_DECREASE = 0.75
+RATE_INCREASE = 0.1
+# Size of the grey thumbnail compared between frames for motion
+MOTION_THUMBNAIL = (64, 36)
+
+
+class InferenceGovernor:
+    """
+    Chooses the live inference rate and model input size from a latency and CPU budget.
+    Frame latency above budget lowers the input size; CPU above budget lowers the rate
+    first, then the input size. With headroom the input size is raised again when the
+    predicted latency at the bigger size still fits (latency grows with its area), then
+    the rate. While nothing moves on the board, or no client is connected, detection
+    runs at min_rate, which the rate never goes below.
+    """
+
+    def __init__(self):
+        config = settings.governor
+        self.enabled = config.enabled
+        self.latency_budget = config.latency_budget
+        self.cpu_budget = config.cpu_budget
+        self.max_rate = config.max_rate
+        self.min_rate = min(config.min_rate, config.max_rate)
+        self.image_sizes = sorted(config.image_sizes, reverse=True)
+        self.adjust_interval = config.adjust_interval
+        self.idle_after = config.idle_after
+        self.motion_threshold = config.motion_threshold
+        self.cores = os.cpu_count() or 1
+
+        self.rate = self.max_rate
+        self.size_index = 0
+        self.latency: Optional[float] = None
+        self.cpu = 0.0
+        self.clients = 0
+        self.last_motion = time.time()
+        self.thumbnail: Optional[np.ndarray] = None
+        self.last_adjust = time.perf_counter()
+        self.last_cpu_time = time.process_time()
+        self.lock = threading.Lock()
+
+    @property
+    def image_size(self) -> Optional[int]:
+        """Model input size to use, or None for the model's default"""
+        if not self.enabled or not self.image_sizes:
+            return None
+        return self.image_sizes[self.size_index]
+
+    @property
+    def idle(self) -> bool:
+        return self.clients == 0 or time.time() - self.last_motion > self.idle_after
+
+    @property
+    def current_rate(self) -> float:
+        return self.min_rate if self.idle else self.rate
+
+    def client_connected(self):
+        with self.lock:
+            self.clients += 1
+            self.last_motion = time.time()
+
+    def client_disconnected(self):
+        with self.lock:
+            self.clients = max(0, self.clients - 1)
+
+    def observe_frame(self, frame: np.ndarray):
+        """Track motion on the board from a small grey thumbnail of the frame"""
+        if not self.enabled:
+            return
+        small = cv2.resize(frame, MOTION_THUMBNAIL, interpolation=cv2.INTER_AREA)
+        grey = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        previous, self.thumbnail = self.thumbnail, grey
+        if previous is not None and float(cv2.absdiff(grey, previous).mean()) > self.motion_threshold:
+            self.last_motion = time.time()
+
+    def record_frame(self, seconds: float):
+        """Report the processing time of one live frame"""
+        if not self.enabled:
+            return
+        with self.lock:
+            if self.latency is None:
+                self.latency = seconds
+            else:
+                self.latency += LATENCY_SMOOTHING * (seconds - self.latency)
+            now = time.perf_counter()
+            if now - self.last_adjust >= self.adjust_interval:
+                self._adjust(now)
+
+    def _adjust(self, now: float):
+        """Move the operating point one step (called with the lock held)"""
+        cpu_time = time.process_time()
+        self.cpu = (cpu_time - self.last_cpu_time) / (now - self.last_adjust) / self.cores
+        self.last_cpu_time = cpu_time
+        self.last_adjust = now
+
+        latency = self.latency or 0.0
+        smallest = len(self.image_sizes) - 1
+        if latency > self.latency_budget and self.size_index < smallest:
+            self.size_index += 1
+        elif self.cpu > self.cpu_budget:
+            if self.rate > self.min_rate:
+                self.rate = max(self.min_rate, self.rate * RATE_DECREASE)
+            elif self.size_index < smallest:
+                self.size_index += 1
+        elif latency < HEADROOM * self.latency_budget and self.cpu < HEADROOM * self.cpu_budget:
+            if self.size_index > 0:
+                growth = (self.image_sizes[self.size_index - 1] / self.image_sizes[self.size_index]) ** 2
+                if latency * growth < HEADROOM * self.latency_budget:
+                    self.size_index -= 1
+                    self.latency *= growth
+            elif self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + RATE_INCREASE * self.max_rate)
+
+        metrics.set_gauge("dartify_governor_rate_hz", self.current_rate)
+        metrics.set_gauge("dartify_governor_image_size", self.image_size or 0)
+        metrics.set_gauge("dartify_governor_cpu", self.cpu)
+
+    def delay(self, elapsed: float) -> float:
+        """Seconds a live loop should wait after a frame that took elapsed seconds"""
+        if not self.enabled:
+            return 0.1
+        return max(0.0, 1.0 / self.current_rate - elapsed)
+
+    def operating_point(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "enabled": self.enabled,
+                "rate": self.current_rate,
+                "active_rate": self.rate,
+                "image_size": self.image_size,
+                "idle": self.idle,
+                "clients": self.clients,
+                "frame_latency": self.latency,
+                "cpu": self.cpu,
+                "latency_budget": self.latency_budget,
+                "cpu_budget": self.cpu_budget,
+                "min_rate": self.min_rate,
+                "max_rate": self.max_rate,
+            }
+
+inference_governor = InferenceGovernor()
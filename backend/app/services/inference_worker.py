@@ -0,0 +1,176 @@
+"""
+Stateless inference worker for remote detection.
+
+    python -m app.services.inference_worker --host 0.0.0.0 --port 7100 --model yolov8n.pt
+
+Loads the model, warms it up, prints "READY <port>" and serves requests from
+RemoteInferencePool clients (see remote_inference.py for the protocol). Any number of
+clients can connect; inference runs one request at a time, and ping replies report how
+many requests are waiting so clients can dispatch by load. Connections are authenticated
+with REMOTE_WORKER_AUTHKEY; a worker listening on another interface than loopback
+refuses to start with the default key.
+"""
+import argparse
+import ipaddress
+import logging
+import sys
+import threading
+import time
+from multiprocessing import AuthenticationError, resource_tracker, shared_memory
+from multiprocessing.connection import Connection, Listener
+from typing import Any, Dict, List, Optional
+import cv2
+import numpy as np
+from ..core.config import settings
+from .remote_inference import recv_message, send_message
+
+logger = logging.getLogger("inference_worker")
+
+# REMOTE_WORKER_AUTHKEY when it is not set, only accepted on loopback
+DEFAULT_AUTHKEY = "dartify"
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class InferenceWorker:
+    def __init__(self, model_path: str):
+        self.model_path = model_path
+        self.model = None
+        self.lock = threading.Lock()
+        self.counter_lock = threading.Lock()
+        self.waiting = 0
+        self.served = 0
+        self.started_at = time.time()
+
+    def load(self, warmup_iterations: int):
+        from ultralytics import YOLO
+
+        start = time.perf_counter()
+        self.model = YOLO(self.model_path)
+        frame = np.zeros((settings.camera.height, settings.camera.width, 3), dtype=np.uint8)
+        for _ in range(warmup_iterations):
+            self.model(frame, verbose=False)
+        logger.info(f"Model {self.model_path} loaded and warmed up in {time.perf_counter() - start:.2f}s")
+
+    def serve(self, host: str, port: int, authkey: bytes):
+        listener = Listener((host, port), authkey=authkey)
+        print(f"READY {listener.address[1]}", flush=True)
+        logger.info(f"Serving inference on {host}:{listener.address[1]}")
+        while True:
+            try:
+                connection = listener.accept()
+            except (AuthenticationError, EOFError, OSError) as e:
+                logger.warning(f"Rejected connection: {e}")
+                continue
+            threading.Thread(target=self._handle, args=(connection,), name="inference-connection", daemon=True).start()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ok": True,
+            "model": self.model_path,
+            "waiting": self.waiting,
+            "served": self.served,
+            "uptime": time.time() - self.started_at,
+        }
+
+    def _handle(self, connection: Connection):
+        # The client's shared memory segment, attached once and replaced when the client grows it
+        segment: List[Optional[shared_memory.SharedMemory]] = [None]
+        try:
+            while True:
+                header, payloads = recv_message(connection)
+                op = header.get("op")
+                if op == "ping":
+                    send_message(connection, self.status())
+                elif op == "infer":
+                    send_message(connection, self._infer(header, payloads, segment))
+                else:
+                    send_message(connection, {"id": header.get("id"), "error": f"Unknown operation {op}"})
+        except (EOFError, OSError):
+            pass
+        finally:
+            if segment[0] is not None:
+                segment[0].close()
+            connection.close()
+
+    def _attach(self, name: str, segment: List[Optional[shared_memory.SharedMemory]]) -> shared_memory.SharedMemory:
+        if segment[0] is not None and segment[0].name == name:
+            return segment[0]
+        if segment[0] is not None:
+            segment[0].close()
+            segment[0] = None
+        shm = shared_memory.SharedMemory(name=name)
+        # The client owns the segment; the worker must not unlink it on exit
+        resource_tracker.unregister(shm._name, "shared_memory")
+        segment[0] = shm
+        return shm
+
+    def _images(self, header: Dict[str, Any], payloads: List[bytes], segment) -> List[np.ndarray]:
+        images = []
+        for spec in header["images"]:
+            if "shm" in spec:
+                shm = self._attach(spec["shm"], segment)
+                # Copied, so the segment can be closed even while a result still refers to the frame
+                view = np.ndarray(tuple(spec["shape"]), dtype=np.uint8, buffer=shm.buf, offset=spec["offset"])
+                images.append(view.copy())
+                del view
+            else:
+                image = cv2.imdecode(np.frombuffer(payloads[spec["payload"]], np.uint8), cv2.IMREAD_COLOR)
+                if image is None:
+                    raise ValueError("Invalid JPEG payload")
+                images.append(image)
+        return images
+
+    def _infer(self, header: Dict[str, Any], payloads: List[bytes], segment) -> Dict[str, Any]:
+        try:
+            images = self._images(header, payloads, segment)
+            options = {key: header[key] for key in ("conf", "imgsz") if key in header}
+            with self.counter_lock:
+                self.waiting += 1
+            try:
+                with self.lock:
+                    start = time.perf_counter()
+                    results = self.model(images, verbose=False, **options)
+                    seconds = time.perf_counter() - start
+            finally:
+                with self.counter_lock:
+                    self.waiting -= 1
+                    self.served += 1
+            boxes = [result.boxes.data.cpu().numpy().tolist() for result in results]
+            return {"id": header.get("id"), "boxes": boxes, "seconds": seconds}
+        except Exception as e:
+            logger.error(f"Inference failed: {e}")
+            return {"id": header.get("id"), "error": str(e)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Dartify remote inference worker")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (0.0.0.0 for other hosts)")
+    parser.add_argument("--port", type=int, default=settings.remote.worker_port, help="Port to listen on (0 = any free port)")
+    parser.add_argument("--model", default=settings.model.model_path, help="YOLO model file")
+    parser.add_argument("--warmup", type=int, default=settings.model.warmup_iterations, help="Warm-up inferences before serving")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    if settings.remote.authkey == DEFAULT_AUTHKEY and not is_loopback(args.host):
+        # Anyone who can reach the port could send work with the well-known key
+        logger.error(f"Refusing to listen on {args.host} with the default authkey; set REMOTE_WORKER_AUTHKEY on the server and the workers")
+        return 2
+    worker = InferenceWorker(args.model)
+    worker.load(args.warmup)
+    try:
+        worker.serve(args.host, args.port, settings.remote.authkey.encode("utf-8"))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,428 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+from multiprocessing.connection import Client, Connection
+from typing import Any, Awaitable, Dict, List, Optional, Sequence, Tuple, TypeVar
+import cv2
+import numpy as np
+from ..core.config import RemoteInferenceSettings, settings
+from ..core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Wire protocol: every message is a JSON header followed by `payloads` raw byte messages.
+# Frames are either JPEG payloads or, for workers on the same host, an offset into a
+# shared memory segment owned by the sending connection. Nothing is unpickled.
+LOCAL_HOSTS = {"127.0.0.1", "localhost", "::1"}
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+T = TypeVar("T")
+
+
+def send_message(connection: Connection, header: Dict[str, Any], payloads: Sequence[bytes] = ()):
+    connection.send_bytes(json.dumps(dict(header, payloads=len(payloads))).encode("utf-8"))
+    for payload in payloads:
+        connection.send_bytes(payload)
+
+
+def recv_message(connection: Connection) -> Tuple[Dict[str, Any], List[bytes]]:
+    header = json.loads(connection.recv_bytes())
+    return header, [connection.recv_bytes() for _ in range(header.get("payloads", 0))]
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.strip().rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+class RemoteBoxes:
+    __slots__ = ("data",)
+
+    def __init__(self, data: np.ndarray):
+        self.data = data
+
+
+class RemoteResult:
+    """Boxes returned by a worker, shaped like an ultralytics result (result.boxes.data)"""
+
+    __slots__ = ("boxes",)
+
+    def __init__(self, rows: List[List[float]]):
+        self.boxes = RemoteBoxes(np.asarray(rows, dtype=np.float32).reshape(-1, 6))
+
+
+class WorkerChannel:
+    """One connection to a worker (one request at a time), with its shared memory segment for frames"""
+
+    def __init__(self, address: Tuple[str, int], authkey: bytes, shared: bool):
+        self.connection = Client(address, authkey=authkey)
+        self.shared = shared
+        self.shm: Optional[shared_memory.SharedMemory] = None
+
+    def _stage_shared(self, images: Sequence[np.ndarray]) -> List[Dict[str, Any]]:
+        """Copy the images into the segment, growing it (under a new name) when they do not fit"""
+        total = sum(image.nbytes for image in images)
+        if self.shm is None or self.shm.size < total:
+            self._release_shm()
+            self.shm = shared_memory.SharedMemory(create=True, size=max(total, 1))
+        specs = []
+        offset = 0
+        for image in images:
+            target = np.ndarray(image.shape, dtype=np.uint8, buffer=self.shm.buf, offset=offset)
+            target[...] = image
+            del target
+            specs.append({"shm": self.shm.name, "offset": offset, "shape": list(image.shape)})
+            offset += image.nbytes
+        return specs
+
+    def request(self, header: Dict[str, Any], images: Sequence[np.ndarray], jpeg_quality: int, timeout: float) -> Dict[str, Any]:
+        payloads: List[bytes] = []
+        if images and self.shared:
+            header = dict(header, images=self._stage_shared(images))
+        elif images:
+            specs = []
+            for image in images:
+                ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+                if not ok:
+                    raise ValueError("JPEG encoding failed")
+                specs.append({"payload": len(payloads)})
+                payloads.append(buffer.tobytes())
+            header = dict(header, images=specs)
+        send_message(self.connection, header, payloads)
+        if not self.connection.poll(timeout):
+            raise TimeoutError(f"No reply within {timeout:.1f}s")
+        response, _ = recv_message(self.connection)
+        return response
+
+    def _release_shm(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def close(self):
+        try:
+            self.connection.close()
+        except OSError:
+            pass
+        self._release_shm()
+
+
+class RemoteWorker:
+    """Client-side view of one inference worker: its connections, health and load"""
+
+    def __init__(self, address: Tuple[str, int], shared: bool, process: Optional[subprocess.Popen] = None):
+        self.address = address
+        self.name = f"{address[0]}:{address[1]}"
+        self.shared = shared
+        self.process = process
+        self.idle: List[WorkerChannel] = []
+        self.health_channel: Optional[WorkerChannel] = None
+        self.healthy = False
+        self.inflight = 0
+        self.reported_waiting = 0  # requests queued at the worker, from all clients
+        self.latency = 0.05  # smoothed seconds per request
+        self.requests = 0
+        self.failures = 0
+        self.model: Optional[str] = None
+
+    @property
+    def load(self) -> float:
+        """Expected wait for one more request; the worker's own queue includes ours"""
+        return (max(self.inflight, self.reported_waiting) + 1) * self.latency
+
+    def close_channels(self):
+        for channel in self.idle:
+            channel.close()
+        self.idle = []
+        if self.health_channel is not None:
+            self.health_channel.close()
+            self.health_channel = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "address": self.name,
+            "healthy": self.healthy,
+            "transport": "shared_memory" if self.shared else "jpeg",
+            "inflight": self.inflight,
+            "waiting": self.reported_waiting,
+            "latency": self.latency,
+            "requests": self.requests,
+            "failures": self.failures,
+            "model": self.model,
+            "local_process": self.process.pid if self.process is not None else None,
+        }
+
+
+def spawn_local_worker(model_path: str, timeout: float = 120.0) -> Tuple[subprocess.Popen, Tuple[str, int]]:
+    """Start an inference worker subprocess on a free local port; returns once its model is loaded"""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "app.services.inference_worker", "--host", "127.0.0.1", "--port", "0", "--model", model_path],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    # The worker prints "READY <port>" once it listens; readline blocks until then
+    timer = threading.Timer(timeout, process.kill)
+    timer.start()
+    try:
+        line = process.stdout.readline().split()
+    finally:
+        timer.cancel()
+    if len(line) != 2 or line[0] != "READY":
+        process.kill()
+        raise RuntimeError(f"Inference worker did not start (exit code {process.poll()})")
+    return process, ("127.0.0.1", int(line[1]))
+
+
+class FrameSequencer:
+    """
+    Releases detection results in frame order. Remote workers can finish frames out of
+    order; a result is held until every earlier frame in flight was released (or failed),
+    so the tracker never sees an older frame after a newer one.
+    Used from the event loop only.
+    """
+
+    def __init__(self):
+        self.pending: Dict[int, int] = {}  # frame_id -> detections in flight
+        self.changed = asyncio.Event()
+
+    def _notify(self):
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    async def run(self, frame_id: int, detection: Awaitable[T]) -> T:
+        self.pending[frame_id] = self.pending.get(frame_id, 0) + 1
+        try:
+            result = await detection
+            while min(self.pending) < frame_id:
+                await self.changed.wait()
+            return result
+        finally:
+            remaining = self.pending[frame_id] - 1
+            if remaining:
+                self.pending[frame_id] = remaining
+            else:
+                del self.pending[frame_id]
+            self._notify()
+
+
+class RemoteInferencePool:
+    """
+    Runs model inference on a pool of stateless workers (app/services/inference_worker.py),
+    local subprocesses or other hosts, instead of in the process that owns the camera.
+    Each request goes to the healthy worker with the lowest expected wait (its queue
+    times its smoothed latency); a background thread pings every worker and takes
+    unresponsive ones out of rotation until they answer again. A request that fails on
+    one worker is retried once on another.
+    """
+
+    def __init__(
+        self,
+        addresses: Sequence[Tuple[str, int]] = (),
+        config: Optional[RemoteInferenceSettings] = None,
+    ):
+        self.config = config or settings.remote
+        self.authkey = self.config.authkey.encode("utf-8")
+        self.workers: List[RemoteWorker] = [self._worker(address) for address in addresses]
+        self.condition = threading.Condition()
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.request_ids = itertools.count(1)
+        self.running = False
+        self.health_thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_settings(cls, model_path: str, config: Optional[RemoteInferenceSettings] = None) -> "RemoteInferencePool":
+        """Pool of the configured workers plus the configured number of local subprocess workers, started"""
+        config = config or settings.remote
+        pool = cls([parse_address(address) for address in config.workers.split(",") if address.strip()], config)
+        try:
+            for _ in range(config.local_workers):
+                pool.add_local_worker(model_path)
+            pool.start()
+        except Exception:
+            pool.shutdown()
+            raise
+        return pool
+
+    def _worker(self, address: Tuple[str, int], process: Optional[subprocess.Popen] = None) -> RemoteWorker:
+        local = address[0] in LOCAL_HOSTS
+        transport = self.config.transport
+        if transport == "shm" and not local:
+            logger.warning(f"Inference worker {address[0]}:{address[1]} is not local, sending JPEG frames")
+        return RemoteWorker(address, shared=local and transport in ("auto", "shm"), process=process)
+
+    def add_local_worker(self, model_path: str) -> RemoteWorker:
+        process, address = spawn_local_worker(model_path)
+        worker = self._worker(address, process)
+        with self.condition:
+            self.workers.append(worker)
+        logger.info(f"Started local inference worker {worker.name} (pid={process.pid})")
+        return worker
+
+    def start(self, wait: Optional[float] = None):
+        """Start health checks; returns once a worker is healthy, or raises RuntimeError after wait seconds"""
+        if not self.workers:
+            raise RuntimeError("No inference workers configured")
+        slots = len(self.workers) * self.config.max_inflight
+        self.executor = ThreadPoolExecutor(max_workers=slots, thread_name_prefix="remote-inference")
+        self.running = True
+        for worker in self.workers:
+            self._check(worker)
+        self.health_thread = threading.Thread(target=self._health_loop, name="remote-inference-health", daemon=True)
+        self.health_thread.start()
+
+        deadline = time.perf_counter() + (self.config.timeout * 2 if wait is None else wait)
+        with self.condition:
+            while not any(worker.healthy for worker in self.workers):
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise RuntimeError("No inference worker is reachable")
+                self.condition.wait(remaining)
+
+    def _health_loop(self):
+        while self.running:
+            time.sleep(self.config.health_interval)
+            for worker in list(self.workers):
+                if self.running:
+                    self._check(worker)
+
+    def _check(self, worker: RemoteWorker):
+        """Ping a worker on its own connection, so the check does not queue behind inference"""
+        if worker.process is not None and worker.process.poll() is not None:
+            self._set_health(worker, False, f"process exited with code {worker.process.returncode}")
+            return
+        try:
+            if worker.health_channel is None:
+                worker.health_channel = WorkerChannel(worker.address, self.authkey, shared=False)
+            status = worker.health_channel.request({"op": "ping"}, (), 0, self.config.timeout)
+        except (OSError, EOFError, TimeoutError, ValueError) as e:
+            if worker.health_channel is not None:
+                worker.health_channel.close()
+                worker.health_channel = None
+            self._set_health(worker, False, str(e) or type(e).__name__)
+            return
+        worker.reported_waiting = status.get("waiting", 0)
+        worker.model = status.get("model")
+        self._set_health(worker, True)
+
+    def _set_health(self, worker: RemoteWorker, healthy: bool, reason: str = ""):
+        with self.condition:
+            changed = worker.healthy != healthy
+            worker.healthy = healthy
+            if not healthy:
+                for channel in worker.idle:
+                    channel.close()
+                worker.idle = []
+            self.condition.notify_all()
+        if changed:
+            if healthy:
+                logger.info(f"Inference worker {worker.name} is healthy")
+            else:
+                logger.warning(f"Inference worker {worker.name} is unavailable: {reason}")
+        metrics.set_gauge("dartify_remote_workers_healthy", sum(w.healthy for w in self.workers))
+
+    def _acquire(self, exclude: Optional[RemoteWorker]) -> RemoteWorker:
+        """Reserve a request slot on the least loaded healthy worker, waiting while all are busy"""
+        deadline = time.perf_counter() + self.config.timeout
+        with self.condition:
+            while True:
+                candidates = [
+                    worker for worker in self.workers
+                    if worker.healthy and worker is not exclude and worker.inflight < self.config.max_inflight
+                ]
+                if candidates:
+                    worker = min(candidates, key=lambda w: w.load)
+                    worker.inflight += 1
+                    return worker
+                if not any(worker.healthy and worker is not exclude for worker in self.workers):
+                    raise RuntimeError("No healthy inference worker")
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise TimeoutError("All inference workers are busy")
+                self.condition.wait(remaining)
+
+    def _release(self, worker: RemoteWorker, channel: Optional[WorkerChannel]):
+        with self.condition:
+            worker.inflight -= 1
+            if channel is not None:
+                worker.idle.append(channel)
+            self.condition.notify()
+
+    def _request(self, worker: RemoteWorker, images: Sequence[np.ndarray], options: Dict[str, Any]) -> Dict[str, Any]:
+        channel = None
+        try:
+            with self.condition:
+                channel = worker.idle.pop() if worker.idle else None
+            if channel is None:
+                channel = WorkerChannel(worker.address, self.authkey, worker.shared)
+            header = {"op": "infer", "id": next(self.request_ids), **options}
+            start = time.perf_counter()
+            response = channel.request(header, images, self.config.jpeg_quality, self.config.timeout)
+            worker.latency = 0.8 * worker.latency + 0.2 * (time.perf_counter() - start)
+            worker.requests += 1
+        except BaseException:
+            if channel is not None:
+                channel.close()
+            self._release(worker, None)
+            raise
+        self._release(worker, channel)
+        return response
+
+    def _infer(self, images: Sequence[np.ndarray], options: Dict[str, Any]) -> List[RemoteResult]:
+        tried: Optional[RemoteWorker] = None
+        for attempt in range(2):
+            worker = self._acquire(exclude=tried)
+            try:
+                response = self._request(worker, images, options)
+            except (OSError, EOFError, TimeoutError) as e:
+                worker.failures += 1
+                metrics.inc_counter("dartify_remote_requests_total", labels={"worker": worker.name, "result": "failed"})
+                self._set_health(worker, False, str(e) or type(e).__name__)
+                tried = worker
+                if attempt == 1:
+                    raise
+                continue
+            if "error" in response:
+                metrics.inc_counter("dartify_remote_requests_total", labels={"worker": worker.name, "result": "error"})
+                raise RuntimeError(f"Inference worker {worker.name}: {response['error']}")
+            metrics.inc_counter("dartify_remote_requests_total", labels={"worker": worker.name, "result": "ok"})
+            return [RemoteResult(rows) for rows in response["boxes"]]
+        raise RuntimeError("No healthy inference worker")
+
+    async def infer(self, images, **options) -> List[RemoteResult]:
+        """Model results for one image or a list of images; options are model options (conf, imgsz)"""
+        if isinstance(images, np.ndarray):
+            images = [images]
+        options = {key: value for key, value in options.items() if key in ("conf", "imgsz") and value is not None}
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._infer, list(images), options)
+
+    def status(self) -> Dict[str, Any]:
+        return {"workers": [worker.to_dict() for worker in self.workers]}
+
+    def memory_usage(self) -> int:
+        """Bytes of the shared memory segments of the idle connections (busy ones are not visible)"""
+        with self.condition:
+            return sum(channel.shm.size for worker in self.workers for channel in worker.idle if channel.shm is not None)
+
+    def shutdown(self):
+        """Close all connections and stop the local worker processes"""
+        self.running = False
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+        for worker in self.workers:
+            worker.close_channels()
+            if worker.process is not None and worker.process.poll() is None:
+                worker.process.terminate()
+                try:
+                    worker.process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    worker.process.kill()
@@ -1,18 +1,25 @@
 import numpy as np
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from ..core.exceptions import ScoringError
 from ..models.dart import Dart
 from ..models.score import Score, DartThrow
 from ..utils.dartboard_segmentation import DartboardSegmentation
+from .calibration_store import CalibrationArtifacts
+from .calibration_state import CalibrationState, calibration_state as shared_calibration_state
 
 logger = logging.getLogger(__name__)
 
 class ScoringService:
     """Service for calculating dart scores based on their position on the dartboard"""
     
-    def __init__(self):
-        self.dartboard_segmentation = DartboardSegmentation()
+    def __init__(self, calibration_state: Optional[CalibrationState] = None):
+        self.calibration_state = calibration_state or shared_calibration_state
+    
+    @property
+    def dartboard_segmentation(self) -> DartboardSegmentation:
+        """Segmentation of the current calibration snapshot"""
+        return self.calibration_state.current.segmentation
     
     def calculate_score(self, darts: List[Dart], image_width: int, image_height: int) -> Score:
         """
@@ -27,12 +34,15 @@ class ScoringService:
                 image_height=image_height
             )
         
+        # One snapshot for the whole frame, even if the calibration changes meanwhile
+        segmentation = self.calibration_state.current.segmentation_for(image_width, image_height)
+        
         dart_throws = []
         total_score = 0
         
         for dart in darts:
             # Get the section of the dartboard where the dart landed
-            section = self.dartboard_segmentation.get_section(dart.x, dart.y)
+            section = segmentation.get_section(dart.x, dart.y)
             
             # Calculate score for this dart
             dart_score = section.number * section.multiplier
@@ -55,7 +65,7 @@ class ScoringService:
             image_height=image_height
         )
     
-    def update_calibration(self, center_x: int, center_y: int, radius: int):
-        """Update dartboard calibration parameters"""
-        self.dartboard_segmentation.update_calibration(center_x, center_y, radius)
+    def update_calibration(self, center_x: int, center_y: int, radius: int, artifacts: Optional[CalibrationArtifacts] = None):
+        """Publish new dartboard calibration parameters, using precomputed artifacts if given"""
+        self.calibration_state.publish(center_x, center_y, radius, artifacts=artifacts)
         logger.info(f"Scoring service calibration updated: center=({center_x}, {center_y}), radius={radius}")
\ No newline at end of file
@@ -0,0 +1,146 @@
+import logging
+import math
+import threading
+import uuid
+from typing import Callable, List, Optional, Tuple
+from ..core.config import settings
+from ..core.metrics import metrics
+from ..models.score import Score
+from ..models.throw import ThrowRecord
+from .calibration_state import CalibrationState, calibration_state as shared_calibration_state
+from .calibration_store import default_camera_id
+
+logger = logging.getLogger(__name__)
+
+ThrowListener = Callable[[ThrowRecord], None]
+
+class ThrowDetector:
+    """
+    Turns the scored stable darts of successive frames into dart-landed and dart-removed events.
+    A dart lands when a stable dart appears that is not already on the board; it is removed
+    only after it has been missing for removal_frames frames, so short tracking gaps (such as
+    the periodic tracker reset) do not produce duplicate throws.
+    """
+
+    def __init__(
+        self,
+        board_id: Optional[str] = None,
+        tolerance: float = 10.0,
+        removal_frames: Optional[int] = None,
+        calibration_state: Optional[CalibrationState] = None
+    ):
+        self.board_id = board_id or default_camera_id()
+        self.tolerance = tolerance
+        self.removal_frames = settings.throws.removal_frames if removal_frames is None else removal_frames
+        self.calibration_state = calibration_state or shared_calibration_state
+        self.lock = threading.Lock()
+        self.on_board: List[List] = []  # [record, frames missing]
+        self.last_frame_id = -1
+        self.session_id = uuid.uuid4().hex
+        self.player: Optional[str] = None
+        self.landed_listeners: List[ThrowListener] = []
+        self.removed_listeners: List[ThrowListener] = []
+
+    def on_landed(self, listener: ThrowListener):
+        """Register a callback invoked for every dart that lands"""
+        self.landed_listeners.append(listener)
+
+    def on_removed(self, listener: ThrowListener):
+        """Register a callback invoked for every dart taken off the board"""
+        self.removed_listeners.append(listener)
+
+    def start_session(self, session_id: Optional[str] = None) -> str:
+        """Start a new session; throws from now on are recorded under it"""
+        with self.lock:
+            self.session_id = session_id or uuid.uuid4().hex
+        logger.info(f"Throw session {self.session_id} started")
+        return self.session_id
+
+    def set_player(self, player: Optional[str]):
+        """Attribute the next throws to a player"""
+        with self.lock:
+            self.player = player
+
+    def darts_on_board(self) -> List[ThrowRecord]:
+        with self.lock:
+            return [record for record, _ in self.on_board]
+
+    def update(self, score: Score, frame_id: int, timestamp: float) -> Tuple[List[ThrowRecord], List[ThrowRecord]]:
+        """
+        Compare the scored darts of a frame with the darts already on the board
+        Returns (landed, removed); frames that were already processed (by another consumer) are ignored
+        """
+        with self.lock:
+            if frame_id <= self.last_frame_id:
+                return [], []
+            self.last_frame_id = frame_id
+
+            calibration = self.calibration_state.current
+            matched = [False] * len(self.on_board)
+            landed: List[ThrowRecord] = []
+
+            for dart_throw in score.throws:
+                index = self._nearest(dart_throw.x, dart_throw.y, matched)
+                if index is not None:
+                    matched[index] = True
+                    continue
+                # Stable darts can be reported twice for the same position
+                if any(math.hypot(r.x - dart_throw.x, r.y - dart_throw.y) <= self.tolerance for r in landed):
+                    continue
+
+                section = dart_throw.section
+                landed.append(ThrowRecord(
+                    throw_id=uuid.uuid4().hex,
+                    session_id=self.session_id,
+                    board_id=self.board_id,
+                    player=self.player,
+                    frame_id=frame_id,
+                    timestamp=timestamp,
+                    number=section.number,
+                    multiplier=section.multiplier,
+                    label=section.label,
+                    points=section.number * section.multiplier,
+                    x=dart_throw.x,
+                    y=dart_throw.y,
+                    board_x=(dart_throw.x - calibration.center_x) / calibration.radius,
+                    board_y=(dart_throw.y - calibration.center_y) / calibration.radius,
+                    confidence=dart_throw.confidence
+                ))
+
+            removed: List[ThrowRecord] = []
+            remaining = []
+            for entry, seen in zip(self.on_board, matched):
+                entry[1] = 0 if seen else entry[1] + 1
+                if entry[1] >= self.removal_frames:
+                    removed.append(entry[0])
+                else:
+                    remaining.append(entry)
+            self.on_board = remaining + [[record, 0] for record in landed]
+
+        if landed:
+            metrics.inc_counter("dartify_throws_total", len(landed))
+        self._notify(self.landed_listeners, landed)
+        self._notify(self.removed_listeners, removed)
+        return landed, removed
+
+    def _nearest(self, x: float, y: float, matched: List[bool]) -> Optional[int]:
+        """Index of the closest unmatched dart on the board within the tolerance"""
+        best, best_distance = None, self.tolerance
+        for index, (record, _) in enumerate(self.on_board):
+            if matched[index]:
+                continue
+            distance = math.hypot(record.x - x, record.y - y)
+            if distance <= best_distance:
+                best, best_distance = index, distance
+        return best
+
+    @staticmethod
+    def _notify(listeners: List[ThrowListener], records: List[ThrowRecord]):
+        for record in records:
+            for listener in listeners:
+                try:
+                    listener(record)
+                except Exception as e:
+                    logger.error(f"Throw listener error: {e}")
+
+throw_detector = ThrowDetector()
@@ -0,0 +1,293 @@
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from ..core.config import settings
+from ..core.metrics import metrics
+from ..models.throw import SegmentStats, ThrowRecord, ThrowStats
+
+logger = logging.getLogger(__name__)
+
+# Aggregate key of all players together
+ALL_PLAYERS = "*"
+# Aggregate key of throws that were not attributed to a player
+UNKNOWN_PLAYER = ""
+
+# Queue item that tells the writer thread to exit
+STOP = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS throws (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    throw_id TEXT NOT NULL UNIQUE,
+    session_id TEXT NOT NULL,
+    board_id TEXT NOT NULL,
+    player TEXT NOT NULL,
+    frame_id INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    number INTEGER NOT NULL,
+    multiplier INTEGER NOT NULL,
+    label TEXT NOT NULL,
+    points INTEGER NOT NULL,
+    x REAL NOT NULL,
+    y REAL NOT NULL,
+    board_x REAL NOT NULL,
+    board_y REAL NOT NULL,
+    confidence REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS throws_player ON throws (player, id);
+CREATE INDEX IF NOT EXISTS throws_session ON throws (session_id, id);
+CREATE TABLE IF NOT EXISTS aggregates (
+    player TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    multiplier INTEGER NOT NULL,
+    label TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    points INTEGER NOT NULL,
+    PRIMARY KEY (player, number, multiplier)
+);
+"""
+
+INSERT_THROW = """
+INSERT OR IGNORE INTO throws (
+    throw_id, session_id, board_id, player, frame_id, timestamp, number, multiplier,
+    label, points, x, y, board_x, board_y, confidence
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+UPSERT_AGGREGATE = """
+INSERT INTO aggregates (player, number, multiplier, label, count, points) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (player, number, multiplier) DO UPDATE SET
+    count = count + excluded.count,
+    points = points + excluded.points
+"""
+
+# Per player: (number, multiplier) -> [label, count, points]
+SegmentCounts = Dict[Tuple[int, int], list]
+
+class ThrowStore:
+    """
+    Embedded throw history in SQLite (WAL mode).
+    record() only updates the in-memory aggregates and enqueues the throw; a background
+    writer inserts queued throws in batches, one transaction per batch, and persists the
+    aggregate deltas in the same transaction. Statistics are served from the in-memory
+    aggregates, which are loaded from the aggregates table on start, never from a scan.
+    """
+
+    def __init__(self, path: Optional[str] = None, batch_size: Optional[int] = None, flush_interval: Optional[float] = None):
+        self.path = path or settings.throws.path
+        self.batch_size = batch_size or settings.throws.batch_size
+        self.flush_interval = flush_interval or settings.throws.flush_interval
+        self.queue: "queue.Queue[Optional[ThrowRecord]]" = queue.Queue(maxsize=settings.throws.queue_size)
+        self.lock = threading.Lock()
+        self.read_lock = threading.Lock()
+        self.aggregates: Dict[str, SegmentCounts] = {}
+        self.totals: Dict[str, List[int]] = {}  # player -> [darts, points]
+        self.writer: Optional[threading.Thread] = None
+        self.read_connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.writer is not None and self.writer.is_alive()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def start(self):
+        """Create the schema, load the aggregates and start the writer thread"""
+        if self.is_running:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        connection = self._connect()
+        connection.executescript(SCHEMA)
+        rows = connection.execute("SELECT player, number, multiplier, label, count, points FROM aggregates").fetchall()
+        with self.lock:
+            self.aggregates = {}
+            self.totals = {}
+            for player, number, multiplier, label, count, points in rows:
+                self._add(player, number, multiplier, label, count, points)
+
+        self.read_connection = connection
+        self.writer = threading.Thread(target=self._write_loop, name="throw-store-writer", daemon=True)
+        self.writer.start()
+        logger.info(f"Throw store opened at {self.path} ({len(rows)} aggregate rows)")
+
+    def stop(self):
+        """Write everything still queued and stop the writer thread"""
+        if not self.is_running:
+            return
+        self.queue.put(STOP)
+        self.writer.join()
+        self.writer = None
+        with self.read_lock:
+            self.read_connection.close()
+            self.read_connection = None
+
+    def flush(self):
+        """Block until every throw recorded so far has been written"""
+        if self.is_running:
+            self.queue.join()
+
+    def _add(self, player: str, number: int, multiplier: int, label: str, count: int, points: int):
+        """Add to the aggregates of a player and of all players (called with the lock held)"""
+        for key in (player, ALL_PLAYERS):
+            segment = self.aggregates.setdefault(key, {}).setdefault((number, multiplier), [label, 0, 0])
+            segment[1] += count
+            segment[2] += points
+            total = self.totals.setdefault(key, [0, 0])
+            total[0] += count
+            total[1] += points
+
+    def record(self, record: ThrowRecord):
+        """Record a landed dart; never blocks on disk. It counts in the stats once it was written"""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc_counter("dartify_dropped_throws_total")
+            logger.warning(f"Throw store queue full, throw {record.throw_id} not persisted")
+            return
+        metrics.set_gauge("dartify_queue_depth", self.queue.qsize(), {"queue": "throw_store"})
+
+    def _write_loop(self):
+        connection = self._connect()
+        try:
+            while True:
+                try:
+                    first = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+
+                batch = [first]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                records = [record for record in batch if record is not STOP]
+                if records:
+                    self._write_batch(connection, records)
+                for _ in batch:
+                    self.queue.task_done()
+                metrics.set_gauge("dartify_queue_depth", self.queue.qsize(), {"queue": "throw_store"})
+
+                if len(records) != len(batch):
+                    return
+        finally:
+            connection.close()
+
+    def _write_batch(self, connection: sqlite3.Connection, records: List[ThrowRecord]):
+        """Insert a batch of throws and its aggregate deltas in a single transaction"""
+        deltas: Dict[Tuple[str, int, int], list] = {}
+        for record in records:
+            key = (record.player or UNKNOWN_PLAYER, record.number, record.multiplier)
+            delta = deltas.setdefault(key, [record.label, 0, 0])
+            delta[1] += 1
+            delta[2] += record.points
+
+        start = time.perf_counter()
+        try:
+            with connection:
+                connection.executemany(INSERT_THROW, [
+                    (
+                        r.throw_id, r.session_id, r.board_id, r.player or UNKNOWN_PLAYER, r.frame_id, r.timestamp,
+                        r.number, r.multiplier, r.label, r.points, r.x, r.y, r.board_x, r.board_y, r.confidence
+                    )
+                    for r in records
+                ])
+                connection.executemany(UPSERT_AGGREGATE, [
+                    (player, number, multiplier, label, count, points)
+                    for (player, number, multiplier), (label, count, points) in deltas.items()
+                ])
+        except sqlite3.Error as e:
+            logger.error(f"Failed to write {len(records)} throws: {e}")
+            return
+        metrics.observe_stage("throw_store_write", time.perf_counter() - start)
+
+        # Only committed throws are counted, so the stats always match the database
+        with self.lock:
+            for (player, number, multiplier), (label, count, points) in deltas.items():
+                self._add(player, number, multiplier, label, count, points)
+
+    def players(self) -> List[str]:
+        with self.lock:
+            return sorted(player for player in self.totals if player not in (ALL_PLAYERS, UNKNOWN_PLAYER))
+
+    def stats(self, player: Optional[str] = None) -> ThrowStats:
+        """Aggregated statistics of a player (all players if None), from memory"""
+        key = ALL_PLAYERS if player is None else player
+        with self.lock:
+            darts, points = self.totals.get(key, [0, 0])
+            segments = [
+                (number, multiplier, label, count)
+                for (number, multiplier), (label, count, _) in self.aggregates.get(key, {}).items()
+            ]
+
+        def count_where(condition) -> int:
+            return sum(count for number, multiplier, _, count in segments if condition(number, multiplier))
+
+        average = points / darts if darts else 0.0
+        return ThrowStats(
+            player=player,
+            darts=darts,
+            points=points,
+            average=average,
+            three_dart_average=3 * average,
+            trebles=count_where(lambda number, multiplier: multiplier == 3),
+            doubles=count_where(lambda number, multiplier: multiplier == 2),
+            bulls=count_where(lambda number, multiplier: number in (25, 50)),
+            misses=count_where(lambda number, multiplier: multiplier == 0),
+            segments=[
+                SegmentStats(number=number, multiplier=multiplier, label=label, count=count, rate=count / darts if darts else 0.0)
+                for number, multiplier, label, count in sorted(segments, key=lambda s: -s[3])
+            ]
+        )
+
+    def positions(self) -> List[Tuple[str, str, float, float]]:
+        """(board_id, player, board_x, board_y) of every stored throw"""
+        if self.read_connection is None:
+            return []
+        with self.read_lock:
+            return self.read_connection.execute("SELECT board_id, player, board_x, board_y FROM throws").fetchall()
+
+    def recent(self, limit: int = 50, player: Optional[str] = None, session_id: Optional[str] = None) -> List[ThrowRecord]:
+        """Most recent persisted throws, newest first (uses the player/session indexes)"""
+        if self.read_connection is None:
+            return []
+
+        query = (
+            "SELECT throw_id, session_id, board_id, player, frame_id, timestamp, number, multiplier, "
+            "label, points, x, y, board_x, board_y, confidence FROM throws"
+        )
+        conditions, parameters = [], []
+        if player is not None:
+            conditions.append("player = ?")
+            parameters.append(player)
+        if session_id is not None:
+            conditions.append("session_id = ?")
+            parameters.append(session_id)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY id DESC LIMIT ?"
+        parameters.append(limit)
+
+        with self.read_lock:
+            rows = self.read_connection.execute(query, parameters).fetchall()
+
+        fields = list(ThrowRecord.model_fields)
+        return [
+            ThrowRecord(**{**dict(zip(fields, row)), "player": row[3] or None})
+            for row in rows
+        ]
+
+throw_store = ThrowStore()
@@ -1,20 +1,27 @@
 import cv2
 import numpy as np
-import supervision as sv
 import logging
 import time
+from collections import deque
 from typing import List, Dict, Set, Tuple
+from ..core.config import settings
 from ..core.exceptions import TrackingError
+from ..core.memory import approximate_size
 from ..models.dart import Dart, DartDetection
 
 logger = logging.getLogger(__name__)
 
+def _supervision():
+    """Import supervision on first use, so importing the app stays fast"""
+    import supervision as sv
+    return sv
+
 class TrackingService:
     """Service for tracking darts using Supervision"""
     
     def __init__(self):
-        # Initialize ByteTrack tracker from Supervision
-        self.tracker = sv.ByteTrack()
+        # ByteTrack tracker from Supervision, created on first update
+        self.tracker = None
         
         # Store tracking history
         self.tracked_darts = {}  # Map of tracker_id -> dart positions
@@ -25,6 +32,7 @@ class TrackingService:
         self.stability_threshold = 10  # Number of frames to consider a dart stable
         self.movement_threshold = 5    # Maximum movement (pixels) to consider a dart static
         self.reset_interval = 5.0      # Seconds between tracking resets
+        self.history = settings.memory.track_history  # Positions kept per track
     
     def update(self, detections: DartDetection) -> List[Dart]:
         """
@@ -51,6 +59,10 @@ class TrackingService:
             
         detections_array = np.array(detection_data)
         
+        sv = _supervision()
+        if self.tracker is None:
+            self.tracker = sv.ByteTrack()
+        
         # Create Supervision Detections object
         sv_detections = sv.Detections(
             xyxy=detections_array[:, :4],
@@ -87,7 +99,7 @@ class TrackingService:
             # Update tracking history
             if tracker_id not in self.tracked_darts:
                 self.tracked_darts[tracker_id] = {
-                    'positions': [dart],
+                    'positions': deque([dart], maxlen=self.history),
                     'stable_count': 0,
                     'last_position': dart
                 }
@@ -137,9 +149,45 @@ class TrackingService:
         
         return self.stable_darts
     
+    def tracked_positions(self) -> List[Tuple[float, float]]:
+        """Last (x, y) of every active track"""
+        return [(data['last_position'].x, data['last_position'].y) for data in self.tracked_darts.values()]
+    
+    def memory_usage(self) -> int:
+        """Approximate bytes held by the tracker and the track histories"""
+        return approximate_size(self.tracker) + approximate_size(self.tracked_darts)
+    
+    def trim_memory(self, budget: int) -> int:
+        """
+        Bring the track state under budget bytes: drop the position histories first, then the
+        least stable tracks, and finally restart the tracker (stable darts are kept).
+        Returns the number of positions and tracks evicted.
+        """
+        evicted = 0
+        for data in self.tracked_darts.values():
+            while len(data['positions']) > 1:
+                data['positions'].popleft()
+                evicted += 1
+        if self.memory_usage() <= budget:
+            return evicted
+        
+        by_stability = sorted(self.tracked_darts, key=lambda tracker_id: self.tracked_darts[tracker_id]['stable_count'])
+        for tracker_id in by_stability:
+            if self.tracked_darts[tracker_id]['stable_count'] >= self.stability_threshold:
+                break
+            del self.tracked_darts[tracker_id]
+            evicted += 1
+            if self.memory_usage() <= budget:
+                return evicted
+        if self.memory_usage() > budget:
+            # The tracker's lost tracks are only dropped by a reset
+            self.reset()
+            evicted += 1
+        return evicted
+    
     def reset(self):
         """Reset the tracker"""
-        self.tracker = sv.ByteTrack()
+        self.tracker = None
         self.tracked_darts = {}
         self.last_update_time = time.time()
         # Note: we don't reset stable_darts here to maintain the dart positions
@@ -150,13 +198,6 @@ class TrackingService:
         """Draw tracking information on the frame"""
         result_frame = frame.copy()
         
-        # Box annotator for tracked objects
-        box_annotator = sv.BoxAnnotator(
-            thickness=2,
-            text_thickness=1,
-            text_scale=0.5
-        )
-        
         # Draw active trackers
         for tracker_id, data in self.tracked_darts.items():
             dart = data['last_position']
@@ -0,0 +1,349 @@
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+from typing import AsyncIterator, Deque, List, Optional, Tuple
+import cv2
+import numpy as np
+from ..core.config import VideoSettings, settings
+from ..core.memory import memory
+from ..core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Messages yielded to viewers: (kind, payload)
+INIT = "init"  # JSON text with the MIME type, then the init segment (ftyp + moov) as binary
+FRAME = "frame"  # JSON text with the score metadata of the next media segment
+MEDIA = "media"  # binary moof + mdat of one frame
+
+TIME_BASE = Fraction(1, 1000)
+
+
+def video_available() -> bool:
+    """True if PyAV (pip install av) can be imported"""
+    try:
+        import av  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class FragmentWriter:
+    """
+    File object for the MP4 muxer that splits its output into top-level boxes:
+    the init segment (everything before the first moof) and one moof + mdat per fragment.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+        self.init_segment: Optional[bytes] = None
+        self.init_parts = bytearray()
+        self.fragment = bytearray()
+        self.fragments: List[bytes] = []
+
+    def write(self, data) -> int:
+        self.buffer += data
+        self.position += len(data)
+        self._split()
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def seekable(self) -> bool:
+        return False
+
+    def flush(self):
+        pass
+
+    def _split(self):
+        while len(self.buffer) >= 8:
+            size = int.from_bytes(self.buffer[:4], "big")
+            kind = bytes(self.buffer[4:8])
+            if size == 1:
+                if len(self.buffer) < 16:
+                    return
+                size = int.from_bytes(self.buffer[8:16], "big")
+            if size < 8 or len(self.buffer) < size:
+                return
+            box = bytes(self.buffer[:size])
+            del self.buffer[:size]
+            if self.init_segment is None and kind != b"moof":
+                self.init_parts += box
+                continue
+            if self.init_segment is None:
+                self.init_segment = bytes(self.init_parts)
+            self.fragment += box
+            if kind == b"mdat":
+                self.fragments.append(bytes(self.fragment))
+                self.fragment = bytearray()
+
+    def take(self) -> List[bytes]:
+        fragments, self.fragments = self.fragments, []
+        return fragments
+
+
+def codec_mime(init_segment: bytes) -> str:
+    """MIME type for MediaSource, with the H.264 profile and level from the avcC box"""
+    index = init_segment.find(b"avcC")
+    if index < 0 or len(init_segment) < index + 8:
+        return 'video/mp4; codecs="avc1.42E01F"'
+    profile, compatibility, level = init_segment[index + 5:index + 8]
+    return f'video/mp4; codecs="avc1.{profile:02X}{compatibility:02X}{level:02X}"'
+
+
+class Fmp4Encoder:
+    """
+    Software H.264 encoder muxing into fragmented MP4 with one fragment per frame,
+    which MediaSource in browsers can append directly. Runs in a single encoder thread.
+    """
+
+    def __init__(self, width: int, height: int, config: VideoSettings):
+        import av
+
+        self.av = av
+        self.width = width
+        self.height = height
+        self.writer = FragmentWriter()
+        self.container = av.open(
+            self.writer, mode="w", format="mp4",
+            options={"movflags": "frag_every_frame+empty_moov+default_base_moof", "flush_packets": "1"},
+        )
+        self.stream = self.container.add_stream(config.codec, rate=max(1, round(config.max_fps)))
+        self.stream.width = width
+        self.stream.height = height
+        self.stream.pix_fmt = "yuv420p"
+        self.stream.bit_rate = config.bitrate
+        self.stream.codec_context.time_base = TIME_BASE
+        self.stream.codec_context.gop_size = max(1, round(config.keyframe_interval * config.max_fps))
+        if config.codec == "libx264":
+            # No lookahead or B-frames, so every frame leaves the encoder right away; baseline plays everywhere
+            self.stream.options = {"preset": "ultrafast", "tune": "zerolatency", "profile": "baseline"}
+        self.start: Optional[float] = None
+        self.last_pts = -1
+        # Metadata of the packets whose fragments were not written yet (the muxer closes a fragment at the next packet)
+        self.pending: Deque[Tuple[str, bool]] = deque()
+
+    def encode(self, image: np.ndarray, timestamp: float, metadata: str, keyframe: bool) -> List[Tuple[bytes, bool, str]]:
+        """(fragment, is keyframe, metadata) for every fragment completed by this frame"""
+        if self.start is None:
+            self.start = timestamp
+        frame = self.av.VideoFrame.from_ndarray(image, format="bgr24")
+        self.last_pts = max(self.last_pts + 1, int((timestamp - self.start) * 1000))
+        frame.pts = self.last_pts
+        frame.time_base = TIME_BASE
+        if keyframe:
+            frame.pict_type = getattr(getattr(self.av.video.frame, "PictureType", None), "I", "I")
+        for packet in self.stream.encode(frame):
+            self.pending.append((metadata, packet.is_keyframe))
+            self.container.mux(packet)
+        return self._fragments()
+
+    def _fragments(self) -> List[Tuple[bytes, bool, str]]:
+        completed = []
+        for fragment in self.writer.take():
+            metadata, is_keyframe = self.pending.popleft()
+            completed.append((fragment, is_keyframe, metadata))
+        return completed
+
+    @property
+    def init_segment(self) -> Optional[bytes]:
+        return self.writer.init_segment
+
+    def close(self):
+        try:
+            for packet in self.stream.encode(None):
+                self.container.mux(packet)
+            self.container.close()
+        except Exception as e:
+            logger.debug(f"Closing video encoder: {e}")
+
+
+class VideoViewer:
+    """Messages waiting for one viewer; a viewer that falls behind restarts at the next keyframe"""
+
+    def __init__(self, max_queue: int):
+        self.queue: "asyncio.Queue[Tuple[str, object]]" = asyncio.Queue(maxsize=max_queue)
+        self.synced = False
+        self.bytes = 0  # payload bytes waiting in the queue
+
+    def room(self, messages: int) -> bool:
+        return self.queue.maxsize - self.queue.qsize() >= messages
+
+    def put(self, kind: str, payload):
+        self.queue.put_nowait((kind, payload))
+        self.bytes += len(payload)
+
+    async def get(self) -> Tuple[str, object]:
+        kind, payload = await self.queue.get()
+        self.bytes -= len(payload)
+        return kind, payload
+
+    def clear(self) -> int:
+        """Drop every queued message; the viewer restarts at the next keyframe"""
+        dropped = self.queue.qsize()
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.bytes = 0
+        self.synced = False
+        return dropped
+
+
+class VideoStream:
+    """
+    Annotated live video as H.264 in fragmented MP4, shared by every video viewer.
+    The live pipeline publishes rendered frames; one encoder (in its own thread)
+    encodes them at most max_fps times per second while somebody watches, and every
+    fragment is fanned out to all viewers with the score metadata of its frame.
+    A new or lagging viewer starts at a keyframe, and one is requested for it; a viewer
+    also lags when its queue holds more than its share of MEMORY_SESSIONS_MB.
+    Used from the event loop only.
+    """
+
+    def __init__(self, config: Optional[VideoSettings] = None):
+        self.config = config or settings.video
+        self.available = video_available()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="video-encode")
+        self.encoder: Optional[Fmp4Encoder] = None
+        self.mime: Optional[str] = None
+        self.viewers: List[VideoViewer] = []
+        self.pending: Optional[Tuple[int, float, np.ndarray, str]] = None
+        self.encoding = False
+        self.force_keyframe = False
+        self.last_frame_id: Optional[int] = None
+        self.last_timestamp = 0.0
+        self.budget = settings.memory.budget("sessions")
+
+    @property
+    def viewer_count(self) -> int:
+        return len(self.viewers)
+
+    def queued_bytes(self) -> int:
+        return sum(viewer.bytes for viewer in self.viewers)
+
+    def trim_queues(self, budget: int) -> int:
+        """Restart the viewers with the longest queues until all queues fit budget bytes; returns the messages dropped"""
+        dropped = 0
+        held = self.queued_bytes()
+        for viewer in sorted(self.viewers, key=lambda viewer: viewer.bytes, reverse=True):
+            if held <= budget:
+                break
+            held -= viewer.bytes
+            dropped += viewer.clear()
+            self.force_keyframe = True
+        return dropped
+
+    def publish(self, frame_id: int, timestamp: float, image: np.ndarray, metadata: str):
+        """Offer a rendered frame (not modified afterwards); older or too frequent frames are skipped"""
+        if not self.viewers or not self.available:
+            return
+        if self.last_frame_id is not None and frame_id <= self.last_frame_id:
+            return
+        if timestamp - self.last_timestamp < 0.95 / self.config.max_fps:
+            return
+        self.last_frame_id = frame_id
+        self.last_timestamp = timestamp
+        # Only the newest frame waits while the encoder is busy
+        self.pending = (frame_id, timestamp, image, metadata)
+        if not self.encoding:
+            self.encoding = True
+            asyncio.create_task(self._encode_pending())
+
+    def _encode(self, image: np.ndarray, timestamp: float, metadata: str, keyframe: bool) -> Tuple[List[Tuple[bytes, bool, str]], bool]:
+        """Encode in the encoder thread; a new encoder is started when the frame size changes"""
+        height, width = image.shape[:2]
+        if width > self.config.max_width:
+            height = height * self.config.max_width // width
+            width = self.config.max_width
+        # H.264 with 4:2:0 chroma needs even dimensions
+        width -= width % 2
+        height -= height % 2
+        if (width, height) != image.shape[1::-1]:
+            image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+        restarted = False
+        if self.encoder is None or (self.encoder.width, self.encoder.height) != (width, height):
+            if self.encoder is not None:
+                self.encoder.close()
+            self.encoder = Fmp4Encoder(width, height, self.config)
+            restarted = True
+        return self.encoder.encode(image, timestamp, metadata, keyframe), restarted
+
+    async def _encode_pending(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while self.pending is not None and self.viewers:
+                _, timestamp, image, metadata = self.pending
+                self.pending = None
+                keyframe, self.force_keyframe = self.force_keyframe, False
+                try:
+                    fragments, restarted = await loop.run_in_executor(self.executor, self._encode, image, timestamp, metadata, keyframe)
+                except Exception as e:
+                    logger.error(f"Video encoding failed: {e}")
+                    await loop.run_in_executor(self.executor, self._close_encoder)
+                    continue
+                if restarted:
+                    self.mime = None
+                    for viewer in self.viewers:
+                        viewer.synced = False
+                self._deliver(fragments)
+        finally:
+            self.encoding = False
+
+    def _deliver(self, fragments: List[Tuple[bytes, bool, str]]):
+        encoder = self.encoder
+        viewer_budget = self.budget // max(1, len(self.viewers))
+        for fragment, is_keyframe, metadata in fragments:
+            if self.mime is None and encoder is not None and encoder.init_segment is not None:
+                self.mime = codec_mime(encoder.init_segment)
+            for viewer in self.viewers:
+                over_budget = viewer_budget and viewer.bytes + len(fragment) > viewer_budget
+                if not viewer.synced:
+                    if not is_keyframe or encoder is None or not viewer.room(4):
+                        continue
+                    viewer.put(INIT, self.mime)
+                    viewer.put(INIT, encoder.init_segment)
+                    viewer.synced = True
+                elif not viewer.room(2) or over_budget:
+                    # Inter-frame data cannot be skipped: drop until the next keyframe
+                    viewer.synced = False
+                    self.force_keyframe = True
+                    metrics.inc_counter("dartify_video_resyncs_total")
+                    if over_budget:
+                        memory.record_eviction("sessions")
+                    continue
+                viewer.put(FRAME, metadata)
+                viewer.put(MEDIA, fragment)
+                metrics.inc_counter("dartify_video_bytes_total", len(fragment))
+
+    def _close_encoder(self):
+        if self.encoder is not None:
+            self.encoder.close()
+            self.encoder = None
+
+    async def subscribe(self) -> AsyncIterator[Tuple[str, object]]:
+        """Yield (kind, payload) messages: INIT (MIME text, then init segment), then FRAME metadata and MEDIA per frame"""
+        viewer = VideoViewer(self.config.max_queue)
+        self.viewers.append(viewer)
+        self.force_keyframe = True
+        metrics.set_gauge("dartify_video_viewers", len(self.viewers))
+        try:
+            while True:
+                yield await viewer.get()
+        finally:
+            self.viewers.remove(viewer)
+            metrics.set_gauge("dartify_video_viewers", len(self.viewers))
+            if not self.viewers:
+                # Nobody is watching: release the encoder, the next viewer starts a new stream
+                self.pending = None
+                self.mime = None
+                self.last_frame_id = None
+                asyncio.get_running_loop().run_in_executor(self.executor, self._close_encoder)
+
+    def shutdown(self):
+        self.executor.submit(self._close_encoder)
+        self.executor.shutdown(wait=False)
+
+video_stream = VideoStream()
@@ -0,0 +1,113 @@
+from functools import lru_cache
+from typing import Iterable, List, Optional, Sequence, Tuple
+from .dartboard_segmentation import DARTBOARD_NUMBERS, SECTION_TABLE
+from ..core.config import settings
+
+# Highest score a checkout table covers (three trebles 20)
+MAX_SCORE = 180
+MAX_DARTS = 3
+
+# Cost of a dart thrown to set up the finish: singles are easiest to hit, bulls hardest
+SETUP_COST = {1: 1, 3: 2, 2: 3}
+OUTER_BULL_SETUP_COST = 5
+BULL_SETUP_COST = 6
+
+# Route cost: (darts, bulls thrown when avoiding the bull, finish and setup cost)
+RouteCost = Tuple[int, int, int]
+
+
+class CheckoutTable:
+    """
+    Finish routes for every remaining score and number of darts left, precomputed once
+    from the sections of DartboardSegmentation, so suggesting a checkout is a list lookup.
+    Routes use as few darts as possible; among those the bull is avoided if requested,
+    then the route finishing on the most favoured double with the easiest setup wins.
+    """
+
+    def __init__(self, favourite_doubles: Sequence[int] = (), avoid_bull: bool = False):
+        self.favourite_doubles = tuple(n for n in favourite_doubles if n in DARTBOARD_NUMBERS)
+        self.avoid_bull = avoid_bull
+
+        # Scoring sections, biggest first so ties prefer the bigger setup dart
+        self.sections = sorted(
+            (section for section in SECTION_TABLE if section.multiplier > 0),
+            key=lambda section: -section.number * section.multiplier
+        )
+        # routes[double_out][darts_left][remaining]
+        self.routes = [self._build(double_out) for double_out in (False, True)]
+
+    def _is_double(self, number: int, multiplier: int) -> bool:
+        return multiplier == 2 or number == 50
+
+    def _finish_cost(self, number: int, multiplier: int, double_out: bool) -> int:
+        if not double_out:
+            return self._setup_cost(number, multiplier)
+        if number == 50:
+            return len(self.favourite_doubles) + 3
+        if number in self.favourite_doubles:
+            return self.favourite_doubles.index(number)
+        # Even doubles leave another double after a miss into the single
+        return len(self.favourite_doubles) + (1 if number % 2 == 0 else 2)
+
+    def _setup_cost(self, number: int, multiplier: int) -> int:
+        if number == 50:
+            return BULL_SETUP_COST
+        if number == 25:
+            return OUTER_BULL_SETUP_COST
+        return SETUP_COST[multiplier]
+
+    def _build(self, double_out: bool) -> List[List[Optional[Tuple[str, ...]]]]:
+        # best[remaining] = (cost, route) with at most the current number of darts
+        previous: List[Optional[Tuple[RouteCost, Tuple[str, ...]]]] = [None] * (MAX_SCORE + 1)
+        table: List[List[Optional[Tuple[str, ...]]]] = [[None] * (MAX_SCORE + 1)]  # no darts left
+
+        for _ in range(MAX_DARTS):
+            best: List[Optional[Tuple[RouteCost, Tuple[str, ...]]]] = [None] * (MAX_SCORE + 1)
+            for remaining in range(1, MAX_SCORE + 1):
+                for section in self.sections:
+                    number, multiplier = section.number, section.multiplier
+                    points = number * multiplier
+                    if points > remaining:
+                        continue
+                    bull = int(self.avoid_bull and number in (25, 50))
+
+                    left = remaining - points
+                    if left == 0:
+                        if double_out and not self._is_double(number, multiplier):
+                            continue
+                        cost = (1, bull, self._finish_cost(number, multiplier, double_out))
+                        route = (section.label,)
+                    elif previous[left] is not None:
+                        (darts, bulls, rest), rest_route = previous[left]
+                        cost = (darts + 1, bulls + bull, rest + self._setup_cost(number, multiplier))
+                        route = (section.label,) + rest_route
+                    else:
+                        continue
+
+                    if best[remaining] is None or cost < best[remaining][0]:
+                        best[remaining] = (cost, route)
+
+            table.append([entry[1] if entry else None for entry in best])
+            previous = best
+        return table
+
+    def suggest(self, remaining: Optional[int], darts_left: int = MAX_DARTS, double_out: bool = True) -> Optional[List[str]]:
+        """Section labels of the best finish, or None if it cannot be finished with the darts left"""
+        if remaining is None or not 0 < remaining <= MAX_SCORE or not 0 < darts_left <= MAX_DARTS:
+            return None
+        route = self.routes[double_out][darts_left][remaining]
+        return list(route) if route else None
+
+
+@lru_cache(maxsize=16)
+def _table_for(favourite_doubles: Tuple[int, ...], avoid_bull: bool) -> CheckoutTable:
+    return CheckoutTable(favourite_doubles, avoid_bull)
+
+
+def checkout_table_for(favourite_doubles: Optional[Iterable[int]] = None, avoid_bull: Optional[bool] = None) -> CheckoutTable:
+    """The table for a set of preferences (the configured ones by default), built once per set"""
+    if favourite_doubles is None:
+        favourite_doubles = settings.checkout.favourite_doubles
+    if avoid_bull is None:
+        avoid_bull = settings.checkout.avoid_bull
+    return _table_for(tuple(favourite_doubles), avoid_bull)
@@ -1,7 +1,7 @@
 import numpy as np
 import cv2
 import math
-from typing import Tuple, Dict, List
+from typing import Tuple, Dict, List, Optional
 from ..models.score import ScoringSection
 from ..core.config import settings
 
@@ -19,23 +19,86 @@ RADIUS_RANGES = {
     "outer_bull": (0.03, 0.10)     # Outer bull
 }
 
+# Alpha used to blend the segmentation overlay onto frames
+OVERLAY_ALPHA = 0.4
+
+# Section codes used by score rasters: 0 = miss, 1-20 singles, 21-40 doubles, 41-60 triples, 61 = 25, 62 = bull
+SECTION_MISS = 0
+SECTION_OUTER_BULL = 61
+SECTION_BULL = 62
+
+def _build_section_table() -> List[ScoringSection]:
+    table = [ScoringSection(number=0, multiplier=0, label="Miss")]
+    table += [ScoringSection(number=n, multiplier=1, label=f"{n}") for n in range(1, 21)]
+    table += [ScoringSection(number=n, multiplier=2, label=f"D{n}") for n in range(1, 21)]
+    table += [ScoringSection(number=n, multiplier=3, label=f"T{n}") for n in range(1, 21)]
+    table.append(ScoringSection(number=25, multiplier=1, label="25"))
+    table.append(ScoringSection(number=50, multiplier=1, label="Bull"))
+    return table
+
+SECTION_TABLE = _build_section_table()
+
+def build_score_raster(center_x: int, center_y: int, radius: int, width: int, height: int) -> np.ndarray:
+    """
+    Precompute the section code of every pixel, using the same geometry as get_section
+    Scoring a dart then becomes a single array lookup
+    """
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    dx = xs - center_x
+    dy = ys - center_y
+    distance = np.hypot(dx, dy) / radius
+    angle = np.degrees(np.arctan2(dx, -dy)) % 360
+    section_index = (((angle + 9) % 360) // 18).astype(np.int64) % 20
+    numbers = np.asarray(DARTBOARD_NUMBERS, dtype=np.uint8)[section_index]
+    
+    conditions = [
+        distance <= RADIUS_RANGES["bullseye"][1],
+        distance <= RADIUS_RANGES["outer_bull"][1],
+        distance <= RADIUS_RANGES["inner_single"][1],
+        distance <= RADIUS_RANGES["triple"][1],
+        distance <= RADIUS_RANGES["outer_single"][1],
+        distance <= RADIUS_RANGES["double"][1],
+    ]
+    choices = [SECTION_BULL, SECTION_OUTER_BULL, numbers, numbers + 40, numbers, numbers + 20]
+    return np.select(conditions, choices, SECTION_MISS).astype(np.uint8)
+
 class DartboardSegmentation:
     def __init__(self):
         self.center_x = settings.dartboard.center_x
         self.center_y = settings.dartboard.center_y
         self.radius = settings.dartboard.radius
         
+        # Optional precomputed artifacts for the current calibration
+        self.score_raster: Optional[np.ndarray] = None
+        self.overlay_layer: Optional[np.ndarray] = None
+        self.overlay_index: Optional[np.ndarray] = None
+        
     def update_calibration(self, center_x: int, center_y: int, radius: int):
         """Update dartboard calibration parameters"""
         self.center_x = center_x
         self.center_y = center_y
         self.radius = radius
+        self.score_raster = None
+        self.overlay_layer = None
+        self.overlay_index = None
+    
+    def set_artifacts(self, score_raster: Optional[np.ndarray], overlay_layer: Optional[np.ndarray], overlay_index: Optional[np.ndarray]):
+        """Use precomputed artifacts (built for the current calibration) for scoring and drawing"""
+        self.score_raster = score_raster
+        self.overlay_layer = overlay_layer
+        self.overlay_index = overlay_index
     
     def get_section(self, x: float, y: float) -> ScoringSection:
         """
         Determine which section of the dartboard a dart is in, given its x,y coordinates
         Returns a ScoringSection with the number, multiplier, and label
         """
+        raster = self.score_raster
+        if raster is not None:
+            ix, iy = int(round(x)), int(round(y))
+            if 0 <= iy < raster.shape[0] and 0 <= ix < raster.shape[1]:
+                return SECTION_TABLE[raster[iy, ix]]
+        
         # Calculate polar coordinates (distance from center and angle)
         dx = x - self.center_x
         dy = y - self.center_y
@@ -73,9 +136,34 @@ class DartboardSegmentation:
             # Outside the dartboard
             return ScoringSection(number=0, multiplier=0, label="Miss")
     
+    def render_overlay_layer(self, width: int, height: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Render the overlay once onto a blank canvas
+        Returns the layer and the flat indices of the pixels it covers
+        """
+        layer = self._draw_overlay_lines(np.zeros((height, width, 3), dtype=np.uint8))
+        index = np.flatnonzero(layer.any(axis=2)).astype(np.int32)
+        return layer, index
+    
     def draw_dartboard_overlay(self, image: np.ndarray) -> np.ndarray:
         """Draw dartboard segmentation overlay on an image for visualization"""
-        overlay = image.copy()
+        layer, index = self.overlay_layer, self.overlay_index
+        if layer is not None and layer.shape == image.shape and image.flags.c_contiguous:
+            # Only blend the pixels covered by the precomputed layer
+            pixels = image.reshape(-1, 3)
+            blended = OVERLAY_ALPHA * layer.reshape(-1, 3)[index] + (1 - OVERLAY_ALPHA) * pixels[index]
+            pixels[index] = np.rint(blended).astype(np.uint8)
+            return image
+        
+        overlay = self._draw_overlay_lines(image.copy())
+        
+        # Blend the overlay with the original image
+        cv2.addWeighted(overlay, OVERLAY_ALPHA, image, 1 - OVERLAY_ALPHA, 0, image)
+        
+        return image
+    
+    def _draw_overlay_lines(self, overlay: np.ndarray) -> np.ndarray:
+        """Draw the rings, segment lines and numbers onto overlay"""
         
         # Draw outer circle (double ring)
         cv2.circle(overlay, (self.center_x, self.center_y), self.radius, (0, 255, 0), 2)
@@ -115,8 +203,4 @@ class DartboardSegmentation:
                 cv2.LINE_AA
             )
         
-        # Blend the overlay with the original image
-        alpha = 0.4
-        cv2.addWeighted(overlay, alpha, image, 1 - alpha, 0, image)
-        
-        return image
\ No newline at end of file
+        return overlay
\ No newline at end of file
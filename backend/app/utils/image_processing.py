@@ -1,27 +1,17 @@
 import cv2
 import numpy as np
 from typing import Tuple, Optional
+from .preprocessing import Board, FramePreprocessor
 
-def preprocess_frame(frame: np.ndarray) -> np.ndarray:
+def preprocess_frame(frame: np.ndarray, preprocessor: Optional[FramePreprocessor] = None, board: Optional[Board] = None) -> np.ndarray:
     """
-    Preprocess a frame for better dart detection
+    Preprocess a frame for better dart detection.
+    The steps (lens undistortion, CLAHE, blanking outside the board at `board`) are
+    configured on the preprocessor; without one the frame is returned unchanged.
     """
-    # Resize if needed
-    # frame = cv2.resize(frame, (width, height))
-    
-    # Apply some basic preprocessing
-    # Convert to grayscale if needed
-    # gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    
-    # Apply Gaussian blur to reduce noise
-    # blurred = cv2.GaussianBlur(frame, (5, 5), 0)
-    
-    # Enhance contrast if needed
-    # enhanced = cv2.convertScaleAbs(frame, alpha=1.2, beta=10)
-    
-    # For now, we'll just return the original frame
-    # This can be expanded with more sophisticated preprocessing as needed
-    return frame
+    if preprocessor is None:
+        return frame
+    return preprocessor.process(frame, board)
 
 def detect_dartboard(frame: np.ndarray) -> Tuple[Optional[Tuple[int, int]], Optional[int]]:
     """
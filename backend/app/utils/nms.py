@@ -0,0 +1,36 @@
+import numpy as np
+
+def pairwise_overlap(boxes: np.ndarray, metric: str = "iou") -> np.ndarray:
+    """
+    N x N overlap of (x1, y1, x2, y2) boxes.
+    metric "iou" is intersection over union; "iom" is intersection over the smaller box,
+    which also matches a box cut off at a tile edge with the complete box of the same object.
+    """
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    width = np.clip(np.minimum(x2[:, None], x2[None, :]) - np.maximum(x1[:, None], x1[None, :]), 0, None)
+    height = np.clip(np.minimum(y2[:, None], y2[None, :]) - np.maximum(y1[:, None], y1[None, :]), 0, None)
+    intersection = width * height
+    if metric == "iom":
+        denominator = np.minimum(areas[:, None], areas[None, :])
+    else:
+        denominator = areas[:, None] + areas[None, :] - intersection
+    return intersection / np.maximum(denominator, 1e-9)
+
+def non_max_suppression(boxes: np.ndarray, scores: np.ndarray, threshold: float, metric: str = "iou") -> np.ndarray:
+    """
+    Indices of the boxes kept by greedy NMS, most confident first.
+    The overlaps are computed once for all pairs; the greedy pass only walks boolean rows.
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+    order = np.argsort(-scores, kind="stable")
+    overlaps = pairwise_overlap(boxes[order], metric) > threshold
+    suppressed = np.zeros(len(order), dtype=bool)
+    keep = []
+    for index in range(len(order)):
+        if suppressed[index]:
+            continue
+        keep.append(index)
+        suppressed |= overlaps[index]
+    return order[np.array(keep, dtype=np.int64)]
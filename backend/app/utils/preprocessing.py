@@ -0,0 +1,242 @@
+"""
+Camera frame preprocessing: lens undistortion, contrast normalization (CLAHE) and
+blanking everything outside the dartboard.
+Undistortion maps are computed once per lens calibration and frame size, and every step
+writes into preallocated buffers, so the capture loop allocates nothing per frame.
+"""
+import json
+import logging
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+from ..core.config import PreprocessSettings, settings
+
+logger = logging.getLogger(__name__)
+
+# (center_x, center_y, radius) of the dartboard in the frame
+Board = Tuple[int, int, int]
+
+
+class LensModel:
+    """
+    Camera intrinsics and distortion coefficients as returned by cv2.calibrateCamera,
+    with the undistortion maps for every frame size they were requested for.
+    """
+
+    def __init__(self, camera_matrix: np.ndarray, dist_coeffs: np.ndarray, image_width: int, image_height: int, alpha: float = 0.0):
+        self.camera_matrix = np.asarray(camera_matrix, dtype=np.float64).reshape(3, 3)
+        self.dist_coeffs = np.asarray(dist_coeffs, dtype=np.float64).ravel()
+        self.image_width = image_width
+        self.image_height = image_height
+        self.alpha = alpha
+        self.maps: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray]] = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str, alpha: float = 0.0) -> "LensModel":
+        """
+        Load a JSON file with camera_matrix (3x3), dist_coeffs, image_width and image_height.
+        Raises ValueError if the file is incomplete.
+        """
+        with open(path) as f:
+            data = json.load(f)
+        try:
+            return cls(data["camera_matrix"], data["dist_coeffs"], int(data["image_width"]), int(data["image_height"]), alpha)
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid lens calibration {path}: {e}")
+
+    def undistort_maps(self, width: int, height: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Fixed-point remap tables for frames of this size, computed on first use"""
+        key = (width, height)
+        maps = self.maps.get(key)
+        if maps is not None:
+            return maps
+        with self.lock:
+            maps = self.maps.get(key)
+            if maps is None:
+                # Intrinsics scale with the frame size when the camera runs at another resolution
+                matrix = self.camera_matrix.copy()
+                matrix[0] *= width / self.image_width
+                matrix[1] *= height / self.image_height
+                new_matrix, _ = cv2.getOptimalNewCameraMatrix(matrix, self.dist_coeffs, key, self.alpha, key)
+                maps = cv2.initUndistortRectifyMap(matrix, self.dist_coeffs, None, new_matrix, key, cv2.CV_16SC2)
+                self.maps[key] = maps
+                logger.info(f"Undistortion maps computed for {width}x{height}")
+        return maps
+
+    def release_maps(self, keep: Optional[Tuple[int, int]] = None) -> int:
+        """Drop the maps of every frame size but keep (they are recomputed on demand); returns how many were dropped"""
+        with self.lock:
+            stale = [key for key in self.maps if key != keep]
+            for key in stale:
+                del self.maps[key]
+        return len(stale)
+
+
+@lru_cache(maxsize=None)
+def load_lens_model(path: str, alpha: float = 0.0) -> LensModel:
+    """Lens model for a calibration file, shared so its maps are only computed once"""
+    return LensModel.from_file(path, alpha)
+
+
+class FramePreprocessor:
+    """
+    Applies the enabled preprocessing steps to camera frames.
+    Results are written to a ring of `buffers` preallocated frames, so a result is
+    overwritten once that many newer frames were processed; callers that keep frames
+    longer must copy them. With buffers=0 every result is a new array.
+    Not thread-safe: use one preprocessor per capture thread.
+    """
+
+    def __init__(
+        self,
+        lens: Optional[LensModel] = None,
+        clahe: bool = False,
+        clip_limit: float = 2.0,
+        tile_size: int = 8,
+        crop_board: bool = False,
+        crop_margin: float = 1.15,
+        buffers: int = 3,
+    ):
+        self.lens = lens
+        self.clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(tile_size, tile_size)) if clahe else None
+        self.crop_board = crop_board
+        self.crop_margin = crop_margin
+        self.buffers = buffers
+        self.ring: List[np.ndarray] = []
+        self.next_index = 0
+        self.frame_size: Optional[Tuple[int, int]] = None  # (width, height) of the last processed frame
+        # Scratch buffers of the CLAHE step: the frame in YCrCb and its luma channel
+        self.ycrcb: Optional[np.ndarray] = None
+        self.luma: Optional[np.ndarray] = None
+        self.equalized: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_settings(cls, config: Optional[PreprocessSettings] = None, buffers: Optional[int] = None, crop_board: Optional[bool] = None) -> "FramePreprocessor":
+        """Preprocessor configured from PreprocessSettings; an unusable lens file disables undistortion"""
+        config = config or settings.preprocess
+        lens = None
+        if config.lens_calibration:
+            try:
+                lens = load_lens_model(config.lens_calibration, config.undistort_alpha)
+            except (OSError, ValueError) as e:
+                logger.error(f"Lens undistortion disabled: {e}")
+        return cls(
+            lens=lens,
+            clahe=config.clahe,
+            clip_limit=config.clahe_clip_limit,
+            tile_size=config.clahe_tile_size,
+            crop_board=config.crop_board if crop_board is None else crop_board,
+            crop_margin=config.crop_margin,
+            buffers=config.buffers if buffers is None else buffers,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.lens is not None or self.clahe is not None or self.crop_board
+
+    def describe(self) -> dict:
+        return {
+            "undistort": self.lens is not None,
+            "clahe": self.clahe is not None,
+            "crop_board": self.crop_board,
+            "buffers": self.buffers,
+        }
+
+    def arrays(self) -> List[np.ndarray]:
+        """Buffers held by this preprocessor: the output ring, CLAHE scratch and undistortion maps"""
+        held = list(self.ring)
+        held.extend(array for array in (self.ycrcb, self.luma, self.equalized) if array is not None)
+        if self.lens is not None:
+            for maps in list(self.lens.maps.values()):
+                held.extend(maps)
+        return held
+
+    def fixed_arrays(self) -> List[np.ndarray]:
+        """
+        Buffers needed for every frame of the current size: the output ring, CLAHE scratch and
+        the undistortion maps of that size. The capture loop reuses them instead of allocating.
+        """
+        held = list(self.ring)
+        held.extend(array for array in (self.ycrcb, self.luma, self.equalized) if array is not None)
+        if self.lens is not None and self.frame_size is not None:
+            held.extend(self.lens.maps.get(self.frame_size, ()))
+        return held
+
+    def release_stale(self) -> int:
+        """
+        Drop the undistortion maps of frame sizes other than the current one, which are
+        recomputed if such frames come back. Safe from any thread; returns the number of map pairs dropped.
+        """
+        if self.lens is None:
+            return 0
+        return self.lens.release_maps(keep=self.frame_size)
+
+    def _output(self, like: np.ndarray) -> np.ndarray:
+        """Next output buffer; the ring is reallocated only when the frame format changes"""
+        if self.buffers <= 0:
+            self.ring = []
+            return np.empty_like(like)
+        if not self.ring or self.ring[0].shape != like.shape or self.ring[0].dtype != like.dtype:
+            self.ring = [np.empty_like(like) for _ in range(self.buffers)]
+            self.next_index = 0
+        buffer = self.ring[self.next_index]
+        self.next_index = (self.next_index + 1) % self.buffers
+        return buffer
+
+    def _equalize(self, source: np.ndarray, target: np.ndarray) -> np.ndarray:
+        """CLAHE on the luma channel only, so colours (and the board's red/green rings) are kept"""
+        if source.ndim == 2:
+            return self.clahe.apply(source, dst=target)
+        if self.ycrcb is None or self.ycrcb.shape != source.shape:
+            self.ycrcb = np.empty_like(source)
+            self.luma = np.empty(source.shape[:2], dtype=source.dtype)
+            self.equalized = np.empty_like(self.luma)
+        cv2.cvtColor(source, cv2.COLOR_BGR2YCrCb, dst=self.ycrcb)
+        cv2.extractChannel(self.ycrcb, 0, dst=self.luma)
+        self.clahe.apply(self.luma, dst=self.equalized)
+        cv2.insertChannel(self.equalized, self.ycrcb, 0)
+        return cv2.cvtColor(self.ycrcb, cv2.COLOR_YCrCb2BGR, dst=target)
+
+    def _blank_outside(self, frame: np.ndarray, board: Board):
+        """Zero everything outside the square around the board, keeping the frame geometry"""
+        height, width = frame.shape[:2]
+        center_x, center_y, radius = board
+        half = int(radius * self.crop_margin)
+        x0, x1 = max(0, center_x - half), min(width, center_x + half)
+        y0, y1 = max(0, center_y - half), min(height, center_y + half)
+        if x0 >= x1 or y0 >= y1:
+            # The board is not in the frame; blanking would hide it from auto-calibration
+            return
+        frame[:y0] = 0
+        frame[y1:] = 0
+        frame[y0:y1, :x0] = 0
+        frame[y0:y1, x1:] = 0
+
+    def process(self, frame: np.ndarray, board: Optional[Board] = None) -> np.ndarray:
+        """Preprocessed frame; the input is returned unchanged when no step is enabled"""
+        if not self.enabled:
+            return frame
+
+        height, width = frame.shape[:2]
+        self.frame_size = (width, height)
+        result = frame
+        if self.lens is not None:
+            map1, map2 = self.lens.undistort_maps(width, height)
+            result = cv2.remap(frame, map1, map2, cv2.INTER_LINEAR, dst=self._output(frame), borderMode=cv2.BORDER_CONSTANT)
+
+        if self.clahe is not None:
+            # Equalizing works in the scratch buffers, so the undistorted buffer can be the target
+            target = self._output(frame) if result is frame else result
+            result = self._equalize(result, target)
+
+        if self.crop_board and board is not None:
+            if result is frame:
+                target = self._output(frame)
+                np.copyto(target, frame)
+                result = target
+            self._blank_outside(result, board)
+
+        return result
@@ -0,0 +1,45 @@
+from typing import List, Optional
+from pydantic import TypeAdapter
+from ..models.dart import DartDetection
+from ..models.score import Score
+from ..models.stream import StreamMessage, VideoFrameMetadata
+
+# Serializers are built once; dumping goes straight from the models to JSON bytes,
+# without the intermediate dicts of model_dump() + json.dumps
+SCORE_ADAPTER = TypeAdapter(Score)
+DETECTION_ADAPTER = TypeAdapter(DartDetection)
+STREAM_ADAPTER = TypeAdapter(StreamMessage)
+VIDEO_METADATA_ADAPTER = TypeAdapter(VideoFrameMetadata)
+
+
+def score_json(score: Score) -> bytes:
+    return SCORE_ADAPTER.dump_json(score)
+
+
+def detection_json(detection: DartDetection) -> bytes:
+    return DETECTION_ADAPTER.dump_json(detection)
+
+
+def parse_detection(payload: bytes) -> DartDetection:
+    return DETECTION_ADAPTER.validate_json(payload)
+
+
+def stream_message(score: Score, frame_id: int, timestamp: float, heartbeat: int, image: str, checkout: Optional[List[str]] = None) -> str:
+    """
+    JSON text of a WebSocket stream message
+    The base64 image needs no escaping, so it is spliced in after the rest of the message
+    is serialized instead of being copied through the serializer
+    """
+    message = StreamMessage.model_construct(
+        score=score, frame_id=frame_id, timestamp=timestamp, heartbeat=heartbeat, checkout=checkout
+    )
+    header = STREAM_ADAPTER.dump_json(message)
+    return f'{header[:-1].decode("utf-8")},"image":"{image}"}}'
+
+
+def video_metadata(score: Score, frame_id: int, timestamp: float, checkout: Optional[List[str]] = None) -> str:
+    """JSON text of the metadata sent with one frame of the video stream"""
+    message = VideoFrameMetadata.model_construct(
+        type="frame", score=score, frame_id=frame_id, timestamp=timestamp, checkout=checkout
+    )
+    return VIDEO_METADATA_ADAPTER.dump_json(message).decode("utf-8")
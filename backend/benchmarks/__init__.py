@@ -0,0 +1,4 @@
+"""
+Offline, CPU-only benchmarks for the Dartify backend.
+Run from the backend directory, e.g. `python -m benchmarks pipeline --output results.json`.
+"""
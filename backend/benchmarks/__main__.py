@@ -0,0 +1,279 @@
+"""
+Command-line entry point for the benchmark suite.
+
+    python -m benchmarks pipeline --frames 300 --output current.json
+    python -m benchmarks pipeline --video match.mp4 --output video.json
+    python -m benchmarks cascade --model yolov8n.pt --output cascade.json
+    python -m benchmarks tiling --model yolov8n.pt --tile-sizes 640 960 --output tiling.json
+    python -m benchmarks serialization --output serialization.json
+    python -m benchmarks video --frames 150 --output video.json
+    python -m benchmarks load --viewers 8 --uploaders 2 --duration 30 --max-p95-ms 500 --output load.json
+    python -m benchmarks startup --model yolov8n.pt --server --output startup.json
+    python -m benchmarks compare baseline.json current.json --threshold 0.2
+"""
+import argparse
+import json
+import sys
+from .harness import compare_results, write_result
+
+
+def _pipeline(args) -> int:
+    from .pipeline import run_pipeline_benchmark
+
+    result = run_pipeline_benchmark(
+        frames=args.frames,
+        width=args.width,
+        height=args.height,
+        darts=args.darts,
+        hold=args.hold,
+        seed=args.seed,
+        warmup=args.warmup,
+        video=args.video,
+        model_path=args.model,
+        jpeg_quality=args.jpeg_quality,
+    )
+    write_result(result, args.output)
+    return 0
+
+
+def _cascade(args) -> int:
+    from .cascade import run_cascade_benchmark
+
+    result = run_cascade_benchmark(
+        frames=args.frames,
+        width=args.width,
+        height=args.height,
+        darts=args.darts,
+        hold=args.hold,
+        seed=args.seed,
+        warmup=args.warmup,
+        video=args.video,
+        model_path=args.model,
+        image_size=args.image_size,
+    )
+    write_result(result, args.output)
+    return 0
+
+
+def _tiling(args) -> int:
+    from .tiling import run_tiling_benchmark
+
+    result = run_tiling_benchmark(
+        frames=args.frames,
+        width=args.width,
+        height=args.height,
+        darts=args.darts,
+        hold=args.hold,
+        seed=args.seed,
+        warmup=args.warmup,
+        video=args.video,
+        model_path=args.model,
+        image_size=args.image_size,
+        tile_sizes=args.tile_sizes,
+        overlaps=args.overlaps,
+        board_only=not args.full_frame,
+    )
+    write_result(result, args.output)
+    return 0
+
+
+def _serialization(args) -> int:
+    from .serialization import run_serialization_benchmark
+
+    result = run_serialization_benchmark(
+        iterations=args.iterations,
+        width=args.width,
+        height=args.height,
+        darts=args.darts,
+        jpeg_quality=args.jpeg_quality,
+        warmup=args.warmup,
+    )
+    write_result(result, args.output)
+    return 0
+
+
+def _video(args) -> int:
+    from .video import run_video_benchmark
+
+    result = run_video_benchmark(
+        frames=args.frames,
+        width=args.width,
+        height=args.height,
+        darts=args.darts,
+        hold=args.hold,
+        seed=args.seed,
+        fps=args.fps,
+        bitrate=args.bitrate,
+    )
+    write_result(result, args.output)
+    return 0
+
+
+def _load(args) -> int:
+    from .load import check_gates, run_load_test
+
+    result = run_load_test(
+        viewers=args.viewers,
+        uploaders=args.uploaders,
+        duration=args.duration,
+        read_delay=args.read_delay,
+        upload_interval=args.upload_interval,
+        fps=args.fps,
+        width=args.width,
+        height=args.height,
+        video=args.video,
+        frames=args.frames,
+        seed=args.seed,
+        server=args.server,
+        port=args.port,
+        timeout=args.timeout,
+    )
+    write_result(result, args.output)
+    failures = check_gates(result, args.max_p95_ms, args.min_fps, args.max_error_rate)
+    for failure in failures:
+        print(f"GATE FAILED: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def _startup(args) -> int:
+    from .startup import run_startup_benchmark
+
+    result = run_startup_benchmark(
+        repeats=args.repeats,
+        model_path=args.model,
+        server=args.server,
+        port=args.port,
+        timeout=args.timeout,
+    )
+    write_result(result, args.output)
+    return 0
+
+
+def _compare(args) -> int:
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    rows = compare_results(baseline, current, metric=args.metric, threshold=args.threshold)
+    regressions = [row for row in rows if row["regression"]]
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(f"{row['stage']:<24} {row['baseline']:>10.3f} -> {row['current']:>10.3f} {row['change']:>+8.1%} {flag}")
+    return 1 if regressions else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Dartify backend benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    pipeline = subparsers.add_parser("pipeline", help="Per-stage and end-to-end frame pipeline benchmark")
+    pipeline.add_argument("--frames", type=int, default=200)
+    pipeline.add_argument("--width", type=int, default=1280)
+    pipeline.add_argument("--height", type=int, default=720)
+    pipeline.add_argument("--darts", type=int, default=3, help="Darts per synthetic frame")
+    pipeline.add_argument("--hold", type=int, default=15, help="Frames each set of darts stays on the board")
+    pipeline.add_argument("--seed", type=int, default=0)
+    pipeline.add_argument("--warmup", type=int, default=5)
+    pipeline.add_argument("--video", help="Replay a recorded video instead of synthetic frames")
+    pipeline.add_argument("--model", help="YOLO model file (detection is skipped if it does not exist locally)")
+    pipeline.add_argument("--jpeg-quality", type=int, default=70)
+    pipeline.add_argument("--output", help="Write JSON results to this file (default: stdout)")
+    pipeline.set_defaults(func=_pipeline)
+
+    cascade = subparsers.add_parser("cascade", help="Single-pass versus cascade detection accuracy and throughput")
+    cascade.add_argument("--frames", type=int, default=200)
+    cascade.add_argument("--width", type=int, default=1280)
+    cascade.add_argument("--height", type=int, default=720)
+    cascade.add_argument("--darts", type=int, default=3, help="Darts per synthetic frame")
+    cascade.add_argument("--hold", type=int, default=15, help="Frames each set of darts stays on the board")
+    cascade.add_argument("--seed", type=int, default=0)
+    cascade.add_argument("--warmup", type=int, default=5)
+    cascade.add_argument("--video", help="Replay a recorded video instead of synthetic frames")
+    cascade.add_argument("--model", required=True, help="YOLO model file")
+    cascade.add_argument("--image-size", type=int, help="Model input size of the single pass (default: the model's)")
+    cascade.add_argument("--output", help="Write JSON results to this file (default: stdout)")
+    cascade.set_defaults(func=_cascade)
+
+    tiling = subparsers.add_parser("tiling", help="Accuracy and latency of tiled detection on high-resolution frames")
+    tiling.add_argument("--frames", type=int, default=50)
+    tiling.add_argument("--width", type=int, default=3840)
+    tiling.add_argument("--height", type=int, default=2160)
+    tiling.add_argument("--darts", type=int, default=3, help="Darts per synthetic frame")
+    tiling.add_argument("--hold", type=int, default=10, help="Frames each set of darts stays on the board")
+    tiling.add_argument("--seed", type=int, default=0)
+    tiling.add_argument("--warmup", type=int, default=3)
+    tiling.add_argument("--video", help="Replay a recorded video instead of synthetic frames")
+    tiling.add_argument("--model", required=True, help="YOLO model file")
+    tiling.add_argument("--image-size", type=int, help="Model input size of the single pass (default: the model's)")
+    tiling.add_argument("--tile-sizes", type=int, nargs="+", default=[640, 960], help="Tile sizes to compare (pixels)")
+    tiling.add_argument("--overlaps", type=int, nargs="+", default=[128], help="Tile overlaps to compare (pixels)")
+    tiling.add_argument("--full-frame", action="store_true", help="Tile the whole frame instead of the calibrated board")
+    tiling.add_argument("--output", help="Write JSON results to this file (default: stdout)")
+    tiling.set_defaults(func=_tiling)
+
+    serialization = subparsers.add_parser("serialization", help="Per-message cost of stream message and detection serialization")
+    serialization.add_argument("--iterations", type=int, default=2000)
+    serialization.add_argument("--width", type=int, default=1280)
+    serialization.add_argument("--height", type=int, default=720)
+    serialization.add_argument("--darts", type=int, default=3)
+    serialization.add_argument("--jpeg-quality", type=int, default=70)
+    serialization.add_argument("--warmup", type=int, default=50)
+    serialization.add_argument("--output", help="Write JSON results to this file (default: stdout)")
+    serialization.set_defaults(func=_serialization)
+
+    video = subparsers.add_parser("video", help="H.264 video stream versus per-frame JPEG through a loopback viewer")
+    video.add_argument("--frames", type=int, default=150)
+    video.add_argument("--width", type=int, default=1280)
+    video.add_argument("--height", type=int, default=720)
+    video.add_argument("--darts", type=int, default=3, help="Darts per synthetic frame")
+    video.add_argument("--hold", type=int, default=30, help="Frames each set of darts stays on the board")
+    video.add_argument("--seed", type=int, default=0)
+    video.add_argument("--fps", type=float, default=15.0, help="Frames published per second")
+    video.add_argument("--bitrate", type=int, default=0, help="Encoder bitrate in bits per second (default: VIDEO_BITRATE)")
+    video.add_argument("--output", help="Write JSON results to this file (default: stdout)")
+    video.set_defaults(func=_video)
+
+    load = subparsers.add_parser("load", help="WebSocket viewers and /camera/detect uploaders against a live server")
+    load.add_argument("--viewers", type=int, default=4, help="WebSocket clients")
+    load.add_argument("--uploaders", type=int, default=1, help="/camera/detect clients")
+    load.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    load.add_argument("--read-delay", type=float, default=0.0, help="Seconds each viewer waits after a message (slow clients)")
+    load.add_argument("--upload-interval", type=float, default=1.0, help="Seconds between uploads per uploader")
+    load.add_argument("--fps", type=float, default=30.0, help="Frame rate of the stand-in camera")
+    load.add_argument("--width", type=int, default=1280)
+    load.add_argument("--height", type=int, default=720)
+    load.add_argument("--video", help="Loop the frames of a recorded video instead of synthetic frames")
+    load.add_argument("--frames", type=int, default=120, help="Frames in the loop")
+    load.add_argument("--seed", type=int, default=0)
+    load.add_argument("--server", action="store_true", help="Run the server in its own process")
+    load.add_argument("--port", type=int, default=8766)
+    load.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for /ready")
+    load.add_argument("--max-p95-ms", type=float, help="Fail if a p95 latency is higher")
+    load.add_argument("--min-fps", type=float, help="Fail if any viewer receives fewer frames per second")
+    load.add_argument("--max-error-rate", type=float, help="Fail if the viewer or uploader error rate is higher")
+    load.add_argument("--output", help="Write JSON results to this file (default: stdout)")
+    load.set_defaults(func=_load)
+
+    startup = subparsers.add_parser("startup", help="Cold import, model load/warm-up and time-to-ready")
+    startup.add_argument("--repeats", type=int, default=5)
+    startup.add_argument("--model", help="Also measure model load and warm-up with this local model file")
+    startup.add_argument("--server", action="store_true", help="Also measure time until uvicorn reports /ready")
+    startup.add_argument("--port", type=int, default=8765)
+    startup.add_argument("--timeout", type=float, default=120.0)
+    startup.add_argument("--output", help="Write JSON results to this file (default: stdout)")
+    startup.set_defaults(func=_startup)
+
+    compare = subparsers.add_parser("compare", help="Compare two result files and fail on regressions")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--metric", default="p50_ms")
+    compare.add_argument("--threshold", type=float, default=0.2, help="Allowed relative slowdown")
+    compare.set_defaults(func=_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
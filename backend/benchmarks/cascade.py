@@ -0,0 +1,111 @@
+"""
+Single-pass versus cascade detection on the same frames.
+Both modes see every frame; the cascade gets the positions tracked from its own previous
+results as hints, the way the live loop feeds it. On synthetic frames both are scored
+against ground truth; on a recorded video the cascade is scored against the single pass.
+"""
+import asyncio
+import time
+from typing import Any, Dict, Optional
+from app.services.calibration_state import CalibrationState
+from app.services.tracking_service import TrackingService
+from .harness import StageTimer, build_result
+from .pipeline import POSITION_TOLERANCE, load_detection_service, replay_video
+from .synthetic import SyntheticDart, SyntheticFrame, iter_frames, match_detections
+
+MODES = ("single", "cascade")
+
+
+def run_cascade_benchmark(
+    frames: int = 200,
+    width: int = 1280,
+    height: int = 720,
+    darts: int = 3,
+    hold: int = 15,
+    seed: int = 0,
+    warmup: int = 5,
+    video: Optional[str] = None,
+    model_path: Optional[str] = None,
+    image_size: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Time and score both detection modes; image_size sets the single-pass model input size.
+    Raises RuntimeError without a local model file, as there is nothing to compare.
+    """
+    calibration_state = CalibrationState()
+    detection_service = load_detection_service(model_path, calibration_state)
+    if detection_service is None:
+        raise RuntimeError("The cascade benchmark needs a local model file (--model)")
+    tracking_service = TrackingService()
+    timer = StageTimer()
+    loop = asyncio.new_event_loop()
+    counts = {mode: {"tp": 0, "fp": 0, "fn": 0} for mode in MODES}
+
+    if video:
+        source = (SyntheticFrame(frame=frame, calibration=None) for frame, _, _, _ in replay_video(video, frames + warmup))
+    else:
+        source = iter_frames(frames + warmup, width, height, darts_per_frame=darts, hold=hold, seed=seed)
+
+    try:
+        for index, synthetic in enumerate(source):
+            frame = synthetic.frame
+            calibration = synthetic.calibration
+            if calibration is not None:
+                calibration_state.publish(calibration.center_x, calibration.center_y, calibration.radius, frame.shape[1], frame.shape[0])
+
+            start = time.perf_counter()
+            single = loop.run_until_complete(detection_service.detect_darts(frame, index, image_size=image_size))
+            single_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            cascade = loop.run_until_complete(
+                detection_service.detect_darts_cascade(frame, index, hints=tracking_service.tracked_positions())
+            )
+            cascade_seconds = time.perf_counter() - start
+            tracking_service.update(cascade)
+
+            if index < warmup:
+                continue
+            timer.record("single", single_seconds)
+            timer.record("cascade", cascade_seconds)
+
+            if calibration is not None:
+                expected = synthetic.darts
+            else:
+                # Without ground truth, the single pass is the reference
+                expected = [SyntheticDart(x=dart.x, y=dart.y, label="", score=0) for dart in single.darts]
+            for mode, result in zip(MODES, (single, cascade)):
+                tp, fp, fn = match_detections(expected, result.darts, POSITION_TOLERANCE)
+                counts[mode]["tp"] += tp
+                counts[mode]["fp"] += fp
+                counts[mode]["fn"] += fn
+    finally:
+        loop.close()
+
+    cascade_settings = detection_service.cascade
+    config = {
+        "frames": frames,
+        "width": width,
+        "height": height,
+        "darts_per_frame": darts,
+        "hold": hold,
+        "seed": seed,
+        "warmup": warmup,
+        "video": video,
+        "detector": detection_service.model_path,
+        "image_size": image_size,
+        "reference": "single" if video else "ground_truth",
+        "cascade": cascade_settings.model_dump(),
+    }
+    return build_result("cascade", config, timer.summary(), {"accuracy": {mode: _rates(counts[mode]) for mode in MODES}})
+
+
+def _rates(counts: Dict[str, int]) -> Dict[str, Any]:
+    summary: Dict[str, Any] = dict(counts)
+    found = counts["tp"] + counts["fn"]
+    predicted = counts["tp"] + counts["fp"]
+    if found:
+        summary["recall"] = counts["tp"] / found
+    if predicted:
+        summary["precision"] = counts["tp"] / predicted
+    return summary
@@ -0,0 +1,113 @@
+"""
+Timing, result and comparison helpers shared by all benchmarks.
+Results are plain JSON so runs can be archived and diffed by CI.
+"""
+import json
+import os
+import platform
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+import numpy as np
+
+RESULT_VERSION = 1
+
+
+class StageTimer:
+    """Collects wall-clock samples per named stage"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage: str, seconds: float):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {stage: summarize(values) for stage, values in self.samples.items()}
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """Latency statistics (milliseconds) and throughput for a list of durations in seconds"""
+    if not values:
+        return {"count": 0}
+    data = np.asarray(values) * 1000.0
+    mean = float(data.mean())
+    return {
+        "count": int(data.size),
+        "mean_ms": mean,
+        "p50_ms": float(np.percentile(data, 50)),
+        "p95_ms": float(np.percentile(data, 95)),
+        "p99_ms": float(np.percentile(data, 99)),
+        "min_ms": float(data.min()),
+        "max_ms": float(data.max()),
+        "throughput_per_s": 1000.0 / mean if mean > 0 else 0.0,
+    }
+
+
+def environment() -> Dict[str, Any]:
+    """Describe the machine and library versions so results are comparable"""
+    import cv2
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "opencv_threads": cv2.getNumThreads(),
+    }
+
+
+def build_result(benchmark: str, config: Dict[str, Any], stages: Dict[str, Any], extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    result = {
+        "version": RESULT_VERSION,
+        "benchmark": benchmark,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": environment(),
+        "config": config,
+        "stages": stages,
+    }
+    if extra:
+        result.update(extra)
+    return result
+
+
+def write_result(result: Dict[str, Any], path: Optional[str]):
+    """Write a result as JSON to path, or to stdout if path is None or '-'"""
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if not path or path == "-":
+        print(text)
+        return
+    with open(path, "w") as f:
+        f.write(text + "\n")
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], metric: str = "p50_ms", threshold: float = 0.2) -> List[Dict[str, Any]]:
+    """
+    Compare two results stage by stage.
+    Returns one row per shared stage, flagged as a regression when the metric grew by more than threshold.
+    """
+    rows = []
+    for stage, stats in sorted(current.get("stages", {}).items()):
+        base = baseline.get("stages", {}).get(stage)
+        if not base or metric not in base or metric not in stats:
+            continue
+        before, after = base[metric], stats[metric]
+        change = (after - before) / before if before else 0.0
+        rows.append({
+            "stage": stage,
+            "baseline": before,
+            "current": after,
+            "change": change,
+            "regression": change > threshold,
+        })
+    return rows
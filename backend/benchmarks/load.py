@@ -0,0 +1,379 @@
+"""
+End-to-end load test: N WebSocket viewers and M /camera/detect uploaders against a real
+uvicorn server whose camera is replaced by a stand-in that loops synthetic frames or the
+frames of a video file at the camera frame rate.
+
+The server runs in this process (in a thread, so server CPU and memory include the
+clients) or in a separate process (`--server`), whose CPU and memory are sampled from
+/proc. Results use the common benchmark format, so `compare` and the `--max-*` gates
+can be used in CI.
+
+    python -m benchmarks load --viewers 8 --uploaders 2 --duration 30 --output load.json
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+from .harness import build_result, summarize
+from .synthetic import iter_frames
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class LoopingCapture:
+    """Stand-in for cv2.VideoCapture that replays frames in a loop at a fixed frame rate"""
+
+    def __init__(self, frames: List[np.ndarray], fps: float):
+        self.frames = frames
+        self.interval = 1.0 / fps
+        self.index = 0
+        self.due = time.perf_counter()
+
+    def isOpened(self) -> bool:
+        return True
+
+    def set(self, prop: int, value: float) -> bool:
+        return True
+
+    def read(self) -> Tuple[bool, np.ndarray]:
+        delay = self.due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        self.due = max(self.due + self.interval, time.perf_counter() - self.interval)
+        frame = self.frames[self.index]
+        self.index = (self.index + 1) % len(self.frames)
+        return True, frame.copy()
+
+    def release(self):
+        pass
+
+
+def load_frames(video: Optional[str], count: int, width: int, height: int, seed: int) -> Tuple[List[np.ndarray], Optional[Tuple[int, int, int]]]:
+    """Frames to replay, and the board calibration (center_x, center_y, radius) if it is known"""
+    if video:
+        capture = cv2.VideoCapture(video)
+        frames = []
+        while len(frames) < count:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            frames.append(frame)
+        capture.release()
+        if not frames:
+            raise RuntimeError(f"No frames could be read from {video}")
+        return frames, None
+
+    # One calibration for the whole loop, so the stand-in behaves like a fixed camera
+    synthetic = list(iter_frames(count, width, height, hold=max(1, count // 4), seed=seed))
+    first = synthetic[0].calibration
+    same_board = [s.frame for s in synthetic if s.calibration == first]
+    return same_board, (first.center_x, first.center_y, first.radius)
+
+
+def install_camera(frames: List[np.ndarray], fps: float):
+    """Make the app's camera service open the stand-in instead of a real device"""
+    from app.routers import camera
+
+    service = getattr(camera.camera_service, "camera_service", camera.camera_service)
+
+    def open_stand_in():
+        service.camera = LoopingCapture(frames, fps)
+
+    service.open = open_stand_in
+
+
+def serve(port: int, frames: List[np.ndarray], fps: float):
+    """Run the app with the stand-in camera until the process (or thread) ends"""
+    import uvicorn
+
+    install_camera(frames, fps)
+    from app.main import app
+
+    uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")).run()
+
+
+def process_stats(pid: int) -> Optional[Tuple[float, float]]:
+    """(CPU seconds, resident MB) of a process, from /proc; None where /proc is not available"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/status") as f:
+            rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    except (OSError, StopIteration, IndexError, ValueError):
+        return None
+    ticks = os.sysconf("SC_CLK_TCK")
+    return (int(fields[11]) + int(fields[12])) / ticks, rss_kb / 1024
+
+
+class ServerMonitor:
+    """Samples CPU (fraction of one core) and resident memory of the server process"""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.cpu: List[float] = []
+        self.rss: List[float] = []
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="load-monitor", daemon=True)
+
+    def _run(self):
+        previous = process_stats(self.pid)
+        previous_time = time.perf_counter()
+        while self.running and previous is not None:
+            time.sleep(self.interval)
+            current = process_stats(self.pid)
+            now = time.perf_counter()
+            if current is None:
+                return
+            self.cpu.append((current[0] - previous[0]) / (now - previous_time))
+            self.rss.append(current[1])
+            previous, previous_time = current, now
+
+    def summary(self) -> Dict[str, Any]:
+        if not self.cpu:
+            return {"available": False}
+        return {
+            "available": True,
+            "cpu_mean": float(np.mean(self.cpu)),
+            "cpu_max": float(np.max(self.cpu)),
+            "rss_mean_mb": float(np.mean(self.rss)),
+            "rss_max_mb": float(np.max(self.rss)),
+        }
+
+
+async def wait_ready(base_url: str, timeout: float):
+    import httpx
+
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get(f"{base_url}/ready", timeout=1.0)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} was not ready after {timeout:.0f}s")
+
+
+async def viewer(url: str, duration: float, read_delay: float) -> Dict[str, Any]:
+    """A WebSocket viewer; latency is from frame capture to the message being parsed"""
+    import websockets
+
+    latencies: List[float] = []
+    errors = 0
+    frames = 0
+    start = time.perf_counter()
+    deadline = start + duration
+    try:
+        async with websockets.connect(url, max_size=None) as connection:
+            while time.perf_counter() < deadline:
+                try:
+                    text = await asyncio.wait_for(connection.recv(), timeout=max(0.1, deadline - time.perf_counter()))
+                except asyncio.TimeoutError:
+                    break
+                message = json.loads(text)
+                if "error" in message:
+                    errors += 1
+                    continue
+                frames += 1
+                latencies.append(time.time() - message["timestamp"])
+                if read_delay:
+                    await asyncio.sleep(read_delay)
+    except Exception:
+        errors += 1
+    elapsed = time.perf_counter() - start
+    return {"kind": "viewer", "frames": frames, "fps": frames / elapsed if elapsed else 0.0, "errors": errors, "latencies": latencies}
+
+
+async def uploader(url: str, duration: float, interval: float, image: str) -> Dict[str, Any]:
+    """A /camera/detect client posting the same image every interval seconds"""
+    import httpx
+
+    latencies: List[float] = []
+    errors = 0
+    requests = 0
+    deadline = time.perf_counter() + duration
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            requests += 1
+            try:
+                response = await client.post(url, json={"image": image})
+                if response.status_code != 200:
+                    errors += 1
+                else:
+                    latencies.append(time.perf_counter() - start)
+            except httpx.HTTPError:
+                errors += 1
+            await asyncio.sleep(max(0.0, interval - (time.perf_counter() - start)))
+    return {"kind": "uploader", "requests": requests, "errors": errors, "latencies": latencies}
+
+
+async def drive(base_url: str, viewers: int, uploaders: int, duration: float, read_delay: float, upload_interval: float, image: str) -> List[Dict[str, Any]]:
+    ws_url = base_url.replace("http://", "ws://") + "/camera/ws"
+    tasks = [viewer(ws_url, duration, read_delay) for _ in range(viewers)]
+    tasks += [uploader(f"{base_url}/camera/detect", duration, upload_interval, image) for _ in range(uploaders)]
+    return await asyncio.gather(*tasks)
+
+
+async def calibrate(base_url: str, calibration: Tuple[int, int, int]):
+    import httpx
+
+    center_x, center_y, radius = calibration
+    async with httpx.AsyncClient() as client:
+        await client.post(f"{base_url}/camera/calibration", json={"center_x": center_x, "center_y": center_y, "radius": radius})
+
+
+def run_load_test(
+    viewers: int = 4,
+    uploaders: int = 1,
+    duration: float = 30.0,
+    read_delay: float = 0.0,
+    upload_interval: float = 1.0,
+    fps: float = 30.0,
+    width: int = 1280,
+    height: int = 720,
+    video: Optional[str] = None,
+    frames: int = 120,
+    seed: int = 0,
+    server: bool = False,
+    port: int = 8766,
+    timeout: float = 120.0,
+) -> Dict[str, Any]:
+    replay, calibration = load_frames(video, frames, width, height, seed)
+    _, buffer = cv2.imencode('.jpg', replay[0])
+    image = base64.b64encode(buffer).decode('utf-8')
+    base_url = f"http://127.0.0.1:{port}"
+
+    process = None
+    if server:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.load", "--port", str(port), "--fps", str(fps),
+             "--width", str(width), "--height", str(height), "--frames", str(frames), "--seed", str(seed)]
+            + (["--video", video] if video else []),
+            cwd=BACKEND_DIR,
+            stdout=subprocess.DEVNULL,
+        )
+        pid = process.pid
+    else:
+        threading.Thread(target=serve, args=(port, replay, fps), name="load-server", daemon=True).start()
+        pid = os.getpid()
+
+    monitor = ServerMonitor(pid)
+    try:
+        if calibration is None:
+            asyncio.run(wait_ready(base_url, timeout))
+        else:
+            asyncio.run(_calibrate_and_wait(base_url, calibration, timeout))
+        monitor.thread.start()
+        clients = asyncio.run(drive(base_url, viewers, uploaders, duration, read_delay, upload_interval, image))
+    finally:
+        monitor.running = False
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    return _result(clients, monitor, {
+        "viewers": viewers,
+        "uploaders": uploaders,
+        "duration": duration,
+        "read_delay": read_delay,
+        "upload_interval": upload_interval,
+        "fps": fps,
+        "width": width,
+        "height": height,
+        "video": video,
+        "server": "process" if server else "in-process",
+    })
+
+
+async def _calibrate_and_wait(base_url: str, calibration: Tuple[int, int, int], timeout: float):
+    """Synthetic boards are calibrated by hand, as a real installation would be"""
+    import httpx
+
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                await client.get(f"{base_url}/health", timeout=1.0)
+                break
+            except httpx.HTTPError:
+                if time.perf_counter() > deadline:
+                    raise RuntimeError(f"Server at {base_url} did not start")
+                await asyncio.sleep(0.2)
+    await calibrate(base_url, calibration)
+    await wait_ready(base_url, max(1.0, deadline - time.perf_counter()))
+
+
+def _result(clients: List[Dict[str, Any]], monitor: ServerMonitor, config: Dict[str, Any]) -> Dict[str, Any]:
+    viewer_results = [c for c in clients if c["kind"] == "viewer"]
+    upload_results = [c for c in clients if c["kind"] == "uploader"]
+    stages = {
+        "viewer_latency": summarize([l for c in viewer_results for l in c["latencies"]]),
+        "upload_latency": summarize([l for c in upload_results for l in c["latencies"]]),
+    }
+
+    viewer_fps = [c["fps"] for c in viewer_results]
+    viewer_messages = sum(c["frames"] + c["errors"] for c in viewer_results)
+    upload_requests = sum(c["requests"] for c in upload_results)
+    return build_result("load", config, stages, {
+        "viewers": {
+            "fps_per_client": viewer_fps,
+            "fps_min": min(viewer_fps) if viewer_fps else 0.0,
+            "fps_mean": float(np.mean(viewer_fps)) if viewer_fps else 0.0,
+            "errors": sum(c["errors"] for c in viewer_results),
+            "error_rate": sum(c["errors"] for c in viewer_results) / viewer_messages if viewer_messages else 0.0,
+        },
+        "uploaders": {
+            "requests": upload_requests,
+            "errors": sum(c["errors"] for c in upload_results),
+            "error_rate": sum(c["errors"] for c in upload_results) / upload_requests if upload_requests else 0.0,
+        },
+        "server": monitor.summary(),
+    })
+
+
+def check_gates(result: Dict[str, Any], max_p95_ms: Optional[float], min_fps: Optional[float], max_error_rate: Optional[float]) -> List[str]:
+    """Descriptions of the gates a result fails"""
+    failures = []
+    if max_p95_ms is not None:
+        for stage in ("viewer_latency", "upload_latency"):
+            p95 = result["stages"][stage].get("p95_ms")
+            if p95 is not None and p95 > max_p95_ms:
+                failures.append(f"{stage} p95 {p95:.1f} ms > {max_p95_ms:.1f} ms")
+    if min_fps is not None and result["viewers"]["fps_per_client"] and result["viewers"]["fps_min"] < min_fps:
+        failures.append(f"slowest viewer {result['viewers']['fps_min']:.1f} fps < {min_fps:.1f} fps")
+    if max_error_rate is not None:
+        for kind in ("viewers", "uploaders"):
+            if result[kind]["error_rate"] > max_error_rate:
+                failures.append(f"{kind} error rate {result[kind]['error_rate']:.2%} > {max_error_rate:.2%}")
+    return failures
+
+
+def main(argv=None):
+    """Server side of --server runs: the app with the stand-in camera"""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--video")
+    args = parser.parse_args(argv)
+
+    replay, _ = load_frames(args.video, args.frames, args.width, args.height, args.seed)
+    serve(args.port, replay, args.fps)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Stage-by-stage and end-to-end benchmark of the frame pipeline.
+Frames come either from the synthetic renderer (with ground truth) or from a recorded
+video replayed through CameraService as a file source.
+"""
+import asyncio
+import base64
+import os
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+import cv2
+import numpy as np
+from app.core.config import settings
+from app.services.calibration_state import CalibrationState
+from app.services.camera_service import CameraService
+from app.services.scoring_service import ScoringService
+from app.services.tracking_service import TrackingService
+from app.utils.image_processing import detect_dartboard, draw_detection
+from .harness import StageTimer, build_result
+from .synthetic import SyntheticFrame, iter_frames, match_detections
+
+# Tolerance (pixels) when matching detected darts and auto-calibration to ground truth
+POSITION_TOLERANCE = 15.0
+
+
+def replay_video(path: str, limit: int) -> Iterator[Tuple[np.ndarray, int, float, float]]:
+    """Yield (frame, frame_id, timestamp, capture_seconds) from a video file via CameraService"""
+    camera = CameraService(source=path, calibration_state=CalibrationState())
+    camera.auto_calibrate = False
+    camera.open()
+    try:
+        for _ in range(limit):
+            start = time.perf_counter()
+            captured = camera.capture_once()
+            elapsed = time.perf_counter() - start
+            if captured is None:
+                break
+            frame, frame_id, timestamp = captured
+            yield frame, frame_id, timestamp, elapsed
+    finally:
+        camera.stop()
+
+
+def render_overlay(frame, detection_result, score, segmentation, detection_service, tracking_service):
+    """Same drawing steps as the WebSocket loop in routers/camera.py"""
+    visualization = frame.copy()
+    visualization = segmentation.draw_dartboard_overlay(visualization)
+    if detection_service is not None:
+        visualization = detection_service.draw_detections(visualization, detection_result)
+    visualization = tracking_service.draw_tracking(visualization)
+    for dart_throw in score.throws:
+        draw_detection(
+            visualization,
+            dart_throw.x,
+            dart_throw.y,
+            f"{dart_throw.section.label} ({dart_throw.section.number * dart_throw.section.multiplier})"
+        )
+    cv2.putText(
+        visualization,
+        f"Total Score: {score.total_score}",
+        (20, 40),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        1.0,
+        (0, 0, 255),
+        2,
+        cv2.LINE_AA
+    )
+    return visualization
+
+
+def load_detection_service(model_path: Optional[str], calibration_state: Optional[CalibrationState] = None):
+    """Return an initialized DetectionService, or None if no local model is available"""
+    model_path = model_path or settings.model.model_path
+    if not os.path.exists(model_path):
+        return None
+    from app.services.detection_service import DetectionService
+
+    service = DetectionService(calibration_state)
+    service.model_path = model_path
+    asyncio.run(service.initialize())
+    return service
+
+
+def run_pipeline_benchmark(
+    frames: int = 200,
+    width: int = 1280,
+    height: int = 720,
+    darts: int = 3,
+    hold: int = 15,
+    seed: int = 0,
+    warmup: int = 5,
+    video: Optional[str] = None,
+    model_path: Optional[str] = None,
+    jpeg_quality: int = 70,
+) -> Dict[str, Any]:
+    """
+    Run every pipeline stage on each frame and return a machine-readable result.
+    Without a local model file, the detector is skipped and ground-truth detections
+    feed the downstream stages, so the benchmark always runs offline on CPU.
+    """
+    detection_service = load_detection_service(model_path)
+    tracking_service = TrackingService()
+    # A private calibration state, published to the same way the camera service does it live
+    calibration_state = CalibrationState()
+    scoring_service = ScoringService(calibration_state)
+    timer = StageTimer()
+    loop = asyncio.new_event_loop()
+
+    accuracy = {
+        "calibration_frames": 0, "calibration_hits": 0,
+        "detection_tp": 0, "detection_fp": 0, "detection_fn": 0,
+        "scored_darts": 0, "scored_correct": 0,
+    }
+
+    if video:
+        source = (
+            (SyntheticFrame(frame=frame, calibration=None), frame_id, elapsed)
+            for frame, frame_id, _, elapsed in replay_video(video, frames + warmup)
+        )
+    else:
+        source = (
+            (synthetic, i + 1, None)
+            for i, synthetic in enumerate(iter_frames(frames + warmup, width, height, darts_per_frame=darts, hold=hold, seed=seed))
+        )
+
+    try:
+        for index, (synthetic, frame_id, capture_seconds) in enumerate(source):
+            measuring = index >= warmup
+            frame = synthetic.frame
+            calibration = synthetic.calibration
+            frame_start = time.perf_counter()
+
+            start = time.perf_counter()
+            center, radius = detect_dartboard(frame)
+            dartboard_seconds = time.perf_counter() - start
+
+            if calibration is not None:
+                # Score against the known calibration so scoring accuracy is independent of auto-calibration
+                calibration_state.publish(calibration.center_x, calibration.center_y, calibration.radius, frame.shape[1], frame.shape[0])
+                if measuring:
+                    accuracy["calibration_frames"] += 1
+                    if center and abs(center[0] - calibration.center_x) <= POSITION_TOLERANCE \
+                            and abs(center[1] - calibration.center_y) <= POSITION_TOLERANCE \
+                            and abs(radius - calibration.radius) <= POSITION_TOLERANCE:
+                        accuracy["calibration_hits"] += 1
+            elif center and radius:
+                if not calibration_state.current.matches(center[0], center[1], radius, frame.shape[1], frame.shape[0], settings.calibration.auto_tolerance):
+                    calibration_state.publish(center[0], center[1], radius, frame.shape[1], frame.shape[0], source="auto")
+
+            if detection_service is not None:
+                start = time.perf_counter()
+                detection_result = loop.run_until_complete(detection_service.detect_darts(frame))
+                detect_seconds = time.perf_counter() - start
+                detection_result.frame_id = frame_id
+            else:
+                detect_seconds = None
+                detection_result = synthetic.oracle_detection(frame_id, time.time())
+
+            start = time.perf_counter()
+            stable_darts = tracking_service.update(detection_result)
+            tracking_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            score = scoring_service.calculate_score(stable_darts, frame.shape[1], frame.shape[0])
+            scoring_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            segmentation = calibration_state.current.segmentation_for(frame.shape[1], frame.shape[0])
+            visualization = render_overlay(frame, detection_result, score, segmentation, detection_service, tracking_service)
+            overlay_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            _, buffer = cv2.imencode('.jpg', visualization, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+            encode_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            base64.b64encode(buffer).decode('utf-8')
+            base64_seconds = time.perf_counter() - start
+
+            end_to_end = time.perf_counter() - frame_start + (capture_seconds or 0.0)
+
+            if not measuring:
+                continue
+
+            if capture_seconds is not None:
+                timer.record("capture", capture_seconds)
+            timer.record("detect_dartboard", dartboard_seconds)
+            if detect_seconds is not None:
+                timer.record("detect_darts", detect_seconds)
+            timer.record("tracking", tracking_seconds)
+            timer.record("scoring", scoring_seconds)
+            timer.record("overlay", overlay_seconds)
+            timer.record("jpeg_encode", encode_seconds)
+            timer.record("base64", base64_seconds)
+            timer.record("end_to_end", end_to_end)
+
+            if calibration is not None:
+                if detection_service is not None:
+                    tp, fp, fn = match_detections(synthetic.darts, detection_result.darts, POSITION_TOLERANCE)
+                    accuracy["detection_tp"] += tp
+                    accuracy["detection_fp"] += fp
+                    accuracy["detection_fn"] += fn
+
+                # Scoring accuracy of the segmentation geometry on the ground-truth dart positions
+                expected = scoring_service.calculate_score(synthetic.oracle_detection().darts, frame.shape[1], frame.shape[0])
+                for dart, dart_throw in zip(synthetic.darts, expected.throws):
+                    accuracy["scored_darts"] += 1
+                    accuracy["scored_correct"] += int(dart_throw.section.label == dart.label)
+    finally:
+        loop.close()
+
+    config = {
+        "frames": frames,
+        "width": width,
+        "height": height,
+        "darts_per_frame": darts,
+        "hold": hold,
+        "seed": seed,
+        "warmup": warmup,
+        "video": video,
+        "jpeg_quality": jpeg_quality,
+        "detector": detection_service.model_path if detection_service else "oracle",
+    }
+    return build_result("pipeline", config, timer.summary(), {"accuracy": _accuracy_summary(accuracy)})
+
+
+def _accuracy_summary(counts: Dict[str, int]) -> Dict[str, Any]:
+    summary: Dict[str, Any] = dict(counts)
+    if counts["calibration_frames"]:
+        summary["calibration_rate"] = counts["calibration_hits"] / counts["calibration_frames"]
+    found = counts["detection_tp"] + counts["detection_fn"]
+    predicted = counts["detection_tp"] + counts["detection_fp"]
+    if found:
+        summary["detection_recall"] = counts["detection_tp"] / found
+    if predicted:
+        summary["detection_precision"] = counts["detection_tp"] / predicted
+    if counts["scored_darts"]:
+        summary["scoring_accuracy"] = counts["scored_correct"] / counts["scored_darts"]
+    return summary
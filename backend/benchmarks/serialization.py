@@ -0,0 +1,117 @@
+"""
+Per-message cost of serializing WebSocket stream messages and broker detections.
+The previous path (score.dict() nested in a dict with the base64 image, then json.dumps)
+is compared with app.utils.serialization, and with orjson if it is installed. Every path
+is checked to produce the same JSON before it is timed.
+"""
+import base64
+import json
+import time
+import warnings
+from typing import Any, Callable, Dict
+import cv2
+from app.models.dart import Dart, DartDetection
+from app.models.score import DartThrow, Score, ScoringSection
+from app.utils.serialization import detection_json, parse_detection, stream_message
+from .harness import StageTimer, build_result
+from .synthetic import iter_frames
+
+
+def sample_message(width: int, height: int, darts: int, quality: int) -> Dict[str, Any]:
+    """A realistic message: a rendered synthetic frame as base64 JPEG, and its darts"""
+    synthetic = next(iter_frames(1, width, height, darts_per_frame=darts))
+    _, buffer = cv2.imencode('.jpg', synthetic.frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    throws = [
+        DartThrow(section=ScoringSection(number=20, multiplier=3, label="T20"), x=dart.x, y=dart.y, confidence=0.9)
+        for dart in synthetic.darts
+    ]
+    detection = DartDetection(
+        darts=[Dart(x=dart.x, y=dart.y, confidence=0.9) for dart in synthetic.darts],
+        frame_id=1,
+        timestamp=time.time(),
+        image_width=width,
+        image_height=height,
+    )
+    return {
+        "score": Score(throws=throws, total_score=60 * len(throws), image_width=width, image_height=height),
+        "detection": detection,
+        "image": base64.b64encode(buffer).decode('utf-8'),
+        "checkout": ["T20", "D20"],
+    }
+
+
+def _paths(sample: Dict[str, Any]) -> Dict[str, Callable[[], Any]]:
+    score, detection, image, checkout = sample["score"], sample["detection"], sample["image"], sample["checkout"]
+
+    def legacy_message():
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            message = {"score": score.dict(), "checkout": checkout, "frame_id": 1, "timestamp": 0.5, "image": image, "heartbeat": 7}
+        return json.dumps(message)
+
+    def model_dump_message():
+        message = {"score": score.model_dump(), "checkout": checkout, "frame_id": 1, "timestamp": 0.5, "image": image, "heartbeat": 7}
+        return json.dumps(message)
+
+    paths = {
+        "message_legacy": legacy_message,
+        "message_model_dump": model_dump_message,
+        "message_fast": lambda: stream_message(score, 1, 0.5, 7, image, checkout),
+        "detection_dump_legacy": lambda: detection.model_dump_json().encode("utf-8"),
+        "detection_dump_fast": lambda: detection_json(detection),
+        "detection_parse_legacy": lambda: DartDetection.model_validate_json(detection.model_dump_json()),
+        "detection_parse_fast": lambda: parse_detection(detection_json(detection)),
+    }
+
+    try:
+        import orjson
+    except ImportError:
+        return paths
+    paths["message_orjson"] = lambda: orjson.dumps(
+        {"score": score.model_dump(), "checkout": checkout, "frame_id": 1, "timestamp": 0.5, "image": image, "heartbeat": 7}
+    ).decode("utf-8")
+    return paths
+
+
+def _check(paths: Dict[str, Callable[[], Any]]):
+    """Every message path must produce the same document, and detections must round-trip"""
+    reference = json.loads(paths["message_legacy"]())
+    for name, path in paths.items():
+        if name.startswith("message_") and json.loads(path()) != reference:
+            raise AssertionError(f"{name} does not match the previous message format")
+    if paths["detection_parse_fast"]() != paths["detection_parse_legacy"]():
+        raise AssertionError("detection round trip differs")
+
+
+def run_serialization_benchmark(
+    iterations: int = 2000,
+    width: int = 1280,
+    height: int = 720,
+    darts: int = 3,
+    jpeg_quality: int = 70,
+    warmup: int = 50,
+) -> Dict[str, Any]:
+    """Time every serialization path on the same message; stages are per message"""
+    sample = sample_message(width, height, darts, jpeg_quality)
+    paths = _paths(sample)
+    _check(paths)
+
+    timer = StageTimer()
+    for name, path in paths.items():
+        for index in range(iterations + warmup):
+            start = time.perf_counter()
+            path()
+            elapsed = time.perf_counter() - start
+            if index >= warmup:
+                timer.record(name, elapsed)
+
+    config = {
+        "iterations": iterations,
+        "width": width,
+        "height": height,
+        "darts": darts,
+        "jpeg_quality": jpeg_quality,
+        "image_bytes": len(sample["image"]),
+        "warmup": warmup,
+    }
+    return build_result("serialization", config, timer.summary())
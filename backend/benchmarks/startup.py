@@ -0,0 +1,103 @@
+"""
+Startup benchmark: cold import time of app.main, model load and warm-up time,
+and (optionally) time until a real uvicorn server reports /ready.
+Every cold measurement runs in a fresh interpreter.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List, Optional
+from .harness import build_result, summarize
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = """
+import json, time
+start = time.perf_counter()
+import app.main
+print(json.dumps({"import": time.perf_counter() - start}))
+"""
+
+MODEL_SNIPPET = """
+import asyncio, json, time
+from app.services.detection_service import DetectionService
+service = DetectionService()
+service.model_path = {model_path!r}
+asyncio.run(service.initialize())
+asyncio.run(service.warmup())
+print(json.dumps({{"model_load": service.load_seconds, "warmup": service.warmup_seconds}}))
+"""
+
+
+def _run_snippet(code: str, env: Optional[Dict[str, str]] = None) -> Dict[str, float]:
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **(env or {})},
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _time_to_ready(port: int, timeout: float) -> Optional[float]:
+    """Start uvicorn and poll /ready; returns seconds until ready, or None on timeout"""
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=1.0) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError, OSError):
+                pass
+            time.sleep(0.05)
+        return None
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def run_startup_benchmark(
+    repeats: int = 5,
+    model_path: Optional[str] = None,
+    server: bool = False,
+    port: int = 8765,
+    timeout: float = 120.0,
+) -> Dict[str, Any]:
+    samples: Dict[str, List[float]] = {"import": []}
+    for _ in range(repeats):
+        samples["import"].append(_run_snippet(IMPORT_SNIPPET)["import"])
+
+    if model_path and os.path.exists(model_path):
+        samples["model_load"] = []
+        samples["warmup"] = []
+        for _ in range(repeats):
+            result = _run_snippet(MODEL_SNIPPET.format(model_path=os.path.abspath(model_path)))
+            samples["model_load"].append(result["model_load"])
+            samples["warmup"].append(result["warmup"])
+
+    timeouts = 0
+    if server:
+        samples["time_to_ready"] = []
+        for _ in range(repeats):
+            elapsed = _time_to_ready(port, timeout)
+            if elapsed is None:
+                timeouts += 1
+            else:
+                samples["time_to_ready"].append(elapsed)
+
+    config = {"repeats": repeats, "model": model_path, "server": server}
+    stages = {name: summarize(values) for name, values in samples.items()}
+    return build_result("startup", config, stages, {"ready_timeouts": timeouts})
@@ -0,0 +1,216 @@
+"""
+Synthetic dartboard frames with darts at known positions.
+The board is drawn with the same geometry as DartboardSegmentation (DARTBOARD_NUMBERS
+and RADIUS_RANGES), so the expected score of every rendered dart is known exactly.
+"""
+import math
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Tuple
+import cv2
+import numpy as np
+from app.models.dart import Dart, DartDetection
+from app.utils.dartboard_segmentation import DARTBOARD_NUMBERS, RADIUS_RANGES
+
+# BGR colours of a standard board
+BLACK = (20, 20, 20)
+CREAM = (200, 230, 240)
+RED = (40, 40, 200)
+GREEN = (60, 140, 30)
+WALL = (70, 70, 70)
+
+# Normalised radius at the middle of each scoring ring
+RING_RADIUS = {name: (low + high) / 2 for name, (low, high) in RADIUS_RANGES.items()}
+
+# Target rings by multiplier for the numbered sections
+RING_FOR_MULTIPLIER = {1: "outer_single", 2: "double", 3: "triple"}
+
+
+@dataclass
+class Calibration:
+    """Known dartboard position in a synthetic frame"""
+    center_x: int
+    center_y: int
+    radius: int
+
+
+@dataclass
+class SyntheticDart:
+    """A rendered dart with its tip position and the label it should score"""
+    x: float
+    y: float
+    label: str
+    score: int
+
+
+@dataclass
+class SyntheticFrame:
+    frame: np.ndarray
+    calibration: Optional[Calibration]  # None for frames replayed from video
+    darts: List[SyntheticDart] = field(default_factory=list)
+
+    def oracle_detection(self, frame_id: int = 0, timestamp: float = 0.0) -> DartDetection:
+        """Ground-truth detection result, for benchmarking stages downstream of the detector"""
+        return DartDetection(
+            darts=[Dart(x=d.x, y=d.y, confidence=1.0) for d in self.darts],
+            frame_id=frame_id,
+            timestamp=timestamp,
+            image_width=self.frame.shape[1],
+            image_height=self.frame.shape[0],
+        )
+
+
+# Calibrations used by default: centred, off-centre and small/far-away boards
+DEFAULT_CALIBRATIONS = [
+    Calibration(640, 360, 300),
+    Calibration(560, 400, 260),
+    Calibration(700, 330, 180),
+]
+
+
+def dart_position(calibration: Calibration, number: int, multiplier: int) -> Tuple[float, float]:
+    """Pixel position in the middle of the segment for number/multiplier (25/50 for the bulls)"""
+    if number == 50:
+        return float(calibration.center_x), float(calibration.center_y)
+    if number == 25:
+        distance = RING_RADIUS["outer_bull"]
+        angle = 0.0
+    else:
+        distance = RING_RADIUS[RING_FOR_MULTIPLIER[multiplier]]
+        angle = DARTBOARD_NUMBERS.index(number) * 18.0
+
+    radian = math.radians(angle)
+    x = calibration.center_x + calibration.radius * distance * math.sin(radian)
+    y = calibration.center_y - calibration.radius * distance * math.cos(radian)
+    return x, y
+
+
+def _label(number: int, multiplier: int) -> str:
+    if number == 50:
+        return "Bull"
+    if number == 25:
+        return "25"
+    prefix = {1: "", 2: "D", 3: "T"}[multiplier]
+    return f"{prefix}{number}"
+
+
+def _draw_ring(image: np.ndarray, calibration: Calibration, outer: float, colors: Tuple[tuple, tuple]):
+    """Fill every sector up to the given normalised radius, alternating between two colours"""
+    center = (calibration.center_x, calibration.center_y)
+    radius = int(round(calibration.radius * outer))
+    for i in range(20):
+        # Board angles start at the top and go clockwise; OpenCV starts at +x
+        start = i * 18 - 9 - 90
+        cv2.ellipse(image, center, (radius, radius), 0, start, start + 18, colors[i % 2], -1, cv2.LINE_AA)
+
+
+def render_board(width: int, height: int, calibration: Calibration) -> np.ndarray:
+    """Render an empty dartboard"""
+    image = np.full((height, width, 3), WALL, dtype=np.uint8)
+    center = (calibration.center_x, calibration.center_y)
+
+    cv2.circle(image, center, int(calibration.radius * 1.15), BLACK, -1, cv2.LINE_AA)
+    _draw_ring(image, calibration, RADIUS_RANGES["double"][1], (RED, GREEN))
+    _draw_ring(image, calibration, RADIUS_RANGES["outer_single"][1], (BLACK, CREAM))
+    _draw_ring(image, calibration, RADIUS_RANGES["triple"][1], (RED, GREEN))
+    _draw_ring(image, calibration, RADIUS_RANGES["inner_single"][1], (BLACK, CREAM))
+    cv2.circle(image, center, int(calibration.radius * RADIUS_RANGES["outer_bull"][1]), GREEN, -1, cv2.LINE_AA)
+    cv2.circle(image, center, int(calibration.radius * RADIUS_RANGES["bullseye"][1]), RED, -1, cv2.LINE_AA)
+    return image
+
+
+def draw_dart(image: np.ndarray, x: float, y: float, scale: float = 1.0):
+    """Draw a dart whose tip is at (x, y), with the shaft pointing up and to the right"""
+    tip = (int(round(x)), int(round(y)))
+    tail = (int(round(x + 45 * scale)), int(round(y - 60 * scale)))
+    cv2.line(image, tip, tail, (180, 180, 180), max(1, int(3 * scale)), cv2.LINE_AA)
+    flight = np.array([
+        tail,
+        (tail[0] + int(18 * scale), tail[1] - int(4 * scale)),
+        (tail[0] + int(10 * scale), tail[1] - int(22 * scale)),
+    ], dtype=np.int32)
+    cv2.fillPoly(image, [flight], (0, 200, 255), cv2.LINE_AA)
+    cv2.circle(image, tip, max(1, int(2 * scale)), (230, 230, 230), -1, cv2.LINE_AA)
+
+
+def random_targets(rng: np.random.Generator, count: int) -> List[Tuple[int, int]]:
+    """Pick count random (number, multiplier) targets"""
+    targets = []
+    for _ in range(count):
+        choice = rng.integers(0, 22)
+        if choice == 20:
+            targets.append((25, 1))
+        elif choice == 21:
+            targets.append((50, 1))
+        else:
+            targets.append((DARTBOARD_NUMBERS[int(choice)], int(rng.integers(1, 4))))
+    return targets
+
+
+def render_frame(
+    width: int,
+    height: int,
+    calibration: Calibration,
+    targets: List[Tuple[int, int]],
+    rng: Optional[np.random.Generator] = None,
+    noise: float = 4.0,
+    board: Optional[np.ndarray] = None,
+) -> SyntheticFrame:
+    """Render a board with one dart per (number, multiplier) target and optional sensor noise"""
+    image = board.copy() if board is not None else render_board(width, height, calibration)
+    darts = []
+    for number, multiplier in targets:
+        x, y = dart_position(calibration, number, multiplier)
+        draw_dart(image, x, y, scale=calibration.radius / 300)
+        score = number if number in (25, 50) else number * multiplier
+        darts.append(SyntheticDart(x=x, y=y, label=_label(number, multiplier), score=score))
+
+    if rng is not None and noise > 0:
+        grain = rng.normal(0, noise, image.shape).astype(np.int16)
+        image = np.clip(image.astype(np.int16) + grain, 0, 255).astype(np.uint8)
+
+    return SyntheticFrame(frame=image, calibration=calibration, darts=darts)
+
+
+def iter_frames(
+    count: int,
+    width: int = 1280,
+    height: int = 720,
+    calibrations: Optional[List[Calibration]] = None,
+    darts_per_frame: int = 3,
+    hold: int = 1,
+    seed: int = 0,
+) -> Iterator[SyntheticFrame]:
+    """
+    Deterministically generate count frames, cycling through the given calibrations.
+    Each set of darts is held for `hold` consecutive frames (with fresh sensor noise) so
+    the tracker sees darts settle the way it does after a real throw.
+    Frames are rendered lazily to keep memory flat for long runs.
+    """
+    rng = np.random.default_rng(seed)
+    calibrations = calibrations or DEFAULT_CALIBRATIONS
+    boards = [render_board(width, height, c) for c in calibrations]
+
+    targets: List[Tuple[int, int]] = []
+    index = 0
+    for i in range(count):
+        if i % hold == 0:
+            index = (i // hold) % len(calibrations)
+            targets = random_targets(rng, darts_per_frame)
+        yield render_frame(width, height, calibrations[index], targets, rng=rng, board=boards[index])
+
+
+def match_detections(expected: List[SyntheticDart], detected: List[Dart], tolerance: float) -> Tuple[int, int, int]:
+    """Greedy nearest-neighbour matching; returns (true positives, false positives, false negatives)"""
+    unmatched = list(detected)
+    true_positives = 0
+    for dart in expected:
+        best = None
+        best_distance = tolerance
+        for candidate in unmatched:
+            distance = math.hypot(candidate.x - dart.x, candidate.y - dart.y)
+            if distance <= best_distance:
+                best, best_distance = candidate, distance
+        if best is not None:
+            unmatched.remove(best)
+            true_positives += 1
+    return true_positives, len(unmatched), len(expected) - true_positives
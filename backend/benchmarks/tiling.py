@@ -0,0 +1,117 @@
+"""
+Accuracy/latency tradeoff of tiled detection on high-resolution frames.
+Every frame goes through a single downscaled pass and through tiled detection for each
+tile size and overlap; all modes are scored against ground truth on synthetic frames, and
+against the single pass on a recorded video. Stages are named after the modes, e.g.
+tiled_640_128 for 640 pixel tiles with 128 pixels of overlap.
+"""
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Sequence
+from app.services.calibration_state import CalibrationState
+from .cascade import _rates
+from .harness import StageTimer, build_result
+from .pipeline import POSITION_TOLERANCE, load_detection_service, replay_video
+from .synthetic import SyntheticDart, SyntheticFrame, iter_frames, match_detections
+
+
+def run_tiling_benchmark(
+    frames: int = 50,
+    width: int = 3840,
+    height: int = 2160,
+    darts: int = 3,
+    hold: int = 10,
+    seed: int = 0,
+    warmup: int = 3,
+    video: Optional[str] = None,
+    model_path: Optional[str] = None,
+    image_size: Optional[int] = None,
+    tile_sizes: Sequence[int] = (640, 960),
+    overlaps: Sequence[int] = (128,),
+    board_only: bool = True,
+) -> Dict[str, Any]:
+    """
+    Time and score the single pass and every tile configuration on the same frames.
+    Raises RuntimeError without a local model file, as there is nothing to compare.
+    """
+    calibration_state = CalibrationState()
+    detection_service = load_detection_service(model_path, calibration_state)
+    if detection_service is None:
+        raise RuntimeError("The tiling benchmark needs a local model file (--model)")
+    base = detection_service.tiling
+    configurations = {
+        f"tiled_{size}_{overlap}": base.model_copy(update={"tile_size": size, "overlap": overlap, "board_only": board_only})
+        for size in tile_sizes
+        for overlap in overlaps
+    }
+    modes: List[str] = ["single"] + list(configurations)
+    timer = StageTimer()
+    loop = asyncio.new_event_loop()
+    counts = {mode: {"tp": 0, "fp": 0, "fn": 0} for mode in modes}
+    tiles: Dict[str, int] = {}
+
+    if video:
+        source = (SyntheticFrame(frame=frame, calibration=None) for frame, _, _, _ in replay_video(video, frames + warmup))
+    else:
+        source = iter_frames(frames + warmup, width, height, darts_per_frame=darts, hold=hold, seed=seed)
+
+    try:
+        for index, synthetic in enumerate(source):
+            frame = synthetic.frame
+            calibration = synthetic.calibration
+            if calibration is not None:
+                calibration_state.publish(calibration.center_x, calibration.center_y, calibration.radius, frame.shape[1], frame.shape[0])
+            # Positions are compared in frame pixels, so the tolerance grows with the resolution
+            tolerance = POSITION_TOLERANCE * max(1.0, frame.shape[1] / 1280)
+
+            results = {}
+            start = time.perf_counter()
+            results["single"] = loop.run_until_complete(detection_service.detect_darts(frame, index, image_size=image_size))
+            seconds = {"single": time.perf_counter() - start}
+            for mode, tiling in configurations.items():
+                detection_service.tiling = tiling
+                tiles.setdefault(mode, len(detection_service.tile_regions(frame.shape[1], frame.shape[0])))
+                start = time.perf_counter()
+                results[mode] = loop.run_until_complete(detection_service.detect_darts_tiled(frame, index))
+                seconds[mode] = time.perf_counter() - start
+
+            if index < warmup:
+                continue
+            for mode in modes:
+                timer.record(mode, seconds[mode])
+
+            if calibration is not None:
+                expected = synthetic.darts
+            else:
+                # Without ground truth, the single pass is the reference
+                expected = [SyntheticDart(x=dart.x, y=dart.y, label="", score=0) for dart in results["single"].darts]
+            for mode in modes:
+                tp, fp, fn = match_detections(expected, results[mode].darts, tolerance)
+                counts[mode]["tp"] += tp
+                counts[mode]["fp"] += fp
+                counts[mode]["fn"] += fn
+    finally:
+        detection_service.tiling = base
+        loop.close()
+
+    config = {
+        "frames": frames,
+        "width": width,
+        "height": height,
+        "darts_per_frame": darts,
+        "hold": hold,
+        "seed": seed,
+        "warmup": warmup,
+        "video": video,
+        "detector": detection_service.model_path,
+        "image_size": image_size,
+        "tile_sizes": list(tile_sizes),
+        "overlaps": list(overlaps),
+        "board_only": board_only,
+        "reference": "single" if video else "ground_truth",
+    }
+    extra = {
+        "accuracy": {mode: _rates(counts[mode]) for mode in modes},
+        "tiles_per_frame": tiles,
+    }
+    return build_result("tiling", config, timer.summary(), extra)
@@ -0,0 +1,140 @@
+"""
+H.264 video stream against per-frame JPEG, through a local loopback viewer.
+Synthetic frames are published to a VideoStream at the camera pace; a subscriber in
+the same event loop receives the init and media segments like a browser would, then
+the received stream is decoded again to check every delivered frame and its quality.
+Reports bytes per frame for both transports and the publish-to-delivery latency.
+"""
+import asyncio
+import io
+import json
+import time
+from typing import Any, Dict, List
+import cv2
+import numpy as np
+from app.core.config import settings
+from app.services.video_stream import FRAME, INIT, MEDIA, VideoStream
+from .harness import StageTimer, build_result
+from .synthetic import iter_frames
+
+
+async def _loopback(stream: VideoStream, frames: List[np.ndarray], fps: float) -> Dict[str, Any]:
+    """Publish the frames at the camera pace and collect what one viewer receives"""
+    received: Dict[str, Any] = {"mime": None, "init": [], "media": [], "frame_ids": []}
+    published: Dict[int, float] = {}
+    delivered: Dict[int, float] = {}
+
+    async def viewer():
+        pending_frame = None
+        async for kind, payload in stream.subscribe():
+            if kind == INIT and isinstance(payload, str):
+                received["mime"] = payload
+            elif kind == INIT:
+                received["init"].append(payload)
+            elif kind == FRAME:
+                pending_frame = json.loads(payload)["frame_id"]
+            elif kind == MEDIA:
+                received["media"].append(payload)
+                received["frame_ids"].append(pending_frame)
+                delivered[pending_frame] = time.perf_counter()
+
+    task = asyncio.create_task(viewer())
+    await asyncio.sleep(0)
+    start = time.time()
+    for frame_id, frame in enumerate(frames, start=1):
+        timestamp = start + frame_id / fps
+        published[frame_id] = time.perf_counter()
+        stream.publish(frame_id, timestamp, frame, json.dumps({"type": "frame", "frame_id": frame_id, "timestamp": timestamp}))
+        await asyncio.sleep(1.0 / fps)
+    # Let the encoder finish the last frames
+    await asyncio.sleep(0.5)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    received["latency"] = {frame_id: delivered[frame_id] - published[frame_id] for frame_id in delivered if frame_id in published}
+    return received
+
+
+def _decode(init: bytes, media: List[bytes]) -> List[np.ndarray]:
+    import av
+
+    container = av.open(io.BytesIO(init + b"".join(media)), format="mp4")
+    try:
+        return [frame.to_ndarray(format="bgr24") for frame in container.decode(video=0)]
+    finally:
+        container.close()
+
+
+def run_video_benchmark(
+    frames: int = 150,
+    width: int = 1280,
+    height: int = 720,
+    darts: int = 3,
+    hold: int = 30,
+    seed: int = 0,
+    fps: float = 15.0,
+    bitrate: int = 0,
+) -> Dict[str, Any]:
+    """Stream synthetic frames through the video encoder and compare with JPEG; bitrate 0 uses VIDEO_BITRATE"""
+    config = settings.video.model_copy(update={"max_fps": fps, **({"bitrate": bitrate} if bitrate else {})})
+    stream = VideoStream(config)
+    if not stream.available:
+        raise RuntimeError("The video benchmark needs PyAV (pip install av)")
+    source = [synthetic.frame for synthetic in iter_frames(frames, width, height, darts_per_frame=darts, hold=hold, seed=seed)]
+
+    loop = asyncio.new_event_loop()
+    try:
+        received = loop.run_until_complete(_loopback(stream, source, fps))
+    finally:
+        stream.shutdown()
+        loop.close()
+
+    timer = StageTimer()
+    for seconds in received["latency"].values():
+        timer.record("delivery", seconds)
+
+    # The encoder downscales to VIDEO_MAX_WIDTH, so JPEG is measured at the same size
+    target_width = min(width, config.max_width) // 2 * 2
+    target_height = (height * target_width // width) // 2 * 2
+    jpeg_sizes = []
+    for frame in source:
+        resized = cv2.resize(frame, (target_width, target_height), interpolation=cv2.INTER_AREA)
+        _, buffer = cv2.imencode('.jpg', resized, [cv2.IMWRITE_JPEG_QUALITY, settings.stream.jpeg_quality])
+        jpeg_sizes.append(len(buffer))
+
+    media_sizes = [len(segment) for segment in received["media"]]
+    psnr = []
+    decoded = []
+    if received["init"] and received["media"]:
+        decoded = _decode(received["init"][0], received["media"])
+        for frame_id, image in zip(received["frame_ids"], decoded):
+            original = cv2.resize(source[frame_id - 1], (image.shape[1], image.shape[0]), interpolation=cv2.INTER_AREA)
+            psnr.append(cv2.PSNR(original, image))
+
+    video_mean = float(np.mean(media_sizes)) if media_sizes else 0.0
+    jpeg_mean = float(np.mean(jpeg_sizes))
+    extra = {
+        "mime": received["mime"],
+        "frames_published": frames,
+        "frames_delivered": len(media_sizes),
+        "frames_decoded": len(decoded),
+        "init_bytes": len(received["init"][0]) if received["init"] else 0,
+        "video_bytes_per_frame": video_mean,
+        "jpeg_bytes_per_frame": jpeg_mean,
+        "bandwidth_ratio": video_mean / jpeg_mean if jpeg_mean else None,
+        "psnr_mean": float(np.mean(psnr)) if psnr else None,
+    }
+    config_summary = {
+        "frames": frames,
+        "width": width,
+        "height": height,
+        "darts_per_frame": darts,
+        "hold": hold,
+        "seed": seed,
+        "fps": fps,
+        "video": config.model_dump(),
+        "jpeg_quality": settings.stream.jpeg_quality,
+    }
+    return build_result("video", config_summary, timer.summary(), extra)
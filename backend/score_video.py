@@ -0,0 +1,352 @@
+"""
+Script to score recorded match videos offline
+
+Frames are decoded in parallel chunks, run through DetectionService in batches and fed
+to TrackingService and ScoringService in frame order. Every new dart on the board is
+written as one record to a JSONL (or Parquet) file.
+
+Usage: python score_video.py match1.mp4 match2.mp4 -o throws.jsonl
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import cv2
+import numpy as np
+from app.core.config import settings
+from app.services.calibration_state import CalibrationState
+from app.services.detection_service import DetectionService
+from app.services.scoring_service import ScoringService
+from app.services.throw_detector import ThrowDetector
+from app.services.tracking_service import TrackingService
+from app.utils.image_processing import detect_dartboard, preprocess_frame
+from app.utils.preprocessing import FramePreprocessor
+
+logger = logging.getLogger("score_video")
+
+# Marks the end of a decoded chunk
+END_OF_CHUNK = None
+
+
+class ChunkDecoder:
+    """
+    Decodes a video with several threads, each one seeking to its own chunk of frames.
+    OpenCV releases the GIL while decoding, so the threads use all cores. Chunks are
+    yielded in order and each chunk queue is bounded, so memory stays bounded too.
+    """
+
+    def __init__(self, path: str, workers: int, chunk_frames: int, stride: int = 1, queue_size: int = 32):
+        self.path = path
+        self.workers = max(1, workers)
+        self.chunk_frames = chunk_frames
+        self.stride = max(1, stride)
+        self.queue_size = queue_size
+        self.stopped = threading.Event()
+
+        capture = cv2.VideoCapture(path)
+        if not capture.isOpened():
+            raise ValueError(f"Could not open video {path}")
+        self.fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        capture.release()
+
+    def chunks(self) -> List[Tuple[int, int]]:
+        """(first frame, end frame) of every chunk; one open-ended chunk if the length is unknown"""
+        if self.frame_count <= 0:
+            return [(0, -1)]
+        count = math.ceil(self.frame_count / self.chunk_frames)
+        return [(i * self.chunk_frames, min(self.frame_count, (i + 1) * self.chunk_frames)) for i in range(count)]
+
+    def _put(self, out: "queue.Queue", item) -> bool:
+        """Queue an item, waiting for room; False once the consumer stopped, so producers never block forever"""
+        while not self.stopped.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode(self, start: int, end: int, out: "queue.Queue"):
+        capture = cv2.VideoCapture(self.path)
+        # Frames are queued, so every one needs its own array; the board position is not known yet
+        preprocessor = FramePreprocessor.from_settings(buffers=0, crop_board=False)
+        try:
+            if start:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+            index = start
+            while (end < 0 or index < end) and not self.stopped.is_set():
+                # grab() without retrieve() skips the colour conversion of frames outside the stride
+                if not capture.grab():
+                    break
+                if index % self.stride == 0:
+                    ret, frame = capture.retrieve()
+                    if not ret:
+                        break
+                    if not self._put(out, (index, index / self.fps, preprocess_frame(frame, preprocessor))):
+                        break
+                index += 1
+        finally:
+            capture.release()
+            self._put(out, END_OF_CHUNK)
+
+    def frames(self) -> Iterator[Tuple[int, float, np.ndarray]]:
+        """Yield (frame index, video time in seconds, frame) in frame order"""
+        pending = list(self.chunks())
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="video-decode") as executor:
+            queues: List["queue.Queue"] = []
+            current: Optional["queue.Queue"] = None
+
+            def submit_next():
+                start, end = pending.pop(0)
+                chunk_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+                executor.submit(self._decode, start, end, chunk_queue)
+                queues.append(chunk_queue)
+
+            try:
+                # Keep every decode thread busy, but never more chunks in flight than threads
+                while pending and len(queues) < self.workers:
+                    submit_next()
+                while queues:
+                    current = queues.pop(0)
+                    if pending:
+                        submit_next()
+                    while True:
+                        item = current.get()
+                        if item is END_OF_CHUNK:
+                            break
+                        yield item
+            finally:
+                self.stopped.set()
+                # Unblock producers that are waiting on a full queue, including the one being consumed
+                for chunk_queue in queues + ([current] if current is not None else []):
+                    while not chunk_queue.empty():
+                        chunk_queue.get_nowait()
+
+
+class ThrowWriter:
+    """Streams per-throw records to a JSONL file, or a Parquet file if pyarrow is installed"""
+
+    def __init__(self, path: str, row_group_size: int = 1024):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self.rows: List[Dict[str, Any]] = []
+        self.row_group_size = row_group_size
+        self.parquet_writer = None
+        self.count = 0
+
+        if self.parquet:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise SystemExit("Writing Parquet requires pyarrow (pip install pyarrow), or use a .jsonl output")
+            self.file = None
+        else:
+            self.file = sys.stdout if path == "-" else open(path, "w")
+
+    def write(self, record: Dict[str, Any]):
+        self.count += 1
+        if not self.parquet:
+            self.file.write(json.dumps(record) + "\n")
+            self.file.flush()
+            return
+        self.rows.append(record)
+        if len(self.rows) >= self.row_group_size:
+            self._flush_rows()
+
+    def _flush_rows(self):
+        if not self.rows:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pylist(self.rows)
+        if self.parquet_writer is None:
+            self.parquet_writer = pq.ParquetWriter(self.path, table.schema)
+        self.parquet_writer.write_table(table)
+        self.rows = []
+
+    def close(self):
+        if self.parquet:
+            self._flush_rows()
+            if self.parquet_writer is not None:
+                self.parquet_writer.close()
+        elif self.file is not sys.stdout:
+            self.file.close()
+
+
+def calibrate(frame: np.ndarray, calibration_state: CalibrationState) -> bool:
+    """Auto-calibrate on a frame; returns True if the dartboard was found"""
+    center, radius = detect_dartboard(frame)
+    if not (center and radius):
+        return False
+    height, width = frame.shape[:2]
+    if not calibration_state.current.matches(center[0], center[1], radius, width, height, settings.calibration.auto_tolerance):
+        calibration_state.publish(center[0], center[1], radius, width, height, source="auto", wait=True)
+    return True
+
+
+def score_video(
+    path: str,
+    detection_service: DetectionService,
+    writer: ThrowWriter,
+    args: argparse.Namespace,
+    loop: asyncio.AbstractEventLoop
+) -> Dict[str, Any]:
+    """Score one video and return its statistics"""
+    decoder = ChunkDecoder(path, args.workers, args.chunk_frames, args.stride)
+    calibration_state = CalibrationState()
+    tracking_service = TrackingService()
+    scoring_service = ScoringService(calibration_state)
+    throw_detector = ThrowDetector(
+        board_id=os.path.basename(path),
+        tolerance=tracking_service.movement_threshold * 2,
+        calibration_state=calibration_state
+    )
+    calibrated = False
+    if args.calibration:
+        center_x, center_y, radius = args.calibration
+        calibration_state.publish(center_x, center_y, radius, source="manual", wait=True)
+        calibrated = True
+
+    timings = {"decode_wait": 0.0, "inference": 0.0, "tracking": 0.0, "scoring": 0.0}
+    frames = 0
+    throws = 0
+    start = time.perf_counter()
+
+    def process(batch: List[Tuple[int, float, np.ndarray]]):
+        nonlocal frames, throws
+        stage_start = time.perf_counter()
+        detections = loop.run_until_complete(detection_service.detect_darts_batch(
+            [frame for _, _, frame in batch],
+            [frame_index for frame_index, _, _ in batch],
+            [video_time for _, video_time, _ in batch]
+        ))
+        timings["inference"] += time.perf_counter() - stage_start
+
+        for (frame_index, video_time, frame), detection in zip(batch, detections):
+            stage_start = time.perf_counter()
+            stable_darts = tracking_service.update(detection)
+            timings["tracking"] += time.perf_counter() - stage_start
+
+            stage_start = time.perf_counter()
+            score = scoring_service.calculate_score(stable_darts, frame.shape[1], frame.shape[0])
+            timings["scoring"] += time.perf_counter() - stage_start
+
+            landed, _ = throw_detector.update(score, frame_index, video_time)
+            for record in landed:
+                throws += 1
+                writer.write({
+                    "video": path,
+                    **record.model_dump(exclude={"board_id", "timestamp"}),
+                    "time": round(video_time, 3),
+                    "darts_on_board": len(score.throws),
+                    "board_total": score.total_score,
+                })
+        frames += len(batch)
+
+    batch: List[Tuple[int, float, np.ndarray]] = []
+    frame_iterator = decoder.frames()
+    try:
+        while True:
+            wait_start = time.perf_counter()
+            item = next(frame_iterator, None)
+            timings["decode_wait"] += time.perf_counter() - wait_start
+            if item is None:
+                break
+
+            frame_index, _, frame = item
+            if not calibrated or (args.calibrate_every and frame_index % args.calibrate_every < args.stride):
+                calibrated = calibrate(frame, calibration_state) or calibrated
+
+            batch.append(item)
+            if len(batch) >= args.batch_size:
+                process(batch)
+                batch = []
+        if batch:
+            process(batch)
+    finally:
+        # Stops the decode threads (and waits for them) if scoring failed halfway
+        frame_iterator.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "video": path,
+        "frames": frames,
+        "throws": throws,
+        "seconds": elapsed,
+        "fps": frames / elapsed if elapsed > 0 else 0.0,
+        "calibrated": calibrated,
+        "stage_seconds": timings,
+    }
+
+
+async def load_model(model_path: Optional[str]) -> DetectionService:
+    detection_service = DetectionService()
+    if model_path:
+        detection_service.model_path = model_path
+    await detection_service.initialize()
+    await detection_service.warmup()
+    return detection_service
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Score recorded dart match videos offline")
+    parser.add_argument("videos", nargs="+", help="Video files to score")
+    parser.add_argument("-o", "--output", default="throws.jsonl", help="Per-throw output (.jsonl, .parquet, or - for stdout)")
+    parser.add_argument("--model", default=None, help=f"YOLO model path (default: {settings.model.model_path})")
+    parser.add_argument("--batch-size", type=int, default=8, help="Frames per inference batch")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Decode threads")
+    parser.add_argument("--chunk-frames", type=int, default=300, help="Frames decoded by one thread before seeking to a new chunk")
+    parser.add_argument("--stride", type=int, default=1, help="Score every Nth frame")
+    parser.add_argument("--calibration", type=int, nargs=3, metavar=("CENTER_X", "CENTER_Y", "RADIUS"),
+                        help="Fixed dartboard calibration (default: auto-calibrate)")
+    parser.add_argument("--calibrate-every", type=int, default=0,
+                        help="Re-run auto-calibration every N frames (default: only until the board is found)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    args = parse_args(argv)
+
+    loop = asyncio.new_event_loop()
+    detection_service = loop.run_until_complete(load_model(args.model))
+    writer = ThrowWriter(args.output)
+    total_frames = 0
+    start = time.perf_counter()
+    try:
+        for path in args.videos:
+            stats = score_video(path, detection_service, writer, args, loop)
+            total_frames += stats["frames"]
+            stages = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in stats["stage_seconds"].items())
+            print(
+                f"{path}: {stats['frames']} frames, {stats['throws']} throws, "
+                f"{stats['fps']:.1f} fps ({stages})",
+                file=sys.stderr
+            )
+            if not stats["calibrated"]:
+                print(f"{path}: dartboard was never found, throws were scored with the default calibration", file=sys.stderr)
+    finally:
+        writer.close()
+        loop.close()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Total: {total_frames} frames, {writer.count} throws in {elapsed:.1f}s "
+        f"({total_frames / elapsed if elapsed > 0 else 0.0:.1f} fps)",
+        file=sys.stderr
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())